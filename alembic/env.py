@@ -107,3 +107,10 @@ if context.is_offline_mode():
     run_migrations_offline()
 else:
     run_migrations_online()
+    # 実行中のプロセスにスキーマ変更を通知（schema_caps の再イントロスペクト）
+    try:
+        from app.services import schema_caps
+        with app.app_context():
+            schema_caps.publish()
+    except Exception:
+        pass
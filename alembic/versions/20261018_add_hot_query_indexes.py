@@ -0,0 +1,92 @@
+"""Add composite/expression indexes for the org-scoped hot queries
+
+Lists and dashboards filter on org_id plus a date, or on a parent id plus
+created_at ("latest X of Y"); the models only had single-column indexes.
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY (outside
+the migration transaction) so writes are not blocked on large tables.
+
+Idempotent: indexes that already exist are skipped. Verify with
+``python scripts/explain_hot_queries.py``.
+
+Revision ID: 20261018_add_hot_query_indexes
+Revises: 20261018_add_interviews_latest_transcript_id
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_hot_query_indexes'
+down_revision = '20261018_add_interviews_latest_transcript_id'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns / expressions)
+INDEXES = [
+    ('ix_interviews_org_scheduled_at', 'interviews', ['org_id', 'scheduled_at']),
+    ('ix_interviews_org_scheduled_date', 'interviews', ['org_id', sa.text('date(scheduled_at)')]),
+    ('ix_interviews_org_created_at', 'interviews', ['org_id', 'created_at']),
+    ('ix_interviews_candidate_created_at', 'interviews', ['candidate_id', 'created_at']),
+    ('ix_candidates_org_applied_at', 'candidates', ['org_id', 'applied_at']),
+    ('ix_candidates_org_status_applied_at', 'candidates', ['org_id', 'status', 'applied_at']),
+    ('ix_recordings_interview_id_id', 'recordings', ['interview_id', 'id']),
+    ('ix_transcripts_recording_created_at', 'transcripts', ['recording_id', 'created_at']),
+    ('ix_interview_evaluations_interview_created_at', 'interview_evaluations', ['interview_id', 'created_at']),
+    ('ix_files_candidate_created_at', 'files', ['candidate_id', 'created_at']),
+    ('ix_applications_org_created_at', 'applications', ['org_id', 'created_at']),
+    ('ix_applications_org_created_date', 'applications', ['org_id', sa.text('date(created_at)')]),
+]
+
+
+def _existing(bind):
+    inspector = Inspector.from_engine(bind)
+    tables = set(inspector.get_table_names())
+    # index names straight from the catalog: the inspector skips expression indexes
+    if bind.dialect.name == 'postgresql':
+        names = {r[0] for r in bind.execute(sa.text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()"))}
+    elif bind.dialect.name == 'sqlite':
+        names = {r[0] for r in bind.execute(sa.text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    else:
+        names = set()
+        for table in {t for _, t, _ in INDEXES} & tables:
+            names.update(ix['name'] for ix in inspector.get_indexes(table))
+    return tables, names
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables, existing = _existing(bind)
+    if bind.dialect.name == 'postgresql':
+        # an interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index
+        # behind; rebuild those instead of skipping them
+        invalid = {r[0] for r in bind.execute(sa.text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+        ))}
+        existing -= invalid
+    todo = [ix for ix in INDEXES if ix[1] in tables and ix[0] not in existing]
+    if not todo:
+        return
+    if bind.dialect.name == 'postgresql':
+        # CONCURRENTLY can not run inside a transaction block
+        with op.get_context().autocommit_block():
+            for name, table, _ in todo:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+            for name, table, cols in todo:
+                op.create_index(name, table, cols, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, cols in todo:
+            op.create_index(name, table, cols)
+
+
+def downgrade():
+    bind = op.get_bind()
+    _, existing = _existing(bind)
+    todo = [ix for ix in INDEXES if ix[0] in existing]
+    if bind.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, _ in todo:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, _ in todo:
+            op.drop_index(name, table_name=table)
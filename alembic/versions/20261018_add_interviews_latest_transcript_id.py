@@ -0,0 +1,47 @@
+"""Add interviews.latest_transcript_id (pointer to the newest transcript)
+
+Idempotent: adds the column only when missing, then points every interview
+at the newest transcript of its recordings.
+
+Revision ID: 20261018_add_interviews_latest_transcript_id
+Revises: 20261018_add_org_daily_stats
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_interviews_latest_transcript_id'
+down_revision = '20261018_add_org_daily_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    cols = [c['name'] for c in inspector.get_columns('interviews')]
+    if 'latest_transcript_id' not in cols:
+        with op.batch_alter_table('interviews') as batch_op:
+            batch_op.add_column(sa.Column('latest_transcript_id', sa.Integer(), nullable=True))
+    op.execute(
+        """
+        UPDATE interviews SET latest_transcript_id = (
+            SELECT t.id FROM transcripts t
+            JOIN recordings r ON r.id = t.recording_id
+            WHERE r.interview_id = interviews.id
+            ORDER BY t.created_at DESC, t.id DESC
+            LIMIT 1
+        )
+        """
+    )
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    cols = [c['name'] for c in inspector.get_columns('interviews')]
+    if 'latest_transcript_id' in cols:
+        with op.batch_alter_table('interviews') as batch_op:
+            batch_op.drop_column('latest_transcript_id')
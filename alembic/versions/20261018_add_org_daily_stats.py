@@ -0,0 +1,46 @@
+"""Add org_daily_stats rollup table for the home dashboard
+
+Idempotent: skipped when the table already exists. Populate it afterwards
+with ``python scripts/backfill_daily_stats.py``.
+
+Revision ID: 20261018_add_org_daily_stats
+Revises: 20261018_add_transcripts_raw_response
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_org_daily_stats'
+down_revision = '20261018_add_transcripts_raw_response'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    if 'org_daily_stats' in inspector.get_table_names():
+        return
+    op.create_table(
+        'org_daily_stats',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('org_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('candidates', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('applications', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('interviews', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('evaluations', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('hires', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.UniqueConstraint('org_id', 'day', name='uq_org_daily_stats_org_day'),
+    )
+    op.create_index('ix_org_daily_stats_org_id', 'org_daily_stats', ['org_id'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    if 'org_daily_stats' in inspector.get_table_names():
+        op.drop_table('org_daily_stats')
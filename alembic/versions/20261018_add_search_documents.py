@@ -0,0 +1,108 @@
+"""Add search_documents and its full-text indexes
+
+* search_documents: bigram-tokenized text of candidates and transcripts
+  (maintained by app/services/search.py)
+* PostgreSQL: GIN index on to_tsvector('simple', tokens), and pg_trgm GIN
+  indexes on candidates.name / channel / applying_position / nationality so
+  the list filters' ILIKE '%x%' stop scanning the table. Built with
+  CREATE INDEX CONCURRENTLY (outside the migration transaction) so writes
+  to candidates are not blocked, as in 20261018_add_hot_query_indexes
+* SQLite: FTS5 table search_fts (external content) plus sync triggers
+
+Idempotent. Populate it afterwards with
+``python scripts/rebuild_search_index.py``.
+
+Revision ID: 20261018_add_search_documents
+Revises: 20261018_add_hot_query_indexes
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_search_documents'
+down_revision = '20261018_add_hot_query_indexes'
+branch_labels = None
+depends_on = None
+
+TRGM_COLUMNS = ('name', 'channel', 'applying_position', 'nationality')
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(tokens, content='search_documents', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_fts(rowid, tokens) VALUES (new.id, new.tokens);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_fts(search_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_fts(search_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens);
+        INSERT INTO search_fts(rowid, tokens) VALUES (new.id, new.tokens);
+    END""",
+    "INSERT INTO search_fts(search_fts) VALUES ('rebuild')",
+]
+
+
+def _create_concurrently(name, target, invalid):
+    if name in invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target}")
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    if 'search_documents' not in inspector.get_table_names():
+        op.create_table(
+            'search_documents',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('org_id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=20), nullable=False),
+            sa.Column('ref_id', sa.Integer(), nullable=False),
+            sa.Column('candidate_id', sa.Integer(), nullable=True),
+            sa.Column('interview_id', sa.Integer(), nullable=True),
+            sa.Column('body', sa.Text(), nullable=False),
+            sa.Column('tokens', sa.Text(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+            sa.UniqueConstraint('kind', 'ref_id', name='uq_search_documents_kind_ref'),
+        )
+        op.create_index('ix_search_documents_org_id', 'search_documents', ['org_id'])
+
+    if bind.dialect.name == 'postgresql':
+        # an interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index
+        # behind; rebuild those instead of skipping them
+        invalid = {r[0] for r in bind.execute(sa.text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+        ))}
+        # CONCURRENTLY can not run inside a transaction block
+        with op.get_context().autocommit_block():
+            _create_concurrently('ix_search_documents_tsv',
+                                 "search_documents USING gin (to_tsvector('simple', tokens))", invalid)
+            try:
+                op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            except Exception:
+                # needs a privileged role; the search itself does not depend on it
+                return
+            for col in TRGM_COLUMNS:
+                _create_concurrently(f'ix_candidates_{col}_trgm', f"candidates USING gin ({col} gin_trgm_ops)", invalid)
+    elif bind.dialect.name == 'sqlite':
+        for stmt in SQLITE_FTS:
+            op.execute(stmt)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for col in TRGM_COLUMNS:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_candidates_{col}_trgm")
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_search_documents_tsv")
+    elif bind.dialect.name == 'sqlite':
+        for name in ('search_documents_ai', 'search_documents_ad', 'search_documents_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+        op.execute("DROP TABLE IF EXISTS search_fts")
+    inspector = Inspector.from_engine(bind)
+    if 'search_documents' in inspector.get_table_names():
+        op.drop_index('ix_search_documents_org_id', table_name='search_documents')
+        op.drop_table('search_documents')
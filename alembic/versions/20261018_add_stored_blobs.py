@@ -0,0 +1,77 @@
+"""Add stored_blobs and content hashes on files / recordings
+
+* stored_blobs: content-addressed stored objects shared by Files and
+  Recordings of an org, with a reference count (app/services/blobs.py)
+* files.content_sha256, recordings.content_sha256 / size_bytes, indexed
+  by (org_id, content_sha256) to find duplicate uploads
+
+Idempotent. Existing rows keep their storage URLs; their hashes stay NULL
+(recordings get theirs the next time they are transcribed).
+
+Revision ID: 20261018_add_stored_blobs
+Revises: 20261018_add_search_documents
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_stored_blobs'
+down_revision = '20261018_add_search_documents'
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    'files': [sa.Column('content_sha256', sa.String(length=64), nullable=True)],
+    'recordings': [sa.Column('content_sha256', sa.String(length=64), nullable=True),
+                   sa.Column('size_bytes', sa.BigInteger(), nullable=True)],
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    if 'stored_blobs' not in inspector.get_table_names():
+        op.create_table(
+            'stored_blobs',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('org_id', sa.Integer(), nullable=False),
+            sa.Column('sha256', sa.String(length=64), nullable=False),
+            sa.Column('size', sa.BigInteger(), nullable=False),
+            sa.Column('storage_url', sa.String(length=512), nullable=False, unique=True),
+            sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+            sa.UniqueConstraint('org_id', 'sha256', 'size', name='uq_stored_blobs_org_content'),
+        )
+        op.create_index('ix_stored_blobs_org_id', 'stored_blobs', ['org_id'])
+    for table, columns in COLUMNS.items():
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        missing = [c for c in columns if c.name not in existing]
+        if missing:
+            with op.batch_alter_table(table) as batch_op:
+                for col in missing:
+                    batch_op.add_column(col)
+        indexes = {ix['name'] for ix in inspector.get_indexes(table)}
+        name = f'ix_{table}_org_content_sha256'
+        if name not in indexes:
+            op.create_index(name, table, ['org_id', 'content_sha256'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    for table, columns in COLUMNS.items():
+        indexes = {ix['name'] for ix in inspector.get_indexes(table)}
+        name = f'ix_{table}_org_content_sha256'
+        if name in indexes:
+            op.drop_index(name, table_name=table)
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        present = [c.name for c in columns if c.name in existing]
+        if present:
+            with op.batch_alter_table(table) as batch_op:
+                for col in present:
+                    batch_op.drop_column(col)
+    if 'stored_blobs' in inspector.get_table_names():
+        op.drop_index('ix_stored_blobs_org_id', table_name='stored_blobs')
+        op.drop_table('stored_blobs')
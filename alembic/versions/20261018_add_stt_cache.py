@@ -0,0 +1,48 @@
+"""Add stt_cache table for raw Deepgram responses
+
+Idempotent: skipped when the table already exists (e.g. created by
+0001_initial from current metadata).
+
+Revision ID: 20261018_add_stt_cache
+Revises: m20250821a001
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_stt_cache'
+down_revision = 'm20250821a001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    if 'stt_cache' in inspector.get_table_names():
+        return
+    op.create_table(
+        'stt_cache',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('cache_key', sa.String(64), nullable=False),
+        sa.Column('audio_sha256', sa.String(64), nullable=False),
+        sa.Column('language', sa.String(10), nullable=True),
+        sa.Column('options', sa.JSON(), nullable=True),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_stt_cache_cache_key', 'stt_cache', ['cache_key'], unique=True)
+    op.create_index('ix_stt_cache_audio_sha256', 'stt_cache', ['audio_sha256'])
+    op.create_index('ix_stt_cache_last_used_at', 'stt_cache', ['last_used_at'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    if 'stt_cache' in inspector.get_table_names():
+        op.drop_table('stt_cache')
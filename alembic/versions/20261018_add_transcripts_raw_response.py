@@ -0,0 +1,35 @@
+"""Add transcripts.raw_response (raw STT output for offline recompute)
+
+Idempotent: adds the column only when missing.
+
+Revision ID: 20261018_add_transcripts_raw_response
+Revises: 20261018_add_stt_cache
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_transcripts_raw_response'
+down_revision = '20261018_add_stt_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    cols = [c['name'] for c in inspector.get_columns('transcripts')]
+    if 'raw_response' not in cols:
+        with op.batch_alter_table('transcripts') as batch_op:
+            batch_op.add_column(sa.Column('raw_response', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = Inspector.from_engine(bind)
+    cols = [c['name'] for c in inspector.get_columns('transcripts')]
+    if 'raw_response' in cols:
+        with op.batch_alter_table('transcripts') as batch_op:
+            batch_op.drop_column('raw_response')
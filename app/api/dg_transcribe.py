@@ -32,11 +32,9 @@ def transcribe_deepgram(interview_id):
     path = os.path.join(UPLOAD_DIR, fname)
     f.save(path)
 
-    # read bytes and call shared transcribe function (which now uses Deepgram via requests)
+    # stream the saved file to the shared transcribe function (Deepgram via requests)
     with open(path, 'rb') as fh:
-        audio_bytes = fh.read()
-
-    transcript = transcribe_whisper(audio_bytes, language='ja')
+        transcript = transcribe_whisper(fh, language='ja')
 
     # minimal save
     iv.ai_transcript = transcript
@@ -0,0 +1,46 @@
+# app/api/search.py
+from flask import Blueprint, jsonify, request, url_for
+from flask_login import login_required, current_user
+from app.models import Candidate
+from app.services import search as search_service
+
+bp = Blueprint("search", __name__)
+
+
+@bp.get("/api/search")
+@login_required
+def search():
+    """Ranked full-text hits over candidates and transcripts of the user's org.
+
+    Query: ``q``, optional ``kind`` (candidate / transcript), ``page``, ``per_page``.
+    """
+    q = (request.args.get("q") or "").strip()
+    kind = request.args.get("kind")
+    if kind and kind not in search_service.KINDS:
+        return jsonify({"error": f"unknown kind: {kind}"}), 400
+    page = max(1, request.args.get("page", default=1, type=int))
+    per_page = max(1, min(request.args.get("per_page", default=20, type=int), 100))
+    hits, has_more = search_service.search(
+        current_user.org_id, q, kinds=[kind] if kind else None,
+        limit=per_page, offset=(page - 1) * per_page,
+    )
+    # candidate names for display, one query for the page
+    cand_ids = {h["candidate_id"] for h in hits if h["candidate_id"]}
+    names = dict(
+        Candidate.query.with_entities(Candidate.id, Candidate.name)
+        .filter(Candidate.org_id == current_user.org_id, Candidate.id.in_(cand_ids)).all()
+    ) if cand_ids else {}
+    for h in hits:
+        h["candidate_name"] = names.get(h["candidate_id"])
+        if h["candidate_id"]:
+            h["candidate_url"] = url_for("candidates.detail", candidate_id=h["candidate_id"])
+        if h["interview_id"]:
+            h["interview_url"] = url_for("interviews.detail", interview_id=h["interview_id"])
+    return jsonify({
+        "q": q,
+        "backend": search_service.backend(),
+        "page": page,
+        "per_page": per_page,
+        "has_more": has_more,
+        "hits": hits,
+    })
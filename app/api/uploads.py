@@ -0,0 +1,130 @@
+# app/api/uploads.py
+from flask import Blueprint, current_app, jsonify, request, url_for
+from flask_login import login_required, current_user
+from app.extensions import db, rq
+from app.models import Interview
+from app.models.recording import Recording
+from app.jobs.transcribe import transcribe_recording
+from app.services import blobs, direct_upload
+
+bp = Blueprint("uploads", __name__)
+
+_BASE = "/api/interviews/<int:interview_id>/recordings/uploads"
+
+
+def _error(e: direct_upload.UploadError):
+    return jsonify({"error": str(e)}), e.status
+
+
+def _state(interview_id, upload_id):
+    """Upload state from the X-Upload-Token header (or ``token`` in a JSON body), checked against the URL and user."""
+    body = request.get_json(silent=True) if request.is_json else None
+    value = request.headers.get("X-Upload-Token") or (body or {}).get("token")
+    state = direct_upload.load(value)
+    if (state["upload_id"] != upload_id or state["interview_id"] != interview_id
+            or state["org_id"] != current_user.org_id or state["user_id"] != current_user.id):
+        raise direct_upload.UploadError("upload does not belong to this request", status=403)
+    return state
+
+
+def _describe(state):
+    def local_part_url(n):
+        return url_for("uploads.put_part", interview_id=state["interview_id"],
+                       upload_id=state["upload_id"], number=n)
+    return {
+        "upload_id": state["upload_id"],
+        "backend": state["backend"],
+        "size": state["size"],
+        "part_size": state["part_size"],
+        "parts": direct_upload.describe(state, local_part_url),
+        "complete_url": url_for("uploads.complete_upload", interview_id=state["interview_id"],
+                                upload_id=state["upload_id"]),
+        "status_url": url_for("uploads.upload_status", interview_id=state["interview_id"],
+                              upload_id=state["upload_id"]),
+    }
+
+
+@bp.post(_BASE)
+@login_required
+def start_upload(interview_id):
+    """Start a direct upload of a recording.
+
+    JSON: ``filename``, ``size`` (bytes), ``content_type`` (guessed from the
+    file name when missing). Returns the upload token and the part URLs to
+    PUT the file to.
+    """
+    iv = Interview.query.filter_by(id=interview_id, org_id=current_user.org_id).first_or_404()
+    data = request.get_json(silent=True) or {}
+    try:
+        state = direct_upload.start(current_user.org_id, current_user.id, iv.id,
+                                    data.get("filename"), data.get("size"), data.get("content_type"))
+        payload = _describe(state)
+    except direct_upload.UploadError as e:
+        return _error(e)
+    payload["token"] = direct_upload.token(state)
+    return jsonify(payload), 201
+
+
+@bp.get(_BASE + "/<upload_id>")
+@login_required
+def upload_status(interview_id, upload_id):
+    """Parts stored so far, with fresh URLs for the rest (resuming an interrupted upload)."""
+    try:
+        return jsonify(_describe(_state(interview_id, upload_id)))
+    except direct_upload.UploadError as e:
+        return _error(e)
+
+
+@bp.put(_BASE + "/<upload_id>/parts/<int:number>")
+@login_required
+def put_part(interview_id, upload_id, number):
+    """One part of a local upload (raw request body)."""
+    try:
+        state = _state(interview_id, upload_id)
+        size = direct_upload.write_part(state, number, request.stream)
+    except direct_upload.UploadError as e:
+        return _error(e)
+    return jsonify({"number": number, "size": size})
+
+
+@bp.post(_BASE + "/<upload_id>/complete")
+@login_required
+def complete_upload(interview_id, upload_id):
+    """Assemble the upload, create the Recording and enqueue its transcription."""
+    try:
+        state = _state(interview_id, upload_id)
+        url = direct_upload.stored_url(state)
+        # a retried completion returns the recording created the first time
+        rec = Recording.query.filter_by(org_id=current_user.org_id, interview_id=interview_id,
+                                        storage_url=url).first()
+        if rec is None:
+            done = direct_upload.complete(state)
+            rec = Recording(org_id=current_user.org_id, interview_id=interview_id,
+                            storage_url=done.url, uploaded_by=current_user.id)
+            db.session.add(rec); db.session.commit()
+            if done.sha256:
+                # hashed during assembly: record it (and dedupe) now; the
+                # transcribe job hashes the file itself when this fails
+                try:
+                    blobs.recording_hash(rec, hashed=(done.sha256, done.size))
+                except Exception:
+                    current_app.logger.exception('recording %s: storing the content hash failed', rec.id)
+                    db.session.rollback()
+            # 非同期で文字起こし
+            rq.enqueue(transcribe_recording, rec.id, "ja", queue="stt")
+    except direct_upload.UploadError as e:
+        return _error(e)
+    return jsonify({
+        "recording_id": rec.id,
+        "detail_url": url_for("interviews.detail", interview_id=interview_id),
+    }), 201
+
+
+@bp.delete(_BASE + "/<upload_id>")
+@login_required
+def abort_upload(interview_id, upload_id):
+    try:
+        direct_upload.abort(_state(interview_id, upload_id))
+    except direct_upload.UploadError as e:
+        return _error(e)
+    return "", 204
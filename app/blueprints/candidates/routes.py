@@ -1,4 +1,4 @@
-from flask import render_template, request, redirect, url_for, flash
+from flask import render_template, request, redirect, url_for, flash, current_app, abort
 from flask_login import login_required, current_user
 from . import bp
 from .forms import CandidateForm
@@ -9,13 +9,11 @@ from ...models.interview import Interview
 from ...models.candidate_overall_evaluation import CandidateOverallEvaluation
 from datetime import datetime
 from ...models.file import Files
-from ...services.storage import save_file
-from ...services.storage import download_bytes
-from ...services.preview import render_preview
+from ...services import preview as previews
+from ...services import delivery, keyset, schema_caps, search
 from flask import send_file
 from sqlalchemy.orm import defer
 import io
-import mimetypes
 from urllib.parse import urlencode
 import json
 
@@ -59,8 +57,14 @@ def list_candidates():
 
     query = Candidate.query.filter_by(org_id=current_user.org_id)
     if q:
-        like = f"%{q}%"
-        query = query.filter(Candidate.name.ilike(like))
+        # indexed full-text search over name/yomi/memo/skills and transcripts;
+        # plain name ILIKE until the search_documents migration has run
+        matches = search.matching_candidates(current_user.org_id, q)
+        if matches is None:
+            like = f"%{q}%"
+            query = query.filter(Candidate.name.ilike(like))
+        else:
+            query = query.filter(Candidate.id.in_(matches))
     if applied_at:
         # filter by date (date-only)
         query = query.filter(Candidate.applied_at.cast(db.Date) == applied_at)
@@ -76,10 +80,16 @@ def list_candidates():
         like = f"%{nationality}%"
         query = query.filter(Candidate.nationality.ilike(like))
 
-    # pagination
-    page = request.args.get('page', default=1, type=int)
+    # pagination: cursor (keyset) by default; ?page=N keeps the old offset pager
     per_page = request.args.get('per_page', default=20, type=int)
-    items_pagination = query.order_by(Candidate.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    if 'page' in request.args:
+        page = request.args.get('page', default=1, type=int)
+        items_pagination = query.order_by(Candidate.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    else:
+        filters = {k: v for k, v in request.args.items() if k not in ('cursor', 'per_page')}
+        total, estimated = keyset.approximate_total(query, current_user.org_id, 'candidates', filters)
+        items_pagination = keyset.paginate(query, [(Candidate.id, 'desc')], request.args.get('cursor'),
+                                           per_page=per_page, total=total, total_is_estimate=estimated)
     # new applications cards (latest applied)
     new_apps = Candidate.query.filter_by(org_id=current_user.org_id, status='applied').order_by(Candidate.applied_at.desc()).limit(5).all()
     def make_page_url(target_page: int):
@@ -88,7 +98,14 @@ def list_candidates():
         params['per_page'] = items_pagination.per_page
         return request.path + '?' + urlencode(params)
 
-    return render_template("candidates/list.html", items=items_pagination.items, pagination=items_pagination, new_apps=new_apps, make_page_url=make_page_url)
+    def make_cursor_url(cursor: str):
+        params = request.args.to_dict()
+        params.pop('page', None)
+        params['cursor'] = cursor
+        params['per_page'] = items_pagination.per_page
+        return request.path + '?' + urlencode(params)
+
+    return render_template("candidates/list.html", items=items_pagination.items, pagination=items_pagination, new_apps=new_apps, make_page_url=make_page_url, make_cursor_url=make_cursor_url)
 
 @bp.route("/create", methods=["GET", "POST"])
 @login_required
@@ -148,17 +165,15 @@ def detail(candidate_id):
         return redirect(url_for("candidates.detail", candidate_id=c.id))
 
 
-    interviews = (
-        Interview.query
-        .filter_by(org_id=c.org_id, candidate_id=c.id)
-        .options(defer(Interview.scheduled_at))
-        .order_by(Interview.created_at.desc())
-        .all()
-    )
-    # scheduled_at はDBに存在しないため、テンプレート互換用に created_at を仮で入れる
+    has_scheduled = schema_caps.has('has_scheduled_at')
+    iq = Interview.query.filter_by(org_id=c.org_id, candidate_id=c.id)
+    if not has_scheduled:
+        iq = iq.options(defer(Interview.scheduled_at))
+    interviews = iq.order_by(Interview.created_at.desc()).all()
+    # scheduled_at が無い/未設定の場合、テンプレート互換用に created_at を仮で入れる
     for _iv in interviews:
         try:
-            if getattr(_iv, 'scheduled_at', None) is None:
+            if not has_scheduled or _iv.scheduled_at is None:
                 setattr(_iv, 'scheduled_at', _iv.created_at)
         except Exception:
             pass
@@ -190,16 +205,27 @@ def upload_resume(candidate_id):
         flash('ファイルが選択されていません', 'warning')
         return redirect(url_for('candidates.detail', candidate_id=c.id))
 
-    created_ids = []
+    from ...services import blobs
+    created_ids, created_rows = [], []
     for f in files:
         if not f or getattr(f, 'filename', '') == '':
             continue
-        url = save_file(f, prefix=f"org{current_user.org_id}/candidate{c.id}")
-        meta = {'filename': getattr(f, 'filename', ''), 'size': None, 'content_type': getattr(f, 'mimetype', '')}
-        file_row = Files(org_id=current_user.org_id, kind='resume', storage_url=url, file_metadata=meta, candidate_id=c.id)
+        # content-addressed: an identical file already stored by the org is not written again
+        stored = blobs.store_upload(f, current_user.org_id, prefix=f"org{current_user.org_id}/candidate{c.id}")
+        meta = {'filename': getattr(f, 'filename', ''), 'size': stored.size, 'content_type': getattr(f, 'mimetype', ''),
+                'sha256': stored.sha256}
+        if stored.reused:
+            # same content as an earlier upload: share its rendered preview
+            info = blobs.find_preview(current_user.org_id, stored.sha256)
+            if info is not None:
+                meta['preview'] = info
+        file_row = Files(org_id=current_user.org_id, kind='resume', storage_url=stored.url, file_metadata=meta, candidate_id=c.id)
+        if blobs.available():
+            file_row.content_sha256 = stored.sha256
         db.session.add(file_row)
         db.session.flush()
         created_ids.append(file_row.id)
+        created_rows.append(file_row)
 
     db.session.commit()
 
@@ -209,6 +235,13 @@ def upload_resume(candidate_id):
         db.session.add(c)
         db.session.commit()
 
+    # render office previews in the background so the first view is cached
+    from ...extensions import rq
+    from ...jobs.preview import render_file_preview
+    for file_row in created_rows:
+        if previews.supports(file_row) and previews.cached(file_row) is None:
+            rq.enqueue(render_file_preview, file_row.id, job_timeout=300, result_ttl=0)
+
     flash('履歴書をアップロードしました', 'success')
     return redirect(url_for('candidates.detail', candidate_id=c.id))
 
@@ -221,33 +254,58 @@ def list_files(candidate_id):
     return render_template('candidates/files.html', c=c, files=files)
 
 
+def _deliver(f, filename, mimetype, as_attachment):
+    try:
+        return delivery.send_stored(f.storage_url, filename=filename, mimetype=mimetype, as_attachment=as_attachment)
+    except FileNotFoundError:
+        current_app.logger.warning('file %s missing in storage: %s', f.id, f.storage_url)
+        abort(404)
+
+
 @bp.get('/<int:candidate_id>/files/<int:file_id>/download')
 @login_required
 def download_file(candidate_id, file_id):
     f = Files.query.filter_by(id=file_id, candidate_id=candidate_id, org_id=current_user.org_id).first_or_404()
-    data = download_bytes(f.storage_url)
+    if not f.storage_url:
+        abort(404)
     filename = f.filename or f"file_{f.id}"
-    return send_file(io.BytesIO(data), as_attachment=True, download_name=filename, mimetype=f.file_metadata.get('content_type') if f.file_metadata else 'application/octet-stream')
+    mimetype = (f.file_metadata or {}).get('content_type') or delivery.guess_mimetype(filename)
+    return _deliver(f, filename, mimetype, as_attachment=True)
+
+
+def _preview_headers(resp, info):
+    resp.set_etag(previews.etag(info))
+    resp.headers['Cache-Control'] = f"private, max-age={int(current_app.config.get('PREVIEW_CACHE_MAX_AGE_SEC', 86400))}"
+    return resp
 
 
 @bp.get('/<int:candidate_id>/files/<int:file_id>/view')
 @login_required
 def view_file(candidate_id, file_id):
     f = Files.query.filter_by(id=file_id, candidate_id=candidate_id, org_id=current_user.org_id).first_or_404()
-    # try preview extraction for office files
-    try:
-        preview = render_preview(f)
-        if preview:
-            mimetype, data_bytes, filename = preview
-            return send_file(io.BytesIO(data_bytes), as_attachment=False, download_name=filename, mimetype=mimetype)
-    except Exception:
-        # fall back to raw bytes
-        pass
+    # office files: serve the stored HTML preview (rendered at upload, or
+    # now when missing / made by an older renderer)
+    if previews.supports(f):
+        info = previews.cached(f)
+        if info is not None and info.get('url') and request.if_none_match.contains(previews.etag(info)):
+            return _preview_headers(current_app.response_class(status=304), info)
+        try:
+            info, html = previews.load(f)
+            if html is not None:
+                resp = send_file(io.BytesIO(html), as_attachment=False, download_name=f.filename or f"file_{f.id}",
+                                 mimetype='text/html', etag=False)
+                return _preview_headers(resp, info)
+        except Exception:
+            # fall back to raw bytes
+            current_app.logger.exception('preview: file %s', f.id)
+            db.session.rollback()
 
-    # default: return raw bytes (PDF/text/etc.)
-    data = download_bytes(f.storage_url)
-    mimetype = f.file_metadata.get('content_type') if f.file_metadata else mimetypes.guess_type(f.filename or '')[0] or 'application/octet-stream'
-    return send_file(io.BytesIO(data), as_attachment=False, download_name=f.filename or f"file_{f.id}", mimetype=mimetype)
+    # default: the file itself (PDF/text/etc.), inline
+    if not f.storage_url:
+        abort(404)
+    filename = f.filename or f"file_{f.id}"
+    mimetype = (f.file_metadata or {}).get('content_type') or delivery.guess_mimetype(filename)
+    return _deliver(f, filename, mimetype, as_attachment=False)
 
 
 @bp.get('/<int:candidate_id>/evaluation')
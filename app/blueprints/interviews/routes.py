@@ -1,22 +1,21 @@
-from flask import render_template, request, send_file, redirect, url_for, current_app, flash
+from flask import render_template, request, send_file, redirect, url_for, current_app, flash, abort, jsonify
 from flask_login import login_required, current_user
 from . import bp
 from .forms import InterviewForm
 from ...extensions import db, rq
 from ...models.interview import Interview
 from ...models.recording import Recording
-from ...models.transcript import Transcript
 from ...models.candidate import Candidate
 from ...models.evaluation import Evaluation
 from ...services.ics import build_ics
-from ...services.storage import save_file
+from ...services import keyset, schema_caps
+from ...services import transcripts as latest_transcripts
 from ...jobs.transcribe import transcribe_recording
 from io import BytesIO
 from uuid import uuid4
 from datetime import timedelta, date, datetime, time
 from sqlalchemy import func
 from urllib.parse import urlencode
-from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.exc import SQLAlchemyError
 
 @bp.get("")
@@ -59,13 +58,9 @@ def list_interviews():
         except Exception:
             tz = None
 
-    # detect whether the interviews table actually has scheduled_at column in the running DB
-    try:
-        insp = sa_inspect(db.engine)
-        interview_cols = {c['name'] for c in insp.get_columns('interviews')}
-        has_scheduled = 'scheduled_at' in interview_cols
-    except Exception:
-        has_scheduled = False
+    # whether the interviews table actually has scheduled_at in the running DB
+    # (introspected once per process, not per request)
+    has_scheduled = schema_caps.has('has_scheduled_at')
 
     todays = []
     if tz is not None:
@@ -105,13 +100,18 @@ def list_interviews():
     if todays:
         today_ids = [i.id for i in todays]
         query = query.filter(~Interview.id.in_(today_ids))
-    # order by scheduled time ascending (実施日順) with pagination
-    page = request.args.get('page', default=1, type=int)
+    # order by scheduled time ascending (実施日順) with pagination:
+    # cursor (keyset) by default; ?page=N keeps the old offset pager
     per_page = request.args.get('per_page', default=20, type=int)
-    if has_scheduled:
-        items_pagination = query.order_by(Interview.scheduled_at.asc()).paginate(page=page, per_page=per_page, error_out=False)
+    sort_col = Interview.scheduled_at if has_scheduled else Interview.created_at
+    if 'page' in request.args:
+        page = request.args.get('page', default=1, type=int)
+        items_pagination = query.order_by(sort_col.asc()).paginate(page=page, per_page=per_page, error_out=False)
     else:
-        items_pagination = query.order_by(Interview.created_at.asc()).paginate(page=page, per_page=per_page, error_out=False)
+        filters = {'start': start, 'end': end, 'status': status, 'today': date.today().isoformat()}
+        total, estimated = keyset.approximate_total(query, current_user.org_id, 'interviews', filters)
+        items_pagination = keyset.paginate(query, [(sort_col, 'asc'), (Interview.id, 'asc')], request.args.get('cursor'),
+                                           per_page=per_page, total=total, total_is_estimate=estimated)
     items = items_pagination.items
 
     # helper to build page URLs while preserving existing query params
@@ -121,11 +121,32 @@ def list_interviews():
         params['per_page'] = items_pagination.per_page
         return request.path + '?' + urlencode(params)
 
+    def make_cursor_url(cursor: str):
+        params = request.args.to_dict()
+        params.pop('page', None)
+        params['cursor'] = cursor
+        params['per_page'] = items_pagination.per_page
+        return request.path + '?' + urlencode(params)
+
     # Candidate map for both lists
     cand_ids = list({i.candidate_id for i in (items or []) + (todays or [])}) if (items or todays) else []
     cand_map = {c.id: c for c in Candidate.query.filter(Candidate.id.in_(cand_ids)).all()} if cand_ids else {}
 
-    return render_template("interviews/list.html", items=items, cand_map=cand_map, todays=todays, filters={'start': start, 'end': end, 'status': status}, pagination=items_pagination, make_page_url=make_page_url)
+    return render_template("interviews/list.html", items=items, cand_map=cand_map, todays=todays, filters={'start': start, 'end': end, 'status': status}, pagination=items_pagination, make_page_url=make_page_url, make_cursor_url=make_cursor_url)
+
+def _store_recording(f, interview):
+    """Recording row for an uploaded file (stored once per org by content, see services/blobs.py)."""
+    from ...services import blobs
+    stored = blobs.store_upload(f, current_user.org_id, prefix=f"org{current_user.org_id}/interview{interview.id}")
+    rec = Recording(org_id=current_user.org_id, interview_id=interview.id, storage_url=stored.url,
+                    uploaded_by=current_user.id)
+    if blobs.available():
+        rec.content_sha256, rec.size_bytes = stored.sha256, stored.size
+    db.session.add(rec); db.session.commit()
+    return rec
+
+def _wants_json():
+    return request.accept_mimetypes.best == "application/json"
 
 @bp.route("/create", methods=["GET","POST"])
 @login_required
@@ -159,6 +180,13 @@ def create_interview():
         i.transcript_text = form.transcript_text.data or None
         db.session.add(i)
         db.session.commit()
+        if _wants_json():
+            # direct_upload.js: the recording goes straight to storage next
+            return jsonify({
+                "interview_id": i.id,
+                "upload_url": url_for("uploads.start_upload", interview_id=i.id),
+                "detail_url": url_for("interviews.detail", interview_id=i.id),
+            }), 201
         # If a file was uploaded, save recording and redirect to analyze endpoint
         f = None
         try:
@@ -166,18 +194,22 @@ def create_interview():
         except Exception:
             f = None
         if f and getattr(f, 'filename', ''):
-            url = save_file(f, prefix=f"org{current_user.org_id}/interview{i.id}")
-            rec = Recording(org_id=current_user.org_id, interview_id=i.id, storage_url=url)
-            db.session.add(rec); db.session.commit()
+            rec = _store_recording(f, i)
             return redirect(url_for("interviews.analyze_recording", interview_id=i.id, recording_id=rec.id))
         # No file uploaded: go back to list
         return redirect(url_for("interviews.list_interviews"))
+    if request.method == 'POST' and _wants_json():
+        return jsonify({"errors": form.errors}), 400
     return render_template("interviews/detail.html", form=form, interview=None)
 
 @bp.route("/<int:interview_id>", methods=["GET","POST"])
 @login_required
 def detail(interview_id):
-    i = Interview.query.filter_by(id=interview_id, org_id=current_user.org_id).first_or_404()
+    # interview, its latest transcript and latest recording id in one query
+    i, latest_tr, latest_rec_id = latest_transcripts.load_interview(
+        interview_id, org_id=current_user.org_id, with_recording=True)
+    if i is None:
+        abort(404)
     form = InterviewForm(obj=i)
     # Pre-fill candidate_id for validation/read-only display
     try:
@@ -207,87 +239,51 @@ def detail(interview_id):
     # Load evaluations for this interview (latest first)
     evaluations = Evaluation.query.filter_by(org_id=current_user.org_id, interview_id=i.id).order_by(Evaluation.created_at.desc()).all()
     # Load latest transcript metrics for this interview (if any)
-    metrics = None
+    metrics = latest_tr.metrics if latest_tr else None
+    # Normalize metrics: sometimes stored as JSON string in DB
     try:
-        q = db.text(
-            """
-            SELECT t.metrics FROM transcripts t
-            JOIN recordings r ON r.id = t.recording_id
-            WHERE r.interview_id = :int_id
-            ORDER BY t.created_at DESC
-            LIMIT 1
-            """
-        )
-        res = db.session.execute(q, {"int_id": i.id}).fetchone()
-        metrics = res[0] if res and len(res) > 0 else None
-        # Normalize metrics: sometimes stored as JSON string in DB
-        try:
-            import json
-            if isinstance(metrics, str):
-                metrics = json.loads(metrics)
-        except Exception:
-            # if parsing fails, drop metrics to avoid template errors
-            metrics = None
+        import json
+        if isinstance(metrics, str):
+            metrics = json.loads(metrics)
     except Exception:
+        # if parsing fails, drop metrics to avoid template errors
         metrics = None
 
     # Load latest transcript text for this interview (if any)
-    transcript_text = None
-    try:
-        q2 = db.text(
-            """
-            SELECT t.text FROM transcripts t
-            JOIN recordings r ON r.id = t.recording_id
-            WHERE r.interview_id = :int_id
-            ORDER BY t.created_at DESC
-            LIMIT 1
-            """
-        )
-        res2 = db.session.execute(q2, {"int_id": i.id}).fetchone()
-        transcript_text = res2[0] if res2 and len(res2) > 0 else None
-        if transcript_text:
-            # attach to the interview object for template convenience
-            try:
-                i.transcript_text = transcript_text
-            except Exception:
-                pass
-        # ensure the form textarea shows the latest transcript when editing
+    transcript_text = latest_tr.text if latest_tr else None
+    if transcript_text:
+        # attach to the interview object for template convenience
         try:
-            form.transcript_text.data = transcript_text or getattr(i, 'transcript_text', None)
+            i.transcript_text = transcript_text
         except Exception:
             pass
+    # ensure the form textarea shows the latest transcript when editing
+    try:
+        form.transcript_text.data = transcript_text or getattr(i, 'transcript_text', None)
     except Exception:
-        transcript_text = None
+        pass
 
     # Determine processing status for UI badge
     processing_status = None
-    try:
-        # latest recording for this interview
-        latest_rec = Recording.query.filter_by(org_id=current_user.org_id, interview_id=i.id).order_by(Recording.id.desc()).first()
-        if latest_rec:
-            # check latest transcript for that recording and inspect status
-            tr = Transcript.query.filter_by(org_id=current_user.org_id, recording_id=latest_rec.id).order_by(Transcript.created_at.desc()).first()
-            if tr:
-                if getattr(tr, 'status', None) == 'ok':
-                    processing_status = '完了'
-                elif getattr(tr, 'status', None) == 'processing':
-                    processing_status = '処理中'
-                elif getattr(tr, 'status', None) == 'error':
-                    processing_status = '失敗'
-                else:
-                    processing_status = '処理中'
-            else:
-                processing_status = '処理中'
+    if latest_rec_id is not None:
+        # the latest recording has no transcript yet -> still processing
+        if latest_tr is None or latest_tr.recording_id != latest_rec_id:
+            processing_status = '処理中'
+        elif getattr(latest_tr, 'status', None) == 'ok':
+            processing_status = '完了'
+        elif getattr(latest_tr, 'status', None) == 'partial':
+            # segmented transcription with failed windows: the text has gaps
+            processing_status = '一部欠落'
+        elif getattr(latest_tr, 'status', None) == 'error':
+            processing_status = '失敗'
         else:
-            processing_status = None
-    except Exception:
-        processing_status = None
+            processing_status = '処理中'
 
     try:
         current_app.logger.debug('Render interviews.detail: metrics type=%s value=%s', type(metrics), str(metrics)[:1000])
     except Exception:
         pass
-    return render_template("interviews/detail.html", interview=i, form=form, evaluations=evaluations, metrics=metrics, transcript_text=transcript_text, processing_status=processing_status)
+    return render_template("interviews/detail.html", interview=i, form=form, evaluations=evaluations, metrics=metrics, transcript_text=transcript_text, processing_status=processing_status, latest_rec_id=latest_rec_id)
 
 
 @bp.get("/<int:interview_id>/ics")
@@ -317,15 +313,28 @@ def download_ics(interview_id):
 @bp.post("/<int:interview_id>/upload")
 @login_required
 def upload_recording(interview_id):
+    """Server-side upload (fallback; browsers use the direct upload API, see app/api/uploads.py)."""
     i = Interview.query.filter_by(id=interview_id, org_id=current_user.org_id).first_or_404()
     f = request.files['file']
-    url = save_file(f, prefix=f"org{current_user.org_id}/interview{i.id}")
-    rec = Recording(org_id=current_user.org_id, interview_id=i.id, storage_url=url)
-    db.session.add(rec); db.session.commit()
+    rec = _store_recording(f, i)
     # 非同期で文字起こし
-    rq.enqueue(transcribe_recording, rec.id, "ja")
+    rq.enqueue(transcribe_recording, rec.id, "ja", queue="stt")
     return redirect(url_for("interviews.detail", interview_id=i.id))
 
+@bp.get("/<int:interview_id>/recordings/<int:recording_id>/audio")
+@login_required
+def recording_audio(interview_id, recording_id):
+    """Recording for the audio player (presigned redirect / Range-capable stream)."""
+    from ...services import delivery
+    rec = Recording.query.filter_by(id=recording_id, interview_id=interview_id, org_id=current_user.org_id).first_or_404()
+    filename = rec.storage_url.rstrip('/').split('/')[-1]
+    try:
+        return delivery.send_stored(rec.storage_url, filename=filename,
+                                    mimetype=delivery.guess_mimetype(filename, 'audio/mpeg'),
+                                    as_attachment=request.args.get('download') == '1')
+    except FileNotFoundError:
+        abort(404)
+
 @bp.get("/<int:interview_id>/analyze")
 @login_required
 def analyze_recording(interview_id):
@@ -340,6 +349,6 @@ def analyze_recording(interview_id):
     if not rec:
         flash("録音ファイルが見つかりませんでした", "warning")
         return redirect(url_for("interviews.list_interviews"))
-    rq.enqueue(transcribe_recording, rec.id, "ja")
+    rq.enqueue(transcribe_recording, rec.id, "ja", queue="stt")
     flash("録音の解析を開始しました", "success")
     return redirect(url_for("interviews.list_interviews"))
\ No newline at end of file
@@ -9,12 +9,13 @@ from . import bp
 @login_required
 def kick_evaluate():
     app_id = int(request.json["application_id"])
-    job = rq.enqueue(evaluate_application, app_id)
+    job = rq.enqueue(evaluate_application, app_id, queue="llm")
     return jsonify({"job_id": job.id})
 
 @bp.post("/notify")
 @login_required
 def kick_notify():
     data = request.json
-    job = rq.enqueue(notify_decision, current_user.org_id, int(data["application_id"]), data["to"], data["subject"], data["html"])
+    job = rq.enqueue(notify_decision, current_user.org_id, int(data["application_id"]), data["to"], data["subject"], data["html"],
+                     queue="notify")
     return jsonify({"job_id": job.id})
\ No newline at end of file
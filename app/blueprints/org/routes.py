@@ -2,20 +2,13 @@ from flask import jsonify, render_template, request, redirect, url_for, flash, c
 from flask_login import login_required, current_user
 from . import bp
 from ...models.setting import Setting
-from ...extensions import db
+from ...extensions import db, rq
 from ...utils.decorators import admin_required
 from flask import send_file
-import json
-from io import BytesIO
 from ...models.user import User
 from ...models.candidate import Candidate
-from ...models.interview import Interview
-from ...models.transcript import Transcript
-from ...models.evaluation import Evaluation
 import csv
-from datetime import datetime, date
 from io import BytesIO, StringIO
-import json as _json
 
 
 @bp.get("/me")
@@ -59,6 +52,10 @@ def heuristic_settings():
     except Exception:
         pass
 
+    # per-org switch, read from settings only (not mirrored into app config)
+    bypass_row = Setting.query.filter_by(org_id=org_id, key='LLM_CACHE_BYPASS').first()
+    ctx['LLM_CACHE_BYPASS'] = bool(bypass_row and bypass_row.value == '1')
+
     if request.method == 'POST':
         try:
             ai = float(request.form.get('HEURISTIC_WEIGHT_AI', ctx['HEURISTIC_WEIGHT_AI']))
@@ -71,7 +68,9 @@ def heuristic_settings():
             current_app.config['DG_WORD_GAP_THRESHOLD'] = gap
             current_app.config['FILLER_TOKENS'] = fillers
 
-            for k, v in (('HEURISTIC_WEIGHT_AI', str(ai)), ('HEURISTIC_WEIGHT_H', str(h)), ('DG_WORD_GAP_THRESHOLD', str(gap)), ('FILLER_TOKENS', fillers)):
+            bypass = '1' if request.form.get('LLM_CACHE_BYPASS') else '0'
+
+            for k, v in (('HEURISTIC_WEIGHT_AI', str(ai)), ('HEURISTIC_WEIGHT_H', str(h)), ('DG_WORD_GAP_THRESHOLD', str(gap)), ('FILLER_TOKENS', fillers), ('LLM_CACHE_BYPASS', bypass)):
                 s = Setting.query.filter_by(org_id=org_id, key=k).first()
                 if s:
                     s.value = v
@@ -80,6 +79,12 @@ def heuristic_settings():
                     db.session.add(s)
             db.session.commit()
 
+            # optionally re-apply utterance/filler heuristics to stored transcripts
+            if request.form.get('recompute'):
+                from ...jobs.recompute import recompute_org_transcripts
+                rq.enqueue(recompute_org_transcripts, org_id, queue="maintenance", job_timeout=3600)
+                flash('既存の文字起こしへの再計算を開始しました', 'info')
+
             flash('設定を更新しました（保存済み）', 'success')
             return redirect(url_for('.heuristic_settings'))
         except Exception:
@@ -92,104 +97,198 @@ def heuristic_settings():
 @login_required
 @admin_required
 def export_data():
-    # GET: render the selection form. POST: export selected tables as JSON
-    from ...models.candidate_overall_evaluation import CandidateOverallEvaluation
+    # GET: render the selection form. POST: stream the selected tables as
+    # NDJSON or a zip of CSVs, or hand them to a background job
+    from flask import Response, stream_with_context
+    from ...services import export as export_service
 
     if request.method == 'GET':
         return render_template('org/export.html')
 
-    selected = request.form.getlist('tables')
+    selected = [t for t in request.form.getlist('tables') if t in export_service.tables()]
     if not selected:
         flash('少なくとも1つのテーブルを選択してください', 'warning')
         return redirect(url_for('.export_data'))
+    fmt = request.form.get('format', 'ndjson')
+    if fmt not in export_service.FORMATS:
+        fmt = 'ndjson'
+    org_id = current_user.org_id
+
+    if request.form.get('background') and _redis_available():
+        from ...jobs.export import export_org_data
+        job = rq.enqueue(export_org_data, org_id, selected, fmt, queue="maintenance",
+                         job_timeout=int(current_app.config.get('EXPORT_JOB_TIMEOUT_SEC', 3600)),
+                         result_ttl=int(current_app.config.get('EXPORT_RESULT_TTL_SEC', 86400)))
+        if job is not None and not isinstance(job, dict):
+            return render_template('org/export.html', job_id=job.id)
+
+    batch = int(current_app.config.get('EXPORT_BATCH_SIZE', 500))
+    body = export_service.stream(fmt, org_id, selected, batch)
+    return Response(
+        stream_with_context(body),
+        mimetype=export_service.mimetype(fmt),
+        headers={'Content-Disposition': f'attachment; filename="{export_service.filename(fmt, org_id)}"'},
+    )
+
 
-    payload = {}
+def _redis_available():
     try:
-        if 'users' in selected:
-            payload['users'] = [ {c.name: getattr(u, c.name) for c in u.__table__.columns} for u in User.query.filter_by(org_id=current_user.org_id).all() ]
-        if 'candidates' in selected:
-            payload['candidates'] = [ {c.name: getattr(x, c.name) for c in x.__table__.columns} for x in Candidate.query.filter_by(org_id=current_user.org_id).all() ]
-        if 'interviews' in selected:
-            payload['interviews'] = [ {c.name: getattr(x, c.name) for c in x.__table__.columns} for x in Interview.query.filter_by(org_id=current_user.org_id).all() ]
-        if 'transcripts' in selected:
-            payload['transcripts'] = [ {c.name: getattr(x, c.name) for c in x.__table__.columns} for x in Transcript.query.filter_by(org_id=current_user.org_id).all() ]
-        if 'evaluations' in selected:
-            payload['evaluations'] = [ {c.name: getattr(x, c.name) for c in x.__table__.columns} for x in Evaluation.query.filter_by(org_id=current_user.org_id).all() ]
-        if 'candidate_overall_evaluations' in selected:
-            payload['candidate_overall_evaluations'] = [ {c.name: getattr(x, c.name) for c in x.__table__.columns} for x in CandidateOverallEvaluation.query.filter_by(org_id=current_user.org_id).all() ]
-    except Exception as e:
-        return (f"Export failed: {e}", 500)
+        return rq.queue is not None and bool(rq.redis.ping())
+    except Exception:
+        return False
 
-    bio = BytesIO()
-    bio.write(json.dumps(payload, default=str, ensure_ascii=False, indent=2).encode('utf-8'))
-    bio.seek(0)
-    return send_file(bio, as_attachment=True, download_name='export.json', mimetype='application/json')
+
+def _export_job(job_id):
+    """The org's export job, or None."""
+    if rq.redis is None:
+        return None
+    try:
+        from rq.job import Job
+        job = Job.fetch(job_id, connection=rq.redis)
+    except Exception:
+        return None
+    if job.func_name != 'app.jobs.export.export_org_data' or (job.args or [None])[0] != current_user.org_id:
+        return None
+    return job
+
+
+@bp.route('/export/jobs/<job_id>', methods=['GET'])
+@login_required
+@admin_required
+def export_job_status(job_id):
+    job = _export_job(job_id)
+    if job is None:
+        return jsonify({'error': 'job not found'}), 404
+    status = job.get_status()
+    body = {'job_id': job.id, 'status': status}
+    if status == 'finished':
+        res = job.return_value() or {}
+        if res.get('error'):
+            body['status'] = 'failed'
+            body['error'] = res['error']
+        else:
+            body.update(filename=res.get('filename'), size=res.get('size'),
+                        download_url=url_for('.export_job_download', job_id=job.id))
+    elif status == 'failed':
+        body['error'] = 'export failed'
+    return jsonify(body)
+
+
+@bp.route('/export/jobs/<job_id>/download', methods=['GET'])
+@login_required
+@admin_required
+def export_job_download(job_id):
+    from flask import abort
+    from ...services import delivery
+    from ...services import export as export_service
+
+    job = _export_job(job_id)
+    res = (job.return_value() or {}) if job is not None and job.get_status() == 'finished' else {}
+    if not res.get('url'):
+        abort(404)
+    try:
+        return delivery.send_stored(res['url'], filename=res.get('filename'),
+                                    mimetype=export_service.mimetype(res.get('format')))
+    except FileNotFoundError:
+        abort(404)
 
 
 @bp.route('/import', methods=['GET','POST'])
 @login_required
 @admin_required
 def import_data():
+    # GET: upload form. POST: store the file and import it in the background
+    # (services/candidate_import.py); without Redis the job runs inline
+    import uuid
+    from ...jobs.candidate_import import import_candidates
+    from ...services import candidate_import as importer
+    from ...services.storage import save_file
+
     if request.method == 'GET':
         return render_template('org/import.html')
     f = request.files.get('file')
-    if not f:
+    if not f or not f.filename:
         flash('ファイルが選択されていません', 'warning')
-        return redirect(url_for('.org_settings'))
-    filename = getattr(f, 'filename', '') or ''
+        return redirect(url_for('.import_data'))
+    fmt = importer.detect_format(f.filename, f.mimetype)
+    if fmt is None:
+        flash('CSV / XLSX / JSON / NDJSON ファイルを選択してください', 'warning')
+        return redirect(url_for('.import_data'))
+    org_id = current_user.org_id
     try:
-        # If CSV, parse rows
-        if filename.lower().endswith('.csv') or f.mimetype in ('text/csv', 'application/csv'):
-            stream = (line.decode('utf-8') for line in f.stream)
-            reader = csv.DictReader(stream)
-            created = 0
-            for row in reader:
-                # map row keys to Candidate columns
-                cols = {c.name for c in Candidate.__table__.columns}
-                data = {}
-                for k, v in row.items():
-                    if k not in cols or v is None or v == '':
-                        continue
-                    # simple type conversions
-                    if k in ('grad_year',):
-                        try:
-                            data[k] = int(v)
-                        except Exception:
-                            continue
-                    elif k in ('birthdate','applied_at','offer_date','acceptance_date','join_date','decline_date'):
-                        try:
-                            data[k] = datetime.strptime(v, '%Y-%m-%d').date()
-                        except Exception:
-                            try:
-                                data[k] = datetime.strptime(v, '%Y/%m/%d').date()
-                            except Exception:
-                                continue
-                    elif k in ('qualifications','languages','skills'):
-                        try:
-                            data[k] = _json.loads(v)
-                        except Exception:
-                            # allow simple comma-separated list for qualifications/skills
-                            data[k] = [s.strip() for s in v.split(',') if s.strip()]
-                    else:
-                        data[k] = v
-                if data:
-                    c = Candidate(org_id=current_user.org_id, **data)
-                    db.session.add(c)
-                    created += 1
-            db.session.commit()
-            flash(f'CSVインポート完了: {created} 件作成しました', 'success')
-        else:
-            # fallback: try JSON import (legacy)
-            payload = _json.load(f.stream)
-            if 'candidates' in payload:
-                for row in payload['candidates']:
-                    Candidate(**{k: v for k, v in row.items() if k in [c.name for c in Candidate.__table__.columns]} )
-            db.session.commit()
-            flash('JSONインポート完了（簡易）', 'success')
+        url = save_file(f, prefix=f'imports/org{org_id}/{uuid.uuid4().hex}')
     except Exception as e:
-        db.session.rollback()
+        current_app.logger.exception('import: storing the upload failed')
         flash(f'インポート失敗: {e}', 'danger')
-    return redirect(url_for('.org_settings'))
+        return redirect(url_for('.import_data'))
+
+    job = rq.enqueue(import_candidates, org_id, url, fmt, f.filename, queue="maintenance",
+                     job_timeout=int(current_app.config.get('IMPORT_JOB_TIMEOUT_SEC', 3600)),
+                     result_ttl=int(current_app.config.get('IMPORT_RESULT_TTL_SEC', 86400)))
+    if job is None or isinstance(job, dict):
+        res = job or {'error': 'インポートに失敗しました'}
+        if res.get('error'):
+            flash(res['error'], 'danger')
+        else:
+            flash(f"インポート完了: {res['inserted']} 件作成 / {res['updated']} 件更新 / {res['failed']} 件エラー",
+                  'success' if not res['failed'] else 'warning')
+        return render_template('org/import.html', result=res)
+    return render_template('org/import.html', job_id=job.id)
+
+
+def _import_job(job_id):
+    """The org's import job, or None."""
+    if rq.redis is None:
+        return None
+    try:
+        from rq.job import Job
+        job = Job.fetch(job_id, connection=rq.redis)
+    except Exception:
+        return None
+    if job.func_name != 'app.jobs.candidate_import.import_candidates' or (job.args or [None])[0] != current_user.org_id:
+        return None
+    return job
+
+
+@bp.route('/import/jobs/<job_id>', methods=['GET'])
+@login_required
+@admin_required
+def import_job_status(job_id):
+    job = _import_job(job_id)
+    if job is None:
+        return jsonify({'error': 'job not found'}), 404
+    status = job.get_status()
+    body = {'job_id': job.id, 'status': status}
+    body.update({k: job.meta.get(k, 0) for k in ('processed', 'inserted', 'updated', 'failed')})
+    if status == 'finished':
+        res = job.return_value() or {}
+        if res.get('error'):
+            body['status'] = 'failed'
+            body['error'] = res['error']
+        else:
+            body.update({k: v for k, v in res.items() if k != 'error_report_url'})
+            if res.get('error_report_url'):
+                body['error_report_url'] = url_for('.import_job_errors', job_id=job.id)
+    elif status == 'failed':
+        body['error'] = 'インポートに失敗しました'
+    return jsonify(body)
+
+
+@bp.route('/import/jobs/<job_id>/errors.csv', methods=['GET'])
+@login_required
+@admin_required
+def import_job_errors(job_id):
+    from flask import abort
+    from ...services import delivery
+
+    job = _import_job(job_id)
+    res = (job.return_value() or {}) if job is not None and job.get_status() == 'finished' else {}
+    if not res.get('error_report_url'):
+        abort(404)
+    try:
+        return delivery.send_stored(res['error_report_url'], filename='import_errors.csv', mimetype='text/csv')
+    except FileNotFoundError:
+        abort(404)
 
 
 @bp.get('/import/template')
@@ -5,15 +5,26 @@ from redis import Redis
 from rq import Queue
 from flask import current_app
 
+# named queues, highest priority first: a worker listening on several queues
+# drains them in this order, so long STT jobs never delay the short ones
+QUEUES = ("notify", "llm", "default", "maintenance", "stt")
+
+
 class RQWrapper:
     def __init__(self):
         self.redis = None
         self.queue = None
+        self.queues = {}
 
     def init_app(self, app):
         try:
             self.redis = Redis.from_url(app.config.get("REDIS_URL"))
-            self.queue = Queue("default", connection=self.redis)
+            self.queues = {
+                name: Queue(name, connection=self.redis,
+                            default_timeout=app.config.get("RQ_STT_JOB_TIMEOUT_SEC") if name == "stt" else None)
+                for name in QUEUES
+            }
+            self.queue = self.queues["default"]
         except Exception:
             # if Redis is not available (dev machine, no redis server),
             # leave queue as None and fall back to synchronous execution
@@ -23,10 +34,14 @@ class RQWrapper:
                 pass
             self.redis = None
             self.queue = None
+            self.queues = {}
 
-    def enqueue(self, *args, **kwargs):
+    def enqueue(self, *args, queue="default", **kwargs):
         # Prefer enqueueing to RQ if available, but fall back to calling
         # the function synchronously if Redis/RQ is not reachable.
+        # ``queue`` names the queue (see QUEUES) the job is routed to.
+        if queue not in QUEUES:
+            raise ValueError(f"unknown RQ queue: {queue}")
         if not self.queue:
             # synchronous fallback
             func = args[0] if args else None
@@ -45,7 +60,7 @@ class RQWrapper:
             return None
 
         try:
-            return self.queue.enqueue(*args, **kwargs)
+            return self.queues.get(queue, self.queue).enqueue(*args, **kwargs)
         except Exception as e:
             # If enqueue fails due to Redis being down, fall back to sync execution.
             try:
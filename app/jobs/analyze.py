@@ -0,0 +1,221 @@
+"""Interview analysis pipeline (summary + AI evaluation) run as an RQ job.
+
+``POST /api/interviews/<id>/analyze`` used to make three sequential LLM
+calls inside the HTTP request. The work now runs here: the summary and the
+evaluation only depend on the transcript, so they are issued concurrently
+through ``llm_client.respond_many``, and the ``interview_evaluations`` row
+is filled from the same evaluation instead of a second ``gen_evaluation``
+call. Long transcripts are first condensed by the map stage of
+``services.summarize`` so both prompts cover the whole interview. Progress
+is published in ``job.meta['stage']`` for the status endpoint.
+"""
+import json
+import re
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from ..extensions import db
+from ..models.evaluation import Evaluation
+from ..models.interview import Interview
+from ..services import llm_client
+from ..services import transcripts as latest_transcripts
+from ..services.summarize import MODEL_MAP, condensed_transcript
+from ..services.speaking_metrics import speaking_metrics_from_utterances
+from .runtime import run_with_app
+
+# interview_evaluations rows keep gen_evaluation's scale: 0–5 per rubric item,
+# overall_score = their sum (candidate overall scores average these rows)
+EVAL_RUBRIC = ("communication", "problem_solving", "role_fit", "culture_fit")
+
+
+def _set_stage(stage):
+    try:
+        from rq import get_current_job
+        job = get_current_job()
+        if job is not None:
+            job.meta['stage'] = stage
+            job.save_meta()
+    except Exception:
+        pass
+
+
+def _load_transcript(iv, tr=None):
+    """Return ``(utterances, text)`` for the interview, or ``(None, None)``.
+
+    ``tr`` is the interview's latest transcript (loaded with it).
+    """
+    ai_segments = getattr(iv, 'ai_transcript_segments_json', None)
+    ai_transcript = getattr(iv, 'ai_transcript', None)
+    utterances = []
+    try:
+        if ai_segments:
+            utterances = json.loads(ai_segments or "[]")
+    except Exception:
+        utterances = []
+    if utterances or ai_transcript:
+        return utterances, ai_transcript or ''
+
+    # fallback: latest transcript of this interview's recordings
+    if tr is None:
+        return None, None
+    return list(tr.utterances or []), tr.text or iv.transcript_text or ''
+
+
+def _summary_prompt(material):
+    return (
+        "以下は面接の文字起こし（長い場合は区間ごとの要点メモ）です。日本語200字以内で要約してください。"
+        "固有名詞は一般化して構いません。\n\n" + material
+    )
+
+
+def _eval_prompt(material, metrics_json):
+    # 短いプロンプトで“数値＋根拠”に集中。評価は JSON で返させる（後段の集計/表示が楽）
+    # 要約と並列に実行できるよう、要約ではなく文字起こし（または要点メモ）を直接入力にする
+    return f"""
+あなたは採用面接のアナリストです。日本語で出力してください。
+入力は (1) 面接の文字起こし（[秒][話者] 発話。長い場合は区間ごとの要点メモ） (2) 話し方メトリクス です。これらを根拠に、候補者の
+communication / problem_solving / role_fit / culture_fit を0–100で採点し、
+上位3–5件の根拠（発話の短い引用＋時刻MM:SS＋該当アスペクト）を示し、
+総合スコア(ai_score)と推奨(recommendation)、200字以内の要約(summary_short)を
+JSON オブジェクトだけで出してください。
+根拠が足りない項目は推測せず、保守的に評価してください。
+
+(1) 文字起こし:
+{material}
+
+(2) 話し方メトリクス(JSON):
+{metrics_json}
+""".strip()
+
+
+def _fallback_eval(summary):
+    return {"summary_short": summary or '', "ai_score": None, "aspect_scores": {}, "top_evidence": [], "risks": [], "recommendation": "hold"}
+
+
+def _parse_eval(text, summary):
+    if not text:
+        return _fallback_eval(summary)
+    try:
+        return json.loads(text)
+    except Exception:
+        pass
+    # try to extract JSON block if the model returned text with commentary
+    try:
+        m = re.search(r"\{[\s\S]*\}", text)
+        if m:
+            return json.loads(m.group(0))
+    except Exception:
+        pass
+    return _fallback_eval(summary)
+
+
+def _rubric_scores(aspect_scores):
+    """``({rubric: 0–5 score}, total)`` from the evaluation's 0–100 aspect scores.
+
+    Missing or non-numeric aspects are left out; the total is None when
+    none could be converted.
+    """
+    scores = {}
+    for r in EVAL_RUBRIC:
+        try:
+            v = float((aspect_scores or {}).get(r))
+        except (TypeError, ValueError):
+            continue
+        scores[r] = round(min(max(v, 0.0), 100.0) / 20.0, 2)
+    total = round(sum(scores.values()), 2) if scores else None
+    return scores, total
+
+
+def _run_analyze_interview(interview_id: int):
+    iv, tr, _ = latest_transcripts.load_interview(interview_id)
+    if not iv:
+        return {"error": "interview not found"}
+    _set_stage('loading')
+    utterances, text = _load_transcript(iv, tr)
+    if utterances is None:
+        return {"error": "transcript missing"}
+
+    # 1) 話し方メトリクス
+    metrics = speaking_metrics_from_utterances(utterances)
+    metrics_json = json.dumps(metrics, ensure_ascii=False)
+
+    # 長い面接は map 段（区間ごとの要点メモ、チャンクハッシュでキャッシュ）で圧縮
+    _set_stage('map')
+    material = condensed_transcript(utterances, text)
+
+    # 2) 要約（既存の要約が無ければ生成, reduce 段）と 3) 評価 を並列に実行
+    summary = getattr(iv, 'ai_summary', None)
+    calls = []
+    if llm_client.enabled():
+        if not summary:
+            calls.append(dict(input=_summary_prompt(material), model=MODEL_MAP['reduce'], max_output_tokens=280, timeout=30,
+                              cache=True, org_id=iv.org_id))
+        calls.append(dict(input=_eval_prompt(material, metrics_json), model='gpt-4.1', max_output_tokens=800, timeout=30,
+                          cache=True, org_id=iv.org_id))
+    _set_stage('llm')
+    results = llm_client.respond_many(calls)
+    # RetryLater inside a job: let run_with_app reschedule the whole analysis
+    for r in results:
+        if isinstance(r, llm_client.RetryLater) and llm_client.should_defer():
+            raise r
+
+    eval_text = None
+    if results:
+        eval_res = results[-1]
+        if isinstance(eval_res, Exception):
+            current_app.logger.error('OpenAI eval failed: %s', eval_res)
+        else:
+            eval_text = llm_client.output_text(eval_res)
+        if len(results) == 2:
+            sum_res = results[0]
+            if isinstance(sum_res, Exception):
+                current_app.logger.error('OpenAI summary failed: %s', sum_res)
+            else:
+                summary = llm_client.output_text(sum_res).strip()
+    eval_obj = _parse_eval(eval_text, summary)
+    if not summary:
+        summary = eval_obj.get('summary_short') or ''
+
+    # 4) 保存
+    _set_stage('saving')
+    # save fields only if model has those attributes (to support older schemas)
+    if hasattr(iv, 'ai_summary'):
+        setattr(iv, 'ai_summary', summary)
+    if hasattr(iv, 'ai_metrics_json'):
+        setattr(iv, 'ai_metrics_json', metrics_json)
+    if hasattr(iv, 'ai_eval_json'):
+        setattr(iv, 'ai_eval_json', json.dumps(eval_obj, ensure_ascii=False))
+    if hasattr(iv, 'ai_score'):
+        setattr(iv, 'ai_score', eval_obj.get('ai_score'))
+    if hasattr(iv, 'ai_eval_updated_at'):
+        setattr(iv, 'ai_eval_updated_at', datetime.now(timezone.utc))
+
+    # interview_evaluations row for backward compatibility, built from the
+    # same evaluation rather than a second (redundant) LLM call
+    if eval_text:
+        rubric_scores, total = _rubric_scores(eval_obj.get('aspect_scores'))
+        ev = Evaluation(
+            org_id=iv.org_id,
+            interview_id=interview_id,
+            overall_score=total,
+            gpt_summary=eval_obj.get('summary_short') or summary,
+            raw_metrics=rubric_scores,
+        )
+        db.session.add(ev)
+    db.session.commit()
+
+    return {
+        "interview_id": interview_id,
+        "ai_score": float(iv.ai_score) if iv.ai_score is not None else None,
+        "recommendation": eval_obj.get("recommendation"),
+        "summary_short": eval_obj.get("summary_short") or (summary or '')[:200],
+        "aspect_scores": eval_obj.get("aspect_scores"),
+        "top_evidence": eval_obj.get("top_evidence"),
+        "metrics": metrics,
+    }
+
+
+def analyze_interview(interview_id: int):
+    """Job entrypoint: summarize and evaluate an interview's latest transcript."""
+    return run_with_app(_run_analyze_interview, interview_id)
@@ -0,0 +1,77 @@
+"""Background candidate import (RQ job).
+
+``/org/import`` stores the uploaded file and enqueues this job. The file is
+copied from storage to a temporary file (openpyxl needs a seekable
+file), imported with ``services.candidate_import`` and removed.
+Progress (processed / inserted / updated / failed rows) is published in
+``job.meta`` after every chunk; rejected rows are written to an error
+report CSV in storage whose URL is part of the result (when run by a
+worker; the inline fallback shows the first errors on the page instead).
+The report holds the rejected rows, emails included, so like an export it
+is deleted when the job result expires (``IMPORT_RESULT_TTL_SEC``, see
+``app/jobs/export.py``).
+"""
+import os
+import tempfile
+
+from flask import current_app
+
+from ..extensions import db
+from ..services import candidate_import as importer
+from ..services import storage
+from .export import schedule_delete
+from .runtime import run_with_app
+
+
+def _progress(job):
+    def report(result):
+        if job is None:
+            return
+        try:
+            job.meta.update(processed=result.processed, inserted=result.inserted,
+                            updated=result.updated, failed=result.failed)
+            job.save_meta()
+        except Exception:
+            pass
+    return report
+
+
+def _run_import_candidates(org_id, url, fmt, filename=None):
+    try:
+        from rq import get_current_job
+        job = get_current_job()
+    except Exception:
+        job = None
+    fd, path = tempfile.mkstemp(suffix='.' + fmt)
+    try:
+        os.close(fd)
+        storage.download_to_path(url, path)
+        with open(path, 'rb') as fp:
+            result = importer.run(org_id, importer.iter_file(fp, fmt), progress=_progress(job))
+    except Exception as e:
+        current_app.logger.exception('import: org %s file %s failed', org_id, url)
+        db.session.rollback()
+        return {'error': f'インポートに失敗しました: {e}'}
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+        storage.delete(url)
+
+    out = result.as_dict()
+    out['filename'] = filename
+    if result.errors and job is not None:
+        fd, report = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(importer.error_report_csv(result))
+        try:
+            out['error_report_url'] = storage.save_path(report, f'imports/org{org_id}/errors-{os.path.basename(report)}')
+            schedule_delete(out['error_report_url'])
+        except Exception:
+            current_app.logger.exception('import: saving the error report failed')
+            if os.path.exists(report):
+                os.remove(report)
+    return out
+
+
+def import_candidates(org_id, url, fmt, filename=None):
+    return run_with_app(_run_import_candidates, org_id, url, fmt, filename)
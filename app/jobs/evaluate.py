@@ -3,6 +3,8 @@ from ..services.openai_wrap import gen_evaluation
 from ..models.evaluation import Evaluation
 from ..models.application import Application
 from ..models.interview import Interview
+from ..services import transcripts as latest_transcripts
+from .runtime import run_with_app
 from datetime import datetime
 from flask import current_app
 import json
@@ -103,22 +105,13 @@ def _run_evaluate_application(app_id: int):
     # try to find latest transcript text and metrics for this candidate's latest interview
     transcript = app_row.latest_transcript_text()
     metrics = None
+    interview = Interview.query.filter_by(candidate_id=app_row.candidate_id).order_by(Interview.created_at.desc()).first()
     try:
-        interview = Interview.query.filter_by(candidate_id=app_row.candidate_id).order_by(Interview.created_at.desc()).first()
         if interview:
-            q = db.text(
-                """
-                SELECT t.text, t.metrics FROM transcripts t
-                JOIN recordings r ON r.id = t.recording_id
-                WHERE r.interview_id = :int_id
-                ORDER BY t.created_at DESC
-                LIMIT 1
-                """
-            )
-            res = db.session.execute(q, {"int_id": interview.id}).fetchone()
-            if res:
-                transcript = res[0] or transcript
-                metrics = res[1]
+            tr = latest_transcripts.latest_transcript(interview.id)
+            if tr:
+                transcript = tr.text or transcript
+                metrics = tr.metrics
     except Exception:
         metrics = None
 
@@ -129,7 +122,7 @@ def _run_evaluate_application(app_id: int):
         "role": "新卒エンジニア一次面接官",
         "company_values": ["誠実", "挑戦", "チームワーク"],
     }
-    res = gen_evaluation(payload)
+    res = gen_evaluation(payload, org_id=app_row.org_id)
     # compute heuristic scores and merge with AI scores
     heuristic = compute_heuristic_scores(metrics, payload.get('rubric', []))
     ai_scores = res.get('rubric_scores') or {}
@@ -147,7 +140,6 @@ def _run_evaluate_application(app_id: int):
             merged[r] = h_v
         else:
             merged[r] = None
-    interview = Interview.query.filter_by(candidate_id=app_row.candidate_id).order_by(Interview.created_at.desc()).first()
     interview_id = interview.id if interview else None
     ev = Evaluation(org_id=app_row.org_id,
                     interview_id=interview_id,
@@ -180,23 +172,12 @@ def _run_evaluate_application(app_id: int):
 
 
 def _run_evaluate_interview(interview_id: int):
-    interview = Interview.query.get(interview_id)
+    # interview and its latest transcript in one query
+    interview, tr, _ = latest_transcripts.load_interview(interview_id)
     if not interview:
         return None
-
-    # find latest transcript text for this interview
-    q = db.text(
-        """
-        SELECT t.text, t.metrics FROM transcripts t
-        JOIN recordings r ON r.id = t.recording_id
-        WHERE r.interview_id = :int_id
-        ORDER BY t.created_at DESC
-        LIMIT 1
-        """
-    )
-    res = db.session.execute(q, {"int_id": interview_id}).fetchone()
-    transcript = res[0] if res else ""
-    metrics = res[1] if res and len(res) > 1 else None
+    transcript = (tr.text or "") if tr else ""
+    metrics = tr.metrics if tr else None
 
     payload = {
         "rubric": ["speaking", "logical", "volume", "honesty", "proactive"],
@@ -205,7 +186,7 @@ def _run_evaluate_interview(interview_id: int):
     "metrics": metrics,
         "company_values": [],
     }
-    gen_res = gen_evaluation(payload)
+    gen_res = gen_evaluation(payload, org_id=interview.org_id)
     # compute heuristic scores and merge with AI scores
     heuristic = compute_heuristic_scores(metrics, payload.get('rubric', []))
     ai_scores = gen_res.get('rubric_scores') or {}
@@ -264,21 +245,9 @@ def _run_evaluate_interview(interview_id: int):
 
 def evaluate_application(app_id: int):
     """Entrypoint that ensures execution inside a Flask app context for workers."""
-    try:
-        from app import create_app
-        app = create_app()
-        with app.app_context():
-            return _run_evaluate_application(app_id)
-    except Exception:
-        return _run_evaluate_application(app_id)
+    return run_with_app(_run_evaluate_application, app_id)
 
 
 def evaluate_interview(interview_id: int):
     """Entrypoint that ensures execution inside a Flask app context for workers."""
-    try:
-        from app import create_app
-        app = create_app()
-        with app.app_context():
-            return _run_evaluate_interview(interview_id)
-    except Exception:
-        return _run_evaluate_interview(interview_id)
\ No newline at end of file
+    return run_with_app(_run_evaluate_interview, interview_id)
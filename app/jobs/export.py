@@ -0,0 +1,98 @@
+"""Background org data export (RQ job).
+
+Runs the same streaming generators as ``/org/export``
+(``app/services/export.py``) into a temporary file, then stores it with
+``storage.save_path`` under ``exports/org<id>/``. The stored URL is the job
+result; ``/org/export/jobs/<job_id>/download`` streams it back.
+
+The file holds every candidate's personal data and transcripts, and the
+job result is its only link, so it is deleted when the result expires
+(``EXPORT_RESULT_TTL_SEC``): the job schedules ``delete_export`` for that
+moment. The candidate import's error reports (``imports/``, rejected rows
+with their emails) are handled the same way. ``purge_exports``
+(``scripts/cleanup_storage.py``) removes files whose deletion was never
+scheduled or got lost with Redis.
+"""
+import os
+import tempfile
+from datetime import timedelta
+
+from flask import current_app
+
+from ..services import export as export_service
+from ..services import storage
+from .runtime import run_with_app
+
+# generated files, and the setting for how long their job result (the only
+# link to them) is kept
+_GENERATED = (('exports/', 'EXPORT_RESULT_TTL_SEC'), ('imports/', 'IMPORT_RESULT_TTL_SEC'))
+
+
+def _run_export_org_data(org_id, tables, fmt):
+    name = export_service.filename(fmt, org_id)
+    batch = int(current_app.config.get('EXPORT_BATCH_SIZE', 500))
+    fd, path = tempfile.mkstemp(suffix='.' + name.rsplit('.', 1)[-1])
+    try:
+        size = 0
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in export_service.stream(fmt, org_id, tables, batch):
+                out.write(chunk)
+                size += len(chunk)
+        url = storage.save_path(path, f'exports/org{org_id}/{name}')
+    except Exception:
+        current_app.logger.exception('export: org %s failed', org_id)
+        if os.path.exists(path):
+            os.remove(path)
+        return {'error': 'export failed'}
+    schedule_delete(url)
+    return {'url': url, 'filename': name, 'size': size, 'format': fmt}
+
+
+def _result_ttl(job) -> int:
+    if job.result_ttl is not None:
+        return int(job.result_ttl)
+    return int(current_app.config.get('EXPORT_RESULT_TTL_SEC', 86400))
+
+
+def schedule_delete(url):
+    """Enqueue the deletion of stored file ``url`` for when the current job's result expires."""
+    try:
+        from rq import Queue, get_current_job
+        job = get_current_job()
+        if job is None:
+            return
+        ttl = _result_ttl(job)
+        if ttl < 0:
+            # result kept forever (result_ttl=-1): so is the file
+            return
+        Queue(job.origin, connection=job.connection).enqueue_in(timedelta(seconds=ttl), delete_export, url)
+    except Exception:
+        current_app.logger.exception('could not schedule deletion of %s', url)
+
+
+def _run_delete_export(url):
+    return storage.delete(url)
+
+
+def _run_purge_exports(max_age_sec=None):
+    n = 0
+    for prefix, key in _GENERATED:
+        max_age = max_age_sec if max_age_sec is not None else current_app.config.get(key, 86400)
+        n += storage.delete_older_than(prefix, int(max_age))
+    if n:
+        current_app.logger.info('export: purged %s expired export/import file(s)', n)
+    return n
+
+
+def export_org_data(org_id, tables, fmt='ndjson'):
+    return run_with_app(_run_export_org_data, org_id, tables, fmt)
+
+
+def delete_export(url):
+    """Job entrypoint: delete a stored export / error report whose job result expired."""
+    return run_with_app(_run_delete_export, url)
+
+
+def purge_exports(max_age_sec=None):
+    """Job entrypoint: delete stored exports and import files older than their result TTL; returns how many."""
+    return run_with_app(_run_purge_exports, max_age_sec)
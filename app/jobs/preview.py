@@ -0,0 +1,29 @@
+"""Render and store the HTML preview of an uploaded file (see ``services.preview``).
+
+Enqueued by ``candidates.upload_resume`` so the first view of a resume is
+already served from the stored preview.
+"""
+from flask import current_app
+
+from ..extensions import db
+from ..models.file import Files
+from ..services import preview
+from .runtime import run_with_app
+
+
+def _run_render_file_preview(file_id: int):
+    f = db.session.get(Files, file_id)
+    if not f or not f.storage_url:
+        return None
+    if preview.cached(f) is not None:
+        return preview.cached(f)
+    try:
+        return preview.generate(f)
+    except Exception:
+        current_app.logger.exception('preview: file %s failed', file_id)
+        db.session.rollback()
+        return None
+
+
+def render_file_preview(file_id: int):
+    return run_with_app(_run_render_file_preview, file_id)
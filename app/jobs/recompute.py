@@ -0,0 +1,79 @@
+"""Re-derive transcripts from stored raw STT output, without re-transcribing.
+
+After an admin changes DG_WORD_GAP_THRESHOLD or FILLER_TOKENS on the
+org/heuristic page, these jobs re-run utterance building, post-processing,
+filler counting and speaking metrics over ``Transcript.raw_response``.
+"""
+from flask import current_app
+from sqlalchemy.orm import undefer
+
+from ..extensions import db
+from ..models.transcript import Transcript
+from .runtime import run_with_app
+from .transcribe import derive_transcript, heuristic_params, raw_transcript_text
+
+
+def _recompute(tr: Transcript, params) -> bool:
+    raw = tr.raw_response
+    if not raw:
+        return False
+    # whisper-fallback transcripts have no text in raw; keep the stored text
+    text = raw_transcript_text(raw) or tr.text
+    derived = derive_transcript(raw, text, lang=tr.lang or 'ja', **params)
+    tr.utterances = derived['utterances']
+    tr.metrics = derived['metrics']
+    tr.text = derived['text']
+    return True
+
+
+def _run_recompute_transcript(transcript_id: int):
+    tr = Transcript.query.options(undefer(Transcript.raw_response)).get(transcript_id)
+    if not tr:
+        return None
+    updated = _recompute(tr, heuristic_params(tr.org_id))
+    db.session.commit()
+    return updated
+
+
+def _run_recompute_org_transcripts(org_id: int, batch_size: int = 200):
+    """Recompute every transcript of ``org_id`` that has raw output, in batches.
+
+    Each batch is committed and expunged so memory stays bounded no matter
+    how many transcripts the org has.
+    """
+    params = heuristic_params(org_id)
+    stats = {'processed': 0, 'updated': 0, 'failed': 0}
+    last_id = 0
+    while True:
+        ids = [r[0] for r in (
+            db.session.query(Transcript.id)
+            .filter(Transcript.org_id == org_id, Transcript.raw_response.isnot(None), Transcript.id > last_id)
+            .order_by(Transcript.id.asc())
+            .limit(batch_size)
+        ).all()]
+        if not ids:
+            break
+        rows = Transcript.query.options(undefer(Transcript.raw_response)).filter(Transcript.id.in_(ids)).all()
+        for tr in rows:
+            stats['processed'] += 1
+            try:
+                if _recompute(tr, params):
+                    stats['updated'] += 1
+            except Exception:
+                stats['failed'] += 1
+                current_app.logger.exception('Recompute failed for transcript %s', tr.id)
+        db.session.commit()
+        db.session.expunge_all()
+        last_id = ids[-1]
+    current_app.logger.info('Recomputed transcripts for org %s: %s', org_id, stats)
+    return stats
+
+
+def recompute_transcript(transcript_id: int):
+    """Job entrypoint: re-derive one transcript from its stored raw output."""
+    return run_with_app(_run_recompute_transcript, transcript_id)
+
+
+def recompute_org_transcripts(org_id: int, batch_size: int = 200):
+    """Job entrypoint: re-derive all transcripts of an org from stored raw output."""
+    return run_with_app(_run_recompute_org_transcripts, org_id, batch_size)
@@ -0,0 +1,131 @@
+"""Worker-side runtime shared by the RQ job entrypoints.
+
+Building the Flask app (blueprints, SQLAlchemy engine, Redis connection,
+Jinja environment) is far more expensive than most evaluation jobs, so the
+worker builds it once per process and every entrypoint runs through
+``run_with_app`` instead of calling ``create_app()`` itself.
+
+``scripts/run_rq_worker.py`` registers the app it already creates via
+``register_app``; outside of that script the first job lazily builds one.
+"""
+import os
+import time
+
+from flask import current_app, has_app_context
+
+from ..extensions import db
+from ..services.llm_client import RetryLater
+
+_app = None
+_app_pid = None
+
+
+def register_app(app):
+    """Use ``app`` for all jobs executed by this process."""
+    global _app, _app_pid
+    _app = app
+    _app_pid = os.getpid()
+    return app
+
+
+def get_app():
+    """Return the process-wide app, creating it on first use."""
+    if _app is None:
+        from app import create_app
+        register_app(create_app())
+    _ensure_fork_safe()
+    return _app
+
+
+def _ensure_fork_safe():
+    # RQ's default Worker forks a work horse per job. Pooled DB connections
+    # inherited from the parent must not be shared with the child, so drop
+    # them (without closing the parent's sockets) the first time we run in
+    # a new pid.
+    global _app_pid
+    if _app is None or _app_pid == os.getpid():
+        return
+    try:
+        with _app.app_context():
+            db.engine.dispose(close=False)
+    except Exception:
+        pass
+    _app_pid = os.getpid()
+
+
+def _report_timing(func, setup_sec, work_sec):
+    name = getattr(func, '__name__', str(func))
+    try:
+        current_app.logger.info('job %s: setup=%.3fs work=%.3fs', name, setup_sec, work_sec)
+    except Exception:
+        pass
+    try:
+        from rq import get_current_job
+        job = get_current_job()
+        if job is not None:
+            job.meta['timing'] = {'setup_sec': round(setup_sec, 4), 'work_sec': round(work_sec, 4)}
+            job.save_meta()
+    except Exception:
+        pass
+
+
+def _reschedule(delay_sec):
+    """Re-enqueue the current RQ job after ``delay_sec``; True if scheduled."""
+    try:
+        from datetime import timedelta
+        from rq import Queue, get_current_job
+        job = get_current_job()
+        if job is None:
+            return False
+        count = int(job.meta.get('llm_reschedules', 0)) + 1
+        queue = Queue(job.origin, connection=job.connection)
+        new_job = queue.enqueue_in(timedelta(seconds=max(1, int(delay_sec) + 1)), job.func_name,
+                                   args=job.args, kwargs=job.kwargs, job_timeout=job.timeout,
+                                   result_ttl=job.result_ttl, meta={'llm_reschedules': count})
+        # let status pollers follow the job to its rescheduled copy
+        job.meta['rescheduled_as'] = new_job.id
+        job.save_meta()
+        current_app.logger.warning('job %s rate limited, rescheduled in %.0fs (attempt %s)',
+                                   job.func_name, delay_sec, count)
+        return True
+    except Exception:
+        current_app.logger.exception('Failed to reschedule rate-limited job')
+        return False
+
+
+def run_with_app(func, *args, **kwargs):
+    """Run ``func`` inside a fresh app context of the long-lived app.
+
+    A new context is pushed per job so the scoped DB session is removed at
+    the end of every job, while the engine and its connection pool are
+    reused. When already inside an app context (e.g. the synchronous
+    fallback of ``rq.enqueue`` during a request) that app is reused instead
+    of building another one.
+
+    If the job raises ``RetryLater`` (LLM rate limit) it is re-enqueued with
+    a delay instead of failing or blocking the worker.
+    """
+    t0 = time.perf_counter()
+    try:
+        if has_app_context():
+            app = current_app._get_current_object()
+            _ensure_fork_safe()
+        else:
+            app = get_app()
+    except Exception:
+        # If app creation fails for some reason, try to run directly
+        return func(*args, **kwargs)
+
+    with app.app_context():
+        t1 = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except RetryLater as e:
+            # LLM rate limited: free the worker and retry the job later
+            # instead of sleeping through the backoff here
+            db.session.rollback()
+            if _reschedule(e.retry_after):
+                return None
+            raise
+        finally:
+            _report_timing(func, t1 - t0, time.perf_counter() - t1)
@@ -1,10 +1,14 @@
 from ..extensions import db
-from ..services.storage import download_bytes
+from ..services.storage import open_stream
 from ..services.openai_wrap import transcribe_whisper, deepgram_raw_transcribe
+from ..services.stt_segments import transcribe_segmented
+from ..services import stt_cache, blobs
+from ..services import transcripts as latest_transcripts
 from ..models.transcript import Transcript
 from ..models.recording import Recording
 from ..extensions import rq
 from ..jobs.evaluate import evaluate_interview
+from .runtime import run_with_app
 from ..services.speaking_metrics import speaking_metrics_from_utterances
 from flask import current_app
 from ..services.postprocess import process_utterances
@@ -56,31 +60,55 @@ def _format_transcript_text(raw_text, utterances=None, lang='ja'):
             s = '\n\n'.join(parts)
         return s
 
-def _run_transcribe(recording_id: int, lang: str = "ja"):
-    rec = Recording.query.get(recording_id)
-    audio = download_bytes(rec.storage_url)
-    # extract filename from storage_url if file://
-    filename = None
-    if rec.storage_url and rec.storage_url.startswith('file://'):
-        filename = rec.storage_url.replace('file://', '')
-    # prefer the raw Deepgram response so we can compute detailed metrics
+DEFAULT_FILLER_TOKENS = 'えー,あの,えっと,うーん,うー,あー,um,uh'
+
+
+def heuristic_params(org_id):
+    """Return the org's utterance/filler heuristics for ``derive_transcript``.
+
+    Values saved on the org/heuristic page (settings table) win over app config.
+    """
+    values = {
+        'DG_WORD_GAP_THRESHOLD': current_app.config.get('DG_WORD_GAP_THRESHOLD', 0.35),
+        'FILLER_TOKENS': current_app.config.get('FILLER_TOKENS', DEFAULT_FILLER_TOKENS),
+    }
     try:
-        dg_opts = current_app.config.get('DEEPGRAM_OPTIONS', {}) or {}
-        current_app.logger.info('Deepgram options: %s', dg_opts)
+        from ..models.setting import Setting
+        rows = Setting.query.filter(Setting.org_id == org_id, Setting.key.in_(list(values))).all()
+        for r in rows:
+            if r.value is not None:
+                values[r.key] = r.value
     except Exception:
-        dg_opts = {}
-    raw = deepgram_raw_transcribe(audio_bytes=audio, language=lang, filename=filename)
-    # best-effort extract text
-    text = None
+        pass
     try:
-        text = raw.get('results', {}).get('channels', [])[0].get('alternatives', [])[0].get('transcript')
+        gap = float(values['DG_WORD_GAP_THRESHOLD'])
     except Exception:
-        text = None
-    if not text:
-        text = transcribe_whisper(audio_bytes=audio, language=lang, filename=filename)
+        gap = 0.35
+    fillers = [f.strip() for f in str(values['FILLER_TOKENS'] or '').split(',') if f.strip()]
+    return {'gap_threshold': gap, 'filler_tokens': fillers}
+
 
-    # extract utterances if present (Deepgram 'utterances' array) or build from alternatives
-    utterances = None
+def _raw_words(raw):
+    try:
+        return raw.get('results', {}).get('channels', [])[0].get('alternatives', [])[0].get('words')
+    except Exception:
+        return None
+
+
+def raw_transcript_text(raw):
+    """Best-effort plain transcript from a raw Deepgram response."""
+    try:
+        return raw.get('results', {}).get('channels', [])[0].get('alternatives', [])[0].get('transcript')
+    except Exception:
+        return None
+
+
+def extract_utterances(raw, gap_threshold=0.35):
+    """Utterances from Deepgram's 'utterances' array, or grouped from words.
+
+    Word grouping starts a new utterance on a speaker change or a gap longer
+    than ``gap_threshold`` seconds.
+    """
     try:
         utt = raw.get('utterances')
         if utt:
@@ -93,133 +121,245 @@ def _run_transcribe(recording_id: int, lang: str = "ja"):
                     'end': u.get('end'),
                     'text': u.get('transcript') or u.get('text') or ''
                 })
-        else:
-            # fallback: try to build utterances from word-level results
-            try:
-                words = raw.get('results', {}).get('channels', [])[0].get('alternatives', [])[0].get('words')
-                if words:
-                    utterances = []
-                    current = None
-                    GAP_THRESH = current_app.config.get('DG_WORD_GAP_THRESHOLD', 0.35)
-                    for w in words:
-                        spk = w.get('speaker') if w.get('speaker') is not None else None
-                        start = w.get('start')
-                        end = w.get('end')
-                        text = w.get('punctuated_word') or w.get('word') or ''
-                        if current is None:
-                            current = {'speaker': spk, 'start': start, 'end': end, 'text': text}
-                        else:
-                            # if speaker changed (labels present) or gap is large, finalize current
-                            gap = (start - current['end']) if (start is not None and current.get('end') is not None) else None
-                            speaker_changed = (spk is not None and current.get('speaker') is not None and spk != current.get('speaker'))
-                            if speaker_changed or (gap is not None and gap > GAP_THRESH):
-                                utterances.append(current)
-                                current = {'speaker': spk, 'start': start, 'end': end, 'text': text}
-                            else:
-                                # extend current utterance
-                                current['end'] = end or current.get('end')
-                                if current.get('text'):
-                                    current['text'] += ' ' + text
-                                else:
-                                    current['text'] = text
-                    if current:
-                        utterances.append(current)
+            return utterances
+    except Exception:
+        return None
+
+    # fallback: try to build utterances from word-level results
+    try:
+        words = _raw_words(raw)
+        if not words:
+            return None
+        utterances = []
+        current = None
+        for w in words:
+            spk = w.get('speaker') if w.get('speaker') is not None else None
+            start = w.get('start')
+            end = w.get('end')
+            word = w.get('punctuated_word') or w.get('word') or ''
+            if current is None:
+                current = {'speaker': spk, 'start': start, 'end': end, 'text': word}
+            else:
+                # if speaker changed (labels present) or gap is large, finalize current
+                gap = (start - current['end']) if (start is not None and current.get('end') is not None) else None
+                speaker_changed = (spk is not None and current.get('speaker') is not None and spk != current.get('speaker'))
+                if speaker_changed or (gap is not None and gap > gap_threshold):
+                    utterances.append(current)
+                    current = {'speaker': spk, 'start': start, 'end': end, 'text': word}
                 else:
-                    utterances = None
+                    # extend current utterance
+                    current['end'] = end or current.get('end')
+                    if current.get('text'):
+                        current['text'] += ' ' + word
+                    else:
+                        current['text'] = word
+        if current:
+            utterances.append(current)
+        return utterances
+    except Exception:
+        return None
+
+
+def _speaking_metrics(raw, utterances, proc_utterances, filler_tokens):
+    metrics = speaking_metrics_from_utterances(proc_utterances)
+    # compute filler rate using word-level fallback when possible
+    total_words = 0
+    filler_count = 0
+    try:
+        words = raw.get('results', {}).get('channels', [])[0].get('alternatives', [])[0].get('words')
+        if words:
+            for w in words:
+                token = (w.get('punctuated_word') or w.get('word') or '').lower()
+                if token:
+                    total_words += 1
+                    for f in filler_tokens:
+                        if f in token:
+                            filler_count += 1
+    except Exception:
+        # fallback to counting in utterance text
+        total_words = sum(len(u.get('text','').split()) for u in utterances) or 1
+        for u in utterances:
+            t = u.get('text','').lower()
+            for f in filler_tokens:
+                filler_count += t.count(f)
+    metrics['filler_rate'] = (filler_count / total_words) if total_words else 0.0
+    # Normalize metrics: ensure dict, parse nested JSON strings
+    try:
+        import json
+        if isinstance(metrics, str):
+            try:
+                metrics = json.loads(metrics)
+            except Exception:
+                try:
+                    metrics = eval(metrics)
+                except Exception:
+                    metrics = {}
+        # If speaking_metrics is a JSON string, parse it
+        sm = metrics.get('speaking_metrics') if isinstance(metrics, dict) else None
+        if isinstance(sm, str):
+            try:
+                metrics['speaking_metrics'] = json.loads(sm)
             except Exception:
-                utterances = None
+                try:
+                    metrics['speaking_metrics'] = eval(sm)
+                except Exception:
+                    # leave as string if unparsable
+                    pass
     except Exception:
-        utterances = None
+        # if normalization fails, ensure metrics is a dict
+        try:
+            metrics = dict(metrics) if metrics else {}
+        except Exception:
+            metrics = {}
+    return metrics
 
-    # Create initial Transcript row in 'processing' state so UI can reflect work in progress.
-    tr = Transcript(org_id=rec.org_id, recording_id=rec.id, text=text or '', lang=lang, status='processing')
-    db.session.add(tr)
-    db.session.commit()
-    # attach raw utterances and derived metrics when available
+
+def derive_transcript(raw, text, lang='ja', gap_threshold=0.35, filler_tokens=None):
+    """Derive utterances, speaking metrics and display text from raw STT output.
+
+    Pure post-processing (no network), shared by the transcription job and
+    the offline recompute job. Returns a dict with ``utterances`` (post-
+    processed, or None), ``metrics`` (or None) and ``text``.
+    """
+    if filler_tokens is None:
+        filler_tokens = DEFAULT_FILLER_TOKENS.split(',')
+    utterances = extract_utterances(raw or {}, gap_threshold)
+    proc_utterances = None
+    metrics = None
     if utterances:
         # apply post-processing heuristics to improve merging/backchannels/switchbacks
         try:
             proc_utterances = process_utterances(utterances, lang=lang)
         except Exception:
             proc_utterances = utterances
-
-        tr.utterances = proc_utterances
         try:
-            metrics = speaking_metrics_from_utterances(proc_utterances)
-            # compute filler rate using word-level fallback when possible
-            filler_tokens = current_app.config.get('FILLER_TOKENS', 'えー,あの,えっと,うーん,うー,あー,um,uh').split(',')
-            total_words = 0
-            filler_count = 0
-            try:
-                words = raw.get('results', {}).get('channels', [])[0].get('alternatives', [])[0].get('words')
-                if words:
-                    for w in words:
-                        token = (w.get('punctuated_word') or w.get('word') or '').lower()
-                        if token:
-                            total_words += 1
-                            for f in filler_tokens:
-                                if f in token:
-                                    filler_count += 1
-            except Exception:
-                # fallback to counting in utterance text
-                total_words = sum(len(u.get('text','').split()) for u in utterances) or 1
-                for u in utterances:
-                    t = u.get('text','').lower()
-                    for f in filler_tokens:
-                        filler_count += t.count(f)
-            metrics['filler_rate'] = (filler_count / total_words) if total_words else 0.0
-            # Normalize metrics: ensure dict, parse nested JSON strings
-            try:
-                import json
-                if isinstance(metrics, str):
-                    try:
-                        metrics = json.loads(metrics)
-                    except Exception:
-                        try:
-                            metrics = eval(metrics)
-                        except Exception:
-                            metrics = {}
-                # If speaking_metrics is a JSON string, parse it
-                sm = metrics.get('speaking_metrics') if isinstance(metrics, dict) else None
-                if isinstance(sm, str):
-                    try:
-                        metrics['speaking_metrics'] = json.loads(sm)
-                    except Exception:
-                        try:
-                            metrics['speaking_metrics'] = eval(sm)
-                        except Exception:
-                            # leave as string if unparsable
-                            pass
-            except Exception:
-                # if normalization fails, ensure metrics is a dict
-                try:
-                    metrics = dict(metrics) if metrics else {}
-                except Exception:
-                    metrics = {}
-            tr.metrics = metrics
+            metrics = _speaking_metrics(raw or {}, utterances, proc_utterances, filler_tokens)
         except Exception:
-            tr.metrics = None
-    else:
-        tr.utterances = None
-        tr.metrics = None
-    # Format a readable transcript for UI: prefer utterances when available
+            metrics = None
+    # Format a readable transcript for UI: prefer the post-processed utterances
     try:
-        # Prefer the post-processed utterances when building the human-readable text.
-        used_utterances = None
-        if 'proc_utterances' in locals() and proc_utterances:
-            used_utterances = proc_utterances
-        elif utterances:
-            used_utterances = utterances
-        formatted = _format_transcript_text(text, utterances=used_utterances, lang=lang)
-        tr.text = formatted or (text or '')
+        formatted = _format_transcript_text(text, utterances=proc_utterances or utterances, lang=lang)
+        formatted = formatted or (text or '')
     except Exception:
         # fallback to raw text
-        tr.text = text or ''
+        formatted = text or ''
+    return {'utterances': proc_utterances if utterances else None, 'metrics': metrics, 'text': formatted}
+
+
+def _reuse_transcript(rec, donor, lang):
+    """Copy ``donor`` (same audio, see services/blobs.py) to ``rec`` instead of transcribing again."""
+    tr = Transcript(org_id=rec.org_id, recording_id=rec.id, text=donor.text or '', lang=lang, status='ok',
+                    utterances=donor.utterances, metrics=donor.metrics, raw_response=donor.raw_response)
+    db.session.add(tr)
+    db.session.flush()
+    if getattr(rec, 'interview_id', None):
+        latest_transcripts.set_latest(int(rec.interview_id), tr.id)
+        from ..models.interview import Interview
+        interview = Interview.query.get(int(rec.interview_id))
+        if interview:
+            interview.transcript_text = tr.text
+    db.session.commit()
+    try:
+        if getattr(rec, 'interview_id', None):
+            rq.enqueue(evaluate_interview, int(rec.interview_id), queue="llm")
+    except Exception:
+        current_app.logger.exception('Failed to enqueue evaluate_interview')
+    return tr.id
+
+
+def _run_transcribe(recording_id: int, lang: str = "ja"):
+    rec = Recording.query.get(recording_id)
+    if blobs.hash_known(rec):
+        return _transcribe(rec, lang, rec.storage_url)
+    # not hashed yet (S3 direct uploads, older recordings): one download is
+    # hashed and then read by the segmenter / STT upload
+    with blobs.local_copy(rec.storage_url) as (path, sha256, size):
+        return _transcribe(rec, lang, 'file://' + path, hashed=(sha256, size))
+
+
+def _transcribe(rec, lang, audio_url, hashed=None):
+    """Transcribe ``rec``, reading its audio from ``audio_url`` (the stored object or a local copy)."""
+    # content hash (points duplicates at the stored copy); a duplicate of an
+    # already transcribed recording skips STT
+    audio_sha256 = None
+    try:
+        audio_sha256, _ = blobs.recording_hash(rec, hashed=hashed)
+        donor = blobs.find_transcript(rec, lang)
+        if donor is not None:
+            current_app.logger.info('recording %s: same audio as transcript %s, reusing it', rec.id, donor.id)
+            return _reuse_transcript(rec, donor, lang)
+    except Exception:
+        current_app.logger.exception('recording %s: content hash failed', rec.id)
+        db.session.rollback()
+    # extract filename from the audio url if file://
+    filename = None
+    if audio_url.startswith('file://'):
+        filename = audio_url.replace('file://', '')
+    # prefer the raw Deepgram response so we can compute detailed metrics
+    try:
+        dg_opts = current_app.config.get('DEEPGRAM_OPTIONS', {}) or {}
+        current_app.logger.info('Deepgram options: %s', dg_opts)
+    except Exception:
+        dg_opts = {}
+    # reuse a cached response for identical audio + options (re-analysis)
+    raw = None
+    try:
+        audio_sha256 = audio_sha256 or stt_cache.content_sha256(audio_url)
+        raw = stt_cache.get(audio_sha256, lang)
+    except Exception:
+        current_app.logger.exception('STT cache lookup failed')
+    if raw is None:
+        # long recordings: transcribe overlapping windows in parallel and stitch
+        try:
+            raw = transcribe_segmented(audio_url, language=lang, filename=filename,
+                                       duration=rec.duration_sec)
+        except Exception:
+            current_app.logger.exception('Segmented transcription failed, falling back to single request')
+            raw = None
+        if raw is None:
+            # stream the recording to Deepgram instead of loading it into memory
+            with open_stream(audio_url) as audio:
+                raw = deepgram_raw_transcribe(audio_bytes=audio, language=lang, filename=filename)
+        # only cache complete responses
+        if raw and not (raw.get('metadata') or {}).get('segments_failed'):
+            try:
+                stt_cache.put(audio_sha256, lang, raw)
+            except Exception:
+                current_app.logger.exception('STT cache store failed')
+    # remember the length so later runs decide on segmentation without probing
+    if rec.duration_sec is None and ((raw or {}).get('metadata') or {}).get('duration'):
+        try:
+            rec.duration_sec = int(round(float(raw['metadata']['duration'])))
+        except (TypeError, ValueError):
+            pass
+    # best-effort extract text
+    text = raw_transcript_text(raw)
+    if not text:
+        # the first stream was consumed by the upload; open a fresh one
+        with open_stream(audio_url) as audio:
+            text = transcribe_whisper(audio_bytes=audio, language=lang, filename=filename)
+
+    # Create initial Transcript row in 'processing' state so UI can reflect work in progress.
+    tr = Transcript(org_id=rec.org_id, recording_id=rec.id, text=text or '', lang=lang, status='processing')
+    db.session.add(tr)
+    db.session.flush()
+    # the interview points at its newest transcript (same transaction as the insert)
+    if getattr(rec, 'interview_id', None):
+        latest_transcripts.set_latest(int(rec.interview_id), tr.id)
+    db.session.commit()
+    # keep the raw STT output so utterances/metrics can be re-derived offline
+    if raw:
+        tr.raw_response = raw
+    # attach utterances, derived metrics and a readable transcript for the UI
+    derived = derive_transcript(raw, text, lang=lang, **heuristic_params(rec.org_id))
+    tr.utterances = derived['utterances']
+    tr.metrics = derived['metrics']
+    tr.text = derived['text']
 
     try:
         db.session.add(tr)
-        db.session.commit()
-        # also persist full transcript text to Interview for quick access
+        # also persist full transcript text to Interview for quick access,
+        # committed together with the transcript
         try:
             if rec and getattr(rec, 'interview_id', None):
                 from ..models.interview import Interview
@@ -227,19 +367,25 @@ def _run_transcribe(recording_id: int, lang: str = "ja"):
                 if interview:
                     interview.transcript_text = tr.text
                     db.session.add(interview)
-                    db.session.commit()
         except Exception:
             # do not fail the job if interview update fails
             current_app.logger.exception('Failed to update Interview.transcript_text')
+        db.session.commit()
         # enqueue evaluation job for the interview (if recording.interview_id present)
         try:
             if rec and getattr(rec, "interview_id", None):
-                rq.enqueue(evaluate_interview, int(rec.interview_id))
+                rq.enqueue(evaluate_interview, int(rec.interview_id), queue="llm")
         except Exception:
             current_app.logger.exception('Failed to enqueue evaluate_interview')
-        # mark transcript as successful
-        tr.status = 'ok'
-        tr.error = None
+        # mark transcript as successful; windows the segmenter could not
+        # transcribe leave gaps, so such a transcript is only partial
+        failed = ((raw or {}).get('metadata') or {}).get('segments_failed')
+        if failed:
+            tr.status = 'partial'
+            tr.error = f"{failed}/{raw['metadata'].get('segments')} segments failed"
+        else:
+            tr.status = 'ok'
+            tr.error = None
         db.session.add(tr)
         db.session.commit()
     except Exception as e:
@@ -261,12 +407,4 @@ def transcribe_recording(recording_id: int, lang: str = "ja"):
     so RQ workers can call this function without requiring the caller to
     set up the app context.
     """
-    # lazy import to avoid circular imports at module import time
-    try:
-        from app import create_app
-        app = create_app()
-        with app.app_context():
-            return _run_transcribe(recording_id, lang)
-    except Exception:
-        # If app creation fails for some reason, try to run directly
-        return _run_transcribe(recording_id, lang)
\ No newline at end of file
+    return run_with_app(_run_transcribe, recording_id, lang)
@@ -10,4 +10,8 @@ from .evaluation import Evaluation
 from .notification import Notification
 from .file import Files
 from .candidate_overall_evaluation import CandidateOverallEvaluation
+from .stt_cache import SttCacheEntry
+from .daily_stat import OrgDailyStat
+from .search_document import SearchDocument
+from .stored_blob import StoredBlob
 # base and mixins are imported by the above as needed
\ No newline at end of file
@@ -10,6 +10,11 @@ class Application(db.Model, OrgScopedMixin, TimestampMixin):
     score_avg = db.Column(db.Float)
     last_evaluated_at = db.Column(db.DateTime)
 
+    __table_args__ = (
+        db.Index('ix_applications_org_created_at', 'org_id', 'created_at'),
+        db.Index('ix_applications_org_created_date', 'org_id', db.text('date(created_at)')),
+    )
+
     def latest_transcript_text(self):
         q = db.text(
             """
@@ -41,5 +41,10 @@ class Candidate(db.Model, OrgScopedMixin, TimestampMixin):
     # 外部キー/メタ
     evaluate_key = db.Column(db.String(64))  # UUID/任意
 
+    __table_args__ = (
+        db.Index('ix_candidates_org_applied_at', 'org_id', 'applied_at'),
+        db.Index('ix_candidates_org_status_applied_at', 'org_id', 'status', 'applied_at'),
+    )
+
     def __repr__(self) -> str:
         return f"<Candidate id={self.id} name={self.name!r}>"
\ No newline at end of file
@@ -0,0 +1,24 @@
+from ..extensions import db
+from .base import OrgScopedMixin
+
+
+class OrgDailyStat(db.Model, OrgScopedMixin):
+    """Per-org, per-day counters for the home dashboard (kept by services.daily_stats)."""
+    __tablename__ = "org_daily_stats"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # OrgScopedMixin: org_id
+    day = db.Column(db.Date, nullable=False)
+    candidates = db.Column(db.Integer, nullable=False, default=0, server_default='0')     # candidates.applied_at
+    applications = db.Column(db.Integer, nullable=False, default=0, server_default='0')   # applications.created_at
+    interviews = db.Column(db.Integer, nullable=False, default=0, server_default='0')     # interviews.created_at
+    evaluations = db.Column(db.Integer, nullable=False, default=0, server_default='0')    # interview_evaluations.created_at
+    hires = db.Column(db.Integer, nullable=False, default=0, server_default='0')          # candidates.acceptance_date
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('org_id', 'day', name='uq_org_daily_stats_org_day'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<OrgDailyStat org_id={self.org_id} day={self.day}>"
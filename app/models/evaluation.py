@@ -24,5 +24,9 @@ class Evaluation(db.Model, OrgScopedMixin):
     # 監査
     created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_interview_evaluations_interview_created_at', 'interview_id', 'created_at'),
+    )
+
     def __repr__(self) -> str:
         return f"<Evaluation id={self.id} interview_id={self.interview_id}>"
\ No newline at end of file
@@ -14,6 +14,13 @@ class Files(db.Model, OrgScopedMixin, TimestampMixin):
     created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
     # optional link to candidate
     candidate_id = db.Column(db.Integer, db.ForeignKey('candidates.id'), nullable=True)
+    # SHA-256 of the content (services/blobs.py); deferred, see services/schema_caps.py
+    content_sha256 = db.deferred(db.Column(db.String(64), nullable=True))
+
+    __table_args__ = (
+        db.Index('ix_files_candidate_created_at', 'candidate_id', 'created_at'),
+        db.Index('ix_files_org_content_sha256', 'org_id', 'content_sha256'),
+    )
 
     @property
     def filename(self):
@@ -19,10 +19,20 @@ class Interview(db.Model, OrgScopedMixin, TimestampMixin):
     ai_score = db.Column(db.Numeric(5, 2))  # 任意
     # store latest full transcript text for quick access
     transcript_text = db.Column(db.Text)
+    # newest transcript of this interview's recordings, maintained by the
+    # transcribe job (services/transcripts.py); deferred, see services/schema_caps.py
+    latest_transcript_id = db.deferred(db.Column(db.Integer, nullable=True))
     # legacy / denormalized fields present in DB
     rank = db.Column(db.String(2), nullable=True)
     decision = db.Column(db.String(20), nullable=True)
     interviewer = db.Column(db.String(120), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_interviews_org_scheduled_at', 'org_id', 'scheduled_at'),
+        db.Index('ix_interviews_org_scheduled_date', 'org_id', db.text('date(scheduled_at)')),
+        db.Index('ix_interviews_org_created_at', 'org_id', 'created_at'),
+        db.Index('ix_interviews_candidate_created_at', 'candidate_id', 'created_at'),
+    )
+
     def __repr__(self) -> str:
         return f"<Interview id={self.id} candidate_id={self.candidate_id}>"
\ No newline at end of file
@@ -7,4 +7,12 @@ class Recording(db.Model, OrgScopedMixin, TimestampMixin):
     interview_id = db.Column(db.Integer, db.ForeignKey("interviews.id"), nullable=False)
     storage_url = db.Column(db.String(512), nullable=False)
     duration_sec = db.Column(db.Integer)
-    uploaded_by = db.Column(db.Integer)  # user id
\ No newline at end of file
+    uploaded_by = db.Column(db.Integer)  # user id
+    # content hash and size (services/blobs.py); deferred, see services/schema_caps.py
+    content_sha256 = db.deferred(db.Column(db.String(64), nullable=True))
+    size_bytes = db.deferred(db.Column(db.BigInteger, nullable=True))
+
+    __table_args__ = (
+        db.Index('ix_recordings_interview_id_id', 'interview_id', 'id'),
+        db.Index('ix_recordings_org_content_sha256', 'org_id', 'content_sha256'),
+    )
\ No newline at end of file
@@ -0,0 +1,24 @@
+from ..extensions import db
+from .base import OrgScopedMixin
+
+
+class SearchDocument(db.Model, OrgScopedMixin):
+    """Bigram-tokenized search text for a candidate or a transcript (kept by services.search)."""
+    __tablename__ = "search_documents"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # OrgScopedMixin: org_id
+    kind = db.Column(db.String(20), nullable=False)       # candidate / transcript
+    ref_id = db.Column(db.Integer, nullable=False)        # candidates.id / transcripts.id
+    candidate_id = db.Column(db.Integer, nullable=True)   # owning candidate (for transcripts via interview)
+    interview_id = db.Column(db.Integer, nullable=True)
+    body = db.Column(db.Text, nullable=False)             # normalized source text (snippets)
+    tokens = db.Column(db.Text, nullable=False)           # space separated bigrams / words
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'ref_id', name='uq_search_documents_kind_ref'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<SearchDocument {self.kind}:{self.ref_id}>"
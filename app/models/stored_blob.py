@@ -0,0 +1,23 @@
+from ..extensions import db
+from .base import OrgScopedMixin
+
+
+class StoredBlob(db.Model, OrgScopedMixin):
+    """One stored object, addressed by content, shared by the Files / Recordings that reference it (services.blobs)."""
+    __tablename__ = "stored_blobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # OrgScopedMixin: org_id (content is only shared within an org)
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    storage_url = db.Column(db.String(512), nullable=False, unique=True)
+    # Files / Recordings rows pointing at storage_url (kept by the flush hook)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('org_id', 'sha256', 'size', name='uq_stored_blobs_org_content'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<StoredBlob org={self.org_id} {self.sha256[:12]} refs={self.ref_count}>"
@@ -0,0 +1,22 @@
+from ..extensions import db
+
+
+class SttCacheEntry(db.Model):
+    """Compressed raw STT (Deepgram) response keyed by audio content + options."""
+    __tablename__ = "stt_cache"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # sha256(audio sha256 + effective options + language)
+    cache_key = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    audio_sha256 = db.Column(db.String(64), nullable=False, index=True)
+    language = db.Column(db.String(10))
+    options = db.Column(db.JSON)
+    # zlib-compressed UTF-8 JSON of the raw response
+    payload = db.Column(db.LargeBinary, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    last_used_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<SttCacheEntry id={self.id} audio={self.audio_sha256[:12]} size={self.size_bytes}>"
@@ -7,11 +7,19 @@ class Transcript(db.Model, OrgScopedMixin, TimestampMixin):
     recording_id = db.Column(db.Integer, db.ForeignKey("recordings.id"), nullable=False)
     text = db.Column(db.Text, nullable=False)
     lang = db.Column(db.String(10), default="ja")
-    # processing status: pending -> processing -> ok -> error
+    # processing status: pending -> processing -> ok / partial (segmented
+    # transcription with failed windows) / error
     status = db.Column(db.String(20), default='pending')
-    # optional short error message when status == 'error'
+    # optional short error message when status is 'error' or 'partial'
     error = db.Column(db.Text, nullable=True)
     # raw utterances/diarization data (Deepgram 'utterances' or similar)
     utterances = db.Column(db.JSON, nullable=True)
     # computed speaking metrics (output of speaking_metrics_from_utterances)
-    metrics = db.Column(db.JSON, nullable=True)
\ No newline at end of file
+    metrics = db.Column(db.JSON, nullable=True)
+    # full raw STT response (Deepgram JSON) so utterances/metrics can be
+    # re-derived offline; deferred because it can be several MB
+    raw_response = db.deferred(db.Column(db.JSON(none_as_null=True), nullable=True))
+
+    __table_args__ = (
+        db.Index('ix_transcripts_recording_created_at', 'recording_id', 'created_at'),
+    )
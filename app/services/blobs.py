@@ -0,0 +1,345 @@
+"""Content-addressed storage of uploaded files and recordings, with reference counting.
+
+``upload_resume`` and the recording uploads stored every upload under its
+file name and recorded no size. A resume uploaded twice was stored twice and
+rendered twice, and a re-uploaded recording was transcribed again. Uploads
+are now hashed as they are read (SHA-256 plus size) and stored once per org
+under ``org<id>/blobs/<sha[:2]>/<sha><ext>``. A ``stored_blobs`` row records
+the object and how many Files / Recordings rows point at it. A duplicate
+upload gets the existing URL without writing to storage. It reuses the
+original's stored preview (``find_preview``) and transcript
+(``find_transcript``, used by the transcribe job) instead of rendering or
+transcribing again.
+
+Reference counts follow the rows' ``storage_url`` through a flush hook
+(``install``). Inserts add a reference; deletes and URL changes drop one.
+Objects whose count reaches zero are deleted from storage after the commit.
+
+Recordings uploaded straight from the browser (``services/direct_upload.py``)
+are hashed while the parts are assembled on local storage. S3 uploads are
+never read by the web app; the transcribe job hashes them during the one
+download it makes anyway (``local_copy``). Either way ``recording_hash``
+records the hash, and when the content is already stored it points the
+recording at the stored object and removes the new copy.
+
+Until the migration has run (``schema_caps.has_stored_blobs``), uploads are
+stored as before.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from flask import current_app
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from ..extensions import db
+from ..models.file import Files
+from ..models.recording import Recording
+from ..models.stored_blob import StoredBlob
+from ..models.transcript import Transcript
+from . import schema_caps, storage
+
+# spooled uploads stay in memory up to this size
+_SPOOL_MAX = 8 * storage.MB
+_PENDING_KEY = 'blobs_unreferenced'
+_installed = False
+
+Stored = namedtuple('Stored', 'url sha256 size reused')
+
+
+class HashingReader:
+    """File-like wrapper that hashes (SHA-256) and counts what is read through it."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        chunk = self._raw.read(size)
+        if chunk:
+            self._hash.update(chunk)
+            self.size += len(chunk)
+        return chunk
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+
+def available(bind=None) -> bool:
+    return schema_caps.has('has_stored_blobs', bind=bind)
+
+
+def blob_key(org_id: int, sha256: str, filename: str = None) -> str:
+    # the extension keeps mimetype guessing / player support working
+    ext = secure_filename(os.path.splitext(filename or '')[1]).lower()
+    return f"org{org_id}/blobs/{sha256[:2]}/{sha256}{'.' + ext if ext else ''}"
+
+
+def _hash_stream(stream):
+    """``(sha256, size, stream)`` of an upload; the returned stream is rewound for storing.
+
+    Werkzeug already spooled the upload, so it is hashed in place; other
+    streams are copied to a spooled temp file while hashing.
+    """
+    reader = HashingReader(stream)
+    try:
+        seekable = stream.seekable() and stream.tell() == 0
+    except Exception:
+        seekable = False
+    if seekable:
+        while reader.read(storage.STREAM_CHUNK_SIZE):
+            pass
+        stream.seek(0)
+        return reader.sha256, reader.size, stream
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX)
+    shutil.copyfileobj(reader, spool, storage.STREAM_CHUNK_SIZE)
+    spool.seek(0)
+    return reader.sha256, reader.size, spool
+
+
+def hash_url(url: str) -> tuple:
+    """``(sha256, size)`` of a stored object, computed while streaming it."""
+    with storage.open_stream(url) as stream:
+        reader = HashingReader(stream)
+        while reader.read(storage.STREAM_CHUNK_SIZE):
+            pass
+    return reader.sha256, reader.size
+
+
+@contextmanager
+def local_copy(url: str):
+    """Yield ``(path, sha256, size)``: a local file with the object's content, hashed while copied.
+
+    ``file://`` objects are hashed in place; remote ones are spooled to a
+    temp file (removed on exit), so hashing and later reads share one download.
+    """
+    if url.startswith('file://'):
+        sha256, size = hash_url(url)
+        yield url.replace('file://', ''), sha256, size
+        return
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(url)[1])
+    try:
+        with os.fdopen(fd, 'wb') as out, storage.open_stream(url) as stream:
+            reader = HashingReader(stream)
+            shutil.copyfileobj(reader, out, storage.STREAM_CHUNK_SIZE)
+        yield path, reader.sha256, reader.size
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def find(org_id: int, sha256: str, size: int):
+    return StoredBlob.query.filter_by(org_id=org_id, sha256=sha256, size=size).first()
+
+
+def register(org_id: int, sha256: str, size: int, url: str, refs: int = 0) -> StoredBlob:
+    """The org's blob for this content, recording ``url`` as its object when there is none yet.
+
+    ``refs`` is the number of rows already pointing at ``url`` (new rows are
+    counted by the flush hook). When a concurrent upload registered the same
+    content first, its blob is returned.
+    """
+    try:
+        with db.session.begin_nested():
+            blob = StoredBlob(org_id=org_id, sha256=sha256, size=size, storage_url=url, ref_count=refs)
+            db.session.add(blob)
+        return blob
+    except IntegrityError:
+        return find(org_id, sha256, size)
+
+
+def store_upload(file_storage, org_id: int, prefix: str) -> Stored:
+    """Store an uploaded file once per org; returns ``Stored(url, sha256, size, reused)``.
+
+    ``reused`` is True when the org already had this content, in which case
+    nothing was written to storage. ``prefix`` is the old per-upload location,
+    used until the migration has run.
+    """
+    filename = getattr(file_storage, 'filename', None)
+    content_type = getattr(file_storage, 'mimetype', None)
+    sha256, size, stream = _hash_stream(getattr(file_storage, 'stream', file_storage))
+    try:
+        if not available():
+            upload = FileStorage(stream=stream, filename=filename, content_type=content_type)
+            return Stored(storage.save_file(upload, prefix=prefix), sha256, size, False)
+        blob = find(org_id, sha256, size)
+        if blob is not None:
+            return Stored(blob.storage_url, sha256, size, True)
+        key = blob_key(org_id, sha256, filename)
+        folder, name = key.rsplit('/', 1)
+        url = storage.save_file(FileStorage(stream=stream, filename=name, content_type=content_type), prefix=folder)
+        blob = register(org_id, sha256, size, url)
+        if blob.storage_url != url:
+            # lost a race against an identical upload stored elsewhere (e.g. local fallback)
+            storage.delete(url)
+        return Stored(blob.storage_url, sha256, size, blob.storage_url != url)
+    finally:
+        if stream is not getattr(file_storage, 'stream', file_storage):
+            stream.close()
+
+
+def _references(url: str) -> int:
+    return (Files.query.filter(Files.storage_url == url).count()
+            + Recording.query.filter(Recording.storage_url == url).count())
+
+
+def hash_known(rec) -> bool:
+    return bool(available() and rec.content_sha256 and rec.size_bytes is not None)
+
+
+def recording_hash(rec, hashed: tuple = None) -> tuple:
+    """``(sha256, size)`` of a recording, hashing its object when not known yet.
+
+    ``hashed`` is the ``(sha256, size)`` the caller computed while reading the
+    content. A newly hashed recording whose content the org already stores is
+    pointed at the stored object, and its own copy is deleted.
+    """
+    if hash_known(rec):
+        return rec.content_sha256, rec.size_bytes
+    sha256, size = hashed or hash_url(rec.storage_url)
+    if not available():
+        return sha256, size
+    rec.content_sha256, rec.size_bytes = sha256, size
+    old = rec.storage_url
+    blob = register(rec.org_id, sha256, size, old, refs=1)
+    if blob.storage_url != old:
+        # the hook moves the reference from ``old`` to the stored blob
+        rec.storage_url = blob.storage_url
+    db.session.commit()
+    if blob.storage_url != old and _references(old) == 0 and find_by_url(old) is None:
+        storage.delete(old)
+    return sha256, size
+
+
+def find_by_url(url: str):
+    return StoredBlob.query.filter_by(storage_url=url).first()
+
+
+def _complete(tr) -> bool:
+    # transcripts saved as 'ok' before 'partial' existed may still have gaps
+    return not ((tr.raw_response or {}).get('metadata') or {}).get('segments_failed')
+
+
+def find_transcript(rec, lang: str = None):
+    """A complete transcript of another recording of the org with the same content, if any.
+
+    Partial transcripts (segmented transcription with failed windows) are
+    never reused, so uploading the file again transcribes it again.
+    """
+    if not (available() and rec.content_sha256):
+        return None
+    q = (Transcript.query.join(Recording, Recording.id == Transcript.recording_id)
+         .filter(Recording.org_id == rec.org_id, Recording.content_sha256 == rec.content_sha256,
+                 Recording.size_bytes == rec.size_bytes, Recording.id != rec.id,
+                 Transcript.status == 'ok'))
+    if lang:
+        q = q.filter(Transcript.lang == lang)
+    for tr in q.order_by(Transcript.id.desc()).limit(10):
+        if _complete(tr):
+            return tr
+    return None
+
+
+def find_preview(org_id: int, sha256: str, exclude_id: int = None):
+    """The current stored preview info of a file of the org with this content, if any."""
+    from . import preview
+    if not (available() and sha256):
+        return None
+    q = Files.query.filter(Files.org_id == org_id, Files.content_sha256 == sha256)
+    if exclude_id is not None:
+        q = q.filter(Files.id != exclude_id)
+    for row in q.order_by(Files.id.desc()).limit(10):
+        info = preview.cached(row)
+        if info is not None and info.get('sha256') == sha256:
+            return info
+    return None
+
+
+# --- reference counting ----------------------------------------------------
+
+def _after_flush(session, flush_context):
+    try:
+        deltas = Counter()
+        for obj in session.new:
+            if isinstance(obj, (Files, Recording)) and obj.storage_url:
+                deltas[(obj.org_id, obj.storage_url)] += 1
+        for obj in session.dirty:
+            if isinstance(obj, (Files, Recording)):
+                hist = sa_inspect(obj).attrs.storage_url.history
+                if hist.has_changes():
+                    for url in hist.deleted or ():
+                        if url:
+                            deltas[(obj.org_id, url)] -= 1
+                    for url in hist.added or ():
+                        if url:
+                            deltas[(obj.org_id, url)] += 1
+        for obj in session.deleted:
+            if isinstance(obj, (Files, Recording)) and sa_inspect(obj).identity and obj.storage_url:
+                deltas[(obj.org_id, obj.storage_url)] -= 1
+    except Exception:
+        current_app.logger.exception('blobs: collecting references failed')
+        return
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    connection = session.connection()
+    if not available(bind=connection):
+        return
+    table = StoredBlob.__table__
+    released = session.info.setdefault(_PENDING_KEY, set())
+    for (org_id, url), delta in deltas.items():
+        connection.execute(table.update()
+                           .where(table.c.org_id == org_id, table.c.storage_url == url)
+                           .values(ref_count=table.c.ref_count + delta))
+        if delta < 0:
+            released.add(url)
+
+
+def _after_commit(session):
+    if session.in_nested_transaction():
+        # a savepoint; wait for the real commit
+        return
+    urls = session.info.pop(_PENDING_KEY, None)
+    if urls:
+        collect(urls)
+
+
+def _after_rollback(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_PENDING_KEY, None)
+
+
+def collect(urls) -> int:
+    """Delete the blobs among ``urls`` that nothing references any more; returns how many."""
+    table = StoredBlob.__table__
+    removed = 0
+    for url in urls:
+        # separate transaction: the flushing session has just committed
+        with db.engine.begin() as conn:
+            gone = conn.execute(table.delete().where(table.c.storage_url == url, table.c.ref_count <= 0)).rowcount
+        if gone:
+            storage.delete(url)
+            removed += 1
+    return removed
+
+
+def install():
+    """Register the reference counting hooks once per process (called from create_app)."""
+    global _installed
+    if not _installed:
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+        _installed = True
@@ -0,0 +1,374 @@
+"""Bulk candidate import (CSV / XLSX / JSON / NDJSON) with upsert by email.
+
+``/org/import`` used to parse the CSV inside the request, add one ORM object
+per row and commit once: a large file timed out the request and a single
+duplicate email (``candidates.email`` is unique) rolled back everything.
+Here the file is read as a stream (``csv`` reader, openpyxl read-only
+mode), each row is validated and converted on its own, and rows are applied
+``IMPORT_CHUNK_SIZE`` at a time:
+
+* rows whose email already exists in the org update that candidate
+  (bulk UPDATE by primary key), other rows are bulk-inserted
+  (``executemany`` / multi-row ``INSERT ... RETURNING``);
+* each chunk is committed on its own; if a chunk's bulk statement fails,
+  its rows are retried one by one in savepoints so only the offending rows
+  are rejected;
+* rejected rows are collected with their line number and reason for the
+  error report.
+
+Bulk statements bypass the ORM unit of work, so the session hooks do not
+see them: the search index is updated per chunk, and the daily rollup and
+dashboard cache of the org are refreshed at the end.
+"""
+import csv
+import io
+import json
+import re
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import insert, update
+
+from ..extensions import db
+from ..models.candidate import Candidate
+
+FORMATS = ('csv', 'xlsx', 'json', 'ndjson')
+
+# never taken from the file
+PROTECTED = {'id', 'org_id', 'created_at', 'resume_file_id'}
+DATE_COLUMNS = {'birthdate', 'applied_at', 'offer_date', 'acceptance_date', 'join_date', 'decline_date'}
+INT_COLUMNS = {'grad_year'}
+LIST_COLUMNS = {'qualifications', 'languages', 'skills'}
+
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class RowError(ValueError):
+    pass
+
+
+def _cfg(key, default):
+    try:
+        return current_app.config.get(key, default)
+    except Exception:
+        return default
+
+
+def detect_format(filename: str, mimetype: str = None) -> Optional[str]:
+    name = (filename or '').lower()
+    for fmt, exts in (('xlsx', ('.xlsx', '.xlsm')), ('csv', ('.csv',)), ('ndjson', ('.ndjson', '.jsonl')),
+                      ('json', ('.json',))):
+        if name.endswith(exts):
+            return fmt
+    if mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    return None
+
+
+def columns() -> Dict[str, Any]:
+    return {c.name: c for c in Candidate.__table__.columns if c.name not in PROTECTED}
+
+
+# --- reading ---------------------------------------------------------------
+
+def _iter_csv(fp) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    text = io.TextIOWrapper(fp, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _iter_xlsx(fp) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    import openpyxl
+    wb = openpyxl.load_workbook(fp, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        keys = [str(h).strip() if h is not None else '' for h in header]
+        for line, values in enumerate(rows, 2):
+            yield line, dict(zip(keys, values))
+    finally:
+        wb.close()
+
+
+def _iter_json(fp) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    # legacy format: {"candidates": [...]} (the old /org/export output)
+    payload = json.load(io.TextIOWrapper(fp, encoding='utf-8-sig'))
+    rows = payload.get('candidates', []) if isinstance(payload, dict) else payload
+    for i, row in enumerate(rows or [], 1):
+        yield i, row
+
+
+def _iter_ndjson(fp) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    # one candidate per line, or the {"table", "row"} lines of /org/export
+    for line, raw in enumerate(io.TextIOWrapper(fp, encoding='utf-8-sig'), 1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            yield line, None
+            continue
+        if isinstance(obj, dict) and 'table' in obj and 'row' in obj:
+            if obj['table'] != 'candidates':
+                continue
+            obj = obj['row']
+        yield line, obj
+
+
+def iter_file(fp, fmt: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """``(line number, raw row)`` for every data row of a binary file object."""
+    return {'csv': _iter_csv, 'xlsx': _iter_xlsx, 'json': _iter_json, 'ndjson': _iter_ndjson}[fmt](fp)
+
+
+# --- validation ------------------------------------------------------------
+
+def _blank(v) -> bool:
+    return v is None or (isinstance(v, str) and not v.strip())
+
+
+def _to_date(v):
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    s = str(v).strip()
+    for fmt in ('%Y-%m-%d', '%Y/%m/%d'):
+        try:
+            return datetime.strptime(s[:10], fmt).date()
+        except ValueError:
+            continue
+    raise RowError('日付の形式が不正です')
+
+
+def _to_int(v):
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    try:
+        return int(str(v).strip())
+    except ValueError:
+        raise RowError('整数ではありません')
+
+
+def _to_list(v):
+    if isinstance(v, (list, dict)):
+        return v
+    s = str(v).strip()
+    try:
+        return json.loads(s)
+    except ValueError:
+        # allow simple comma-separated list for qualifications/skills
+        return [x.strip() for x in s.split(',') if x.strip()]
+
+
+def convert(raw: Dict[str, Any], cols: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Typed column values of one row; raises ``RowError`` with the reason."""
+    if not isinstance(raw, dict):
+        raise RowError('行を読み取れません')
+    cols = cols or columns()
+    data = {}
+    for key, value in raw.items():
+        key = (key or '').strip() if isinstance(key, str) else key
+        if key not in cols or _blank(value):
+            continue
+        try:
+            if key in DATE_COLUMNS:
+                value = _to_date(value)
+            elif key in INT_COLUMNS:
+                value = _to_int(value)
+            elif key in LIST_COLUMNS:
+                value = _to_list(value)
+            else:
+                value = str(value).strip()
+                length = getattr(cols[key].type, 'length', None)
+                if length and len(value) > length:
+                    raise RowError(f'{length}文字を超えています')
+        except RowError as e:
+            raise RowError(f'{key}: {e}')
+        data[key] = value
+    if 'email' in data and not _EMAIL_RE.match(data['email']):
+        raise RowError('email: メールアドレスの形式が不正です')
+    return data
+
+
+# --- writing ---------------------------------------------------------------
+
+class ImportResult:
+    """Counters and rejected rows of one import run."""
+
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors: List[Tuple[int, str, str]] = []
+        self.since: Optional[date] = None  # earliest day touched (for the rollup)
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    def reject(self, line, data, message):
+        email = (data or {}).get('email', '') if isinstance(data, dict) else ''
+        self.errors.append((line, email or '', message))
+
+    def as_dict(self, max_errors: int = 20):
+        return {'processed': self.processed, 'inserted': self.inserted, 'updated': self.updated,
+                'failed': self.failed, 'errors': [list(e) for e in sorted(self.errors)[:max_errors]]}
+
+
+def _note_days(result, *values):
+    for v in values:
+        if isinstance(v, datetime):
+            v = v.date()
+        if isinstance(v, date) and (result.since is None or v < result.since):
+            result.since = v
+
+
+def _existing(org_id: int, emails) -> Dict[str, Tuple[int, int, Any, Any]]:
+    """email -> (id, org_id, applied_at, acceptance_date) for the emails already in use."""
+    if not emails:
+        return {}
+    rows = db.session.execute(
+        db.select(Candidate.email, Candidate.id, Candidate.org_id, Candidate.applied_at, Candidate.acceptance_date)
+        .where(Candidate.email.in_(list(emails)))
+    ).all()
+    return {r[0]: tuple(r[1:]) for r in rows}
+
+
+def _plan(org_id: int, chunk: List[Tuple[int, Dict[str, Any]]], result: ImportResult):
+    """Split a chunk into ``(inserts, updates)``; rows that can not be applied are rejected."""
+    from .daily_stats import today
+    merged: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    plain = []
+    for line, data in chunk:
+        email = data.get('email')
+        if email:
+            # a later row for the same email overrides the earlier one
+            prev = merged.get(email)
+            merged[email] = (line, {**prev[1], **data} if prev else data)
+        else:
+            plain.append((line, data))
+    found = _existing(org_id, merged.keys())
+    inserts, updates = [], []
+    for email, (line, data) in merged.items():
+        hit = found.get(email)
+        if hit is None:
+            plain.append((line, data))
+        elif hit[1] != org_id:
+            result.reject(line, data, 'email: 他の組織で使用されています')
+        else:
+            updates.append((line, {'id': hit[0], **data}))
+            _note_days(result, hit[2], hit[3], data.get('applied_at'), data.get('acceptance_date'))
+    for line, data in plain:
+        if not data.get('name'):
+            result.reject(line, data, 'name: 必須項目です')
+            continue
+        data = {'org_id': org_id, **data}
+        data.setdefault('applied_at', today())
+        _note_days(result, data.get('applied_at'), data.get('acceptance_date'))
+        inserts.append((line, data))
+    return inserts, updates
+
+
+def _insert(rows) -> List[int]:
+    if not rows:
+        return []
+    return list(db.session.execute(insert(Candidate).returning(Candidate.id), rows).scalars())
+
+
+def _update(rows):
+    if rows:
+        db.session.execute(update(Candidate), rows)
+
+
+def _apply_one_by_one(inserts, updates, result: ImportResult) -> List[int]:
+    ids = []
+    for kind, items in (('insert', inserts), ('update', updates)):
+        for line, data in items:
+            try:
+                with db.session.begin_nested():
+                    if kind == 'insert':
+                        ids.extend(_insert([data]))
+                        result.inserted += 1
+                    else:
+                        _update([data])
+                        ids.append(data['id'])
+                        result.updated += 1
+            except Exception as e:
+                msg = str(getattr(e, 'orig', e)).splitlines()[0][:200]
+                result.reject(line, data, f'登録できませんでした: {msg}')
+    return ids
+
+
+def apply_chunk(org_id: int, chunk: List[Tuple[int, Dict[str, Any]]], result: ImportResult):
+    """Upsert one chunk of converted rows and commit it."""
+    from . import search
+    inserts, updates = _plan(org_id, chunk, result)
+    try:
+        with db.session.begin_nested():
+            ids = _insert([d for _, d in inserts])
+            _update([d for _, d in updates])
+        result.inserted += len(inserts)
+        result.updated += len(updates)
+        ids += [d['id'] for _, d in updates]
+    except Exception:
+        current_app.logger.info('import: bulk chunk failed, retrying row by row', exc_info=True)
+        ids = _apply_one_by_one(inserts, updates, result)
+    search.index_candidates(ids)
+    db.session.commit()
+
+
+def run(org_id: int, rows: Iterator[Tuple[int, Any]], chunk_size: int = None,
+        progress: Callable[[ImportResult], None] = None) -> ImportResult:
+    """Import ``(line, raw row)`` pairs into the org, ``chunk_size`` rows per transaction."""
+    from . import daily_stats, dashboard_cache
+    chunk_size = int(chunk_size or _cfg('IMPORT_CHUNK_SIZE', 1000))
+    cols = columns()
+    result = ImportResult()
+    chunk = []
+
+    def flush():
+        if chunk:
+            apply_chunk(org_id, chunk, result)
+            chunk.clear()
+        if progress:
+            progress(result)
+
+    for line, raw in rows:
+        if isinstance(raw, dict) and all(_blank(v) for v in raw.values()):
+            continue
+        result.processed += 1
+        try:
+            data = convert(raw, cols)
+        except RowError as e:
+            result.reject(line, raw, str(e))
+            continue
+        if not data:
+            result.reject(line, raw, '取り込める列がありません')
+            continue
+        chunk.append((line, data))
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    if result.inserted or result.updated:
+        try:
+            if result.since and daily_stats.available():
+                daily_stats.backfill(org_id, since=result.since)
+        except Exception:
+            current_app.logger.exception('import: daily stats backfill failed')
+            db.session.rollback()
+        dashboard_cache.invalidate(org_id)
+    return result
+
+
+def error_report_csv(result: ImportResult) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(['line', 'email', 'error'])
+    writer.writerows(sorted(result.errors))
+    return buf.getvalue().encode('utf-8-sig')
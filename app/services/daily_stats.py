@@ -0,0 +1,266 @@
+"""Incremental per-org daily rollup (``org_daily_stats``) for the home dashboard.
+
+The home page used to count candidates/applications/interviews/evaluations
+and group ``candidates.applied_at`` / ``applications.created_at`` by day on
+every load. Instead, a session ``before_flush`` hook turns every insert,
+update or delete of those rows into +1/-1 deltas on the matching
+(org, day) row, upserted in the same transaction, and the home page reads
+the last 30 rows.
+
+Changes that bypass the ORM unit of work (bulk ``query.update()``, raw SQL,
+manual fixes in psql) are not seen by the hook; ``backfill`` rebuilds the
+rollup from the source tables (``scripts/backfill_daily_stats.py``).
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+from sqlalchemy import event, func, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models.application import Application
+from ..models.candidate import Candidate
+from ..models.daily_stat import OrgDailyStat
+from ..models.evaluation import Evaluation
+from ..models.interview import Interview
+from . import schema_caps
+
+# (model, date attribute, rollup column)
+TRACKED = (
+    (Candidate, 'applied_at', 'candidates'),
+    (Candidate, 'acceptance_date', 'hires'),
+    (Application, 'created_at', 'applications'),
+    (Interview, 'created_at', 'interviews'),
+    (Evaluation, 'created_at', 'evaluations'),
+)
+COLUMNS = ('candidates', 'applications', 'interviews', 'evaluations', 'hires')
+
+# attributes whose server default is "now": a new row without a value lands on
+# today (``today``, in APP_TIMEZONE)
+_DEFAULTS_TO_TODAY = {'applied_at', 'created_at'}
+
+_installed = False
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except Exception:
+        return None
+
+
+def today() -> date:
+    """Today in ``APP_TIMEZONE``, the calendar users type dates like applied_at in."""
+    try:
+        return datetime.now(ZoneInfo(current_app.config.get('APP_TIMEZONE') or 'UTC')).date()
+    except Exception:
+        return date.today()
+
+
+def _available(connection) -> bool:
+    """True once the org_daily_stats table exists (see ``schema_caps``)."""
+    return schema_caps.has('has_org_daily_stats', bind=connection)
+
+
+def _loaded(obj, attr, default=None):
+    """Current value of ``attr`` if it is loaded on ``obj`` (never triggers a load)."""
+    state = sa_inspect(obj)
+    return state.dict[attr] if attr in state.dict else default
+
+
+def _changed(obj, attrs) -> bool:
+    state = sa_inspect(obj)
+    return any(state.attrs[a].history.added for a in attrs)
+
+
+def _collect(session) -> Dict[Tuple[int, date], Dict[str, int]]:
+    """Deltas implied by the pending flush (called from ``before_flush``).
+
+    Old values of updated/deleted rows are read from the database rather
+    than from attribute history, which is empty for attributes that were
+    expired (e.g. after a commit) when they were changed.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    default_day = today()
+
+    def add(org_id, day, col, n):
+        day = _as_date(day)
+        if org_id is not None and day is not None:
+            deltas[(org_id, day)][col] += n
+
+    models = {}
+    for model, attr, col in TRACKED:
+        models.setdefault(model, []).append((attr, col))
+
+    for model, specs in models.items():
+        attrs = [a for a, _ in specs]
+        for obj in session.new:
+            if isinstance(obj, model):
+                for attr, col in specs:
+                    day = _loaded(obj, attr)
+                    if day is None and attr in _DEFAULTS_TO_TODAY:
+                        day = default_day
+                    add(_loaded(obj, 'org_id'), day, col, 1)
+
+        deleted = [o for o in session.deleted if isinstance(o, model)]
+        dirty = [o for o in session.dirty if isinstance(o, model) and o not in session.deleted
+                 and _changed(o, attrs + ['org_id'])]
+        # identity key, not o.id: the id attribute itself may be expired
+        ident = {id(o): sa_inspect(o).identity[0] for o in deleted + dirty if sa_inspect(o).identity}
+        ids = list(ident.values())
+        if not ids:
+            continue
+        with session.no_autoflush:
+            rows = (
+                session.query(model.id, model.org_id, *[getattr(model, a) for a in attrs])
+                .filter(model.id.in_(ids))
+            ).all()
+        old = {r[0]: r[1:] for r in rows}
+        for obj in deleted:
+            prev = old.get(ident.get(id(obj)))
+            if prev is None:
+                continue
+            for i, (attr, col) in enumerate(specs):
+                add(prev[0], prev[1 + i], col, -1)
+        for obj in dirty:
+            prev = old.get(ident.get(id(obj)))
+            if prev is None:
+                continue
+            new_org = _loaded(obj, 'org_id', prev[0])
+            for i, (attr, col) in enumerate(specs):
+                old_day = _as_date(prev[1 + i])
+                new_day = _as_date(_loaded(obj, attr, prev[1 + i]))
+                if (prev[0], old_day) != (new_org, new_day):
+                    add(prev[0], old_day, col, -1)
+                    add(new_org, new_day, col, 1)
+    return {k: {c: n for c, n in v.items() if n} for k, v in deltas.items() if any(v.values())}
+
+
+def _upsert(connection, org_id: int, day: date, delta: Dict[str, int]):
+    table = OrgDailyStat.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(org_id=org_id, day=day, **{c: delta.get(c, 0) for c in COLUMNS})
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['org_id', 'day'],
+            set_={c: table.c[c] + stmt.excluded[c] for c in delta},
+        )
+        connection.execute(stmt)
+        return
+    res = connection.execute(
+        table.update()
+        .where(table.c.org_id == org_id, table.c.day == day)
+        .values({c: table.c[c] + n for c, n in delta.items()})
+    )
+    if not res.rowcount:
+        connection.execute(table.insert().values(org_id=org_id, day=day, **{c: delta.get(c, 0) for c in COLUMNS}))
+
+
+def _before_flush(session, flush_context, instances):
+    try:
+        deltas = _collect(session)
+    except Exception:
+        current_app.logger.exception('daily_stats: collecting deltas failed')
+        return
+    if not deltas:
+        return
+    connection = session.connection()
+    if not _available(connection):
+        return
+    for (org_id, day), delta in sorted(deltas.items(), key=lambda kv: (kv[0][0], kv[0][1])):
+        _upsert(connection, org_id, day, delta)
+
+
+def install():
+    """Register the flush hook once per process (called from create_app)."""
+    global _installed
+    if not _installed:
+        event.listen(Session, 'before_flush', _before_flush)
+        _installed = True
+
+
+def series(org_id: int, days: int = 30, end: date = None):
+    """Return ``(labels, applicants)`` for the last ``days`` days from the rollup.
+
+    Applicants are candidates (by applied_at) plus applications (by
+    created_at), the same definition the home page used before.
+    """
+    end = end or today()
+    start = end - timedelta(days=days - 1)
+    rows = (
+        db.session.query(OrgDailyStat.day, OrgDailyStat.candidates, OrgDailyStat.applications)
+        .filter(OrgDailyStat.org_id == org_id, OrgDailyStat.day >= start, OrgDailyStat.day <= end)
+    ).all()
+    by_day = {_as_date(r[0]): (r[1] or 0) + (r[2] or 0) for r in rows}
+    labels, applicants = [], []
+    cur = start
+    while cur <= end:
+        labels.append(f"{cur.month}/{cur.day}")
+        applicants.append(by_day.get(cur, 0))
+        cur += timedelta(days=1)
+    return labels, applicants
+
+
+def totals(org_id: int) -> Dict[str, int]:
+    row = (
+        db.session.query(*[func.coalesce(func.sum(getattr(OrgDailyStat, c)), 0) for c in COLUMNS])
+        .filter(OrgDailyStat.org_id == org_id)
+    ).one()
+    return {c: int(v or 0) for c, v in zip(COLUMNS, row)}
+
+
+def available() -> bool:
+    try:
+        return _available(db.session.connection())
+    except Exception:
+        return False
+
+
+def backfill(org_id: int = None, since: date = None) -> int:
+    """Rebuild rollup rows from the source tables; returns the number of rows written.
+
+    Limited to one org and/or to days on or after ``since`` when given.
+    """
+    counts = defaultdict(lambda: dict.fromkeys(COLUMNS, 0))
+    for model, attr, col in TRACKED:
+        day_expr = func.date(getattr(model, attr)).label('d')
+        q = (
+            db.session.query(model.org_id, day_expr, func.count(model.id))
+            .filter(getattr(model, attr).isnot(None))
+            .group_by(model.org_id, 'd')
+        )
+        if org_id is not None:
+            q = q.filter(model.org_id == org_id)
+        if since is not None:
+            q = q.filter(getattr(model, attr) >= since)
+        for o, d, n in q.all():
+            day = _as_date(d)
+            if day is not None and (since is None or day >= since):
+                counts[(o, day)][col] += int(n)
+
+    dq = OrgDailyStat.query
+    if org_id is not None:
+        dq = dq.filter(OrgDailyStat.org_id == org_id)
+    if since is not None:
+        dq = dq.filter(OrgDailyStat.day >= since)
+    dq.delete(synchronize_session=False)
+    if counts:
+        db.session.execute(
+            OrgDailyStat.__table__.insert(),
+            [dict(org_id=o, day=d, **vals) for (o, d), vals in sorted(counts.items())],
+        )
+    db.session.commit()
+    return len(counts)
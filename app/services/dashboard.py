@@ -0,0 +1,183 @@
+"""Dashboard aggregations computed in SQL.
+
+``dashboard_2`` used to load every Candidate of the org and bucket them in
+Python, then count interviews with ``IN (<all filtered ids>)``. Here every
+breakdown is a grouped query (age decade and gender via CASE / date
+arithmetic) and the funnel is a single query joining candidates to
+per-candidate interview counts, so nothing is materialized row by row.
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, and_, case, cast, extract, false, func, or_, true
+
+from ..extensions import db
+from ..models.candidate import Candidate
+from ..models.interview import Interview
+
+UNKNOWN = '不明'
+GENDER_LABELS = ['男性', '女性', UNKNOWN]
+YIELD_LABELS = ['応募数', '書類合格', '一次合格', '二次合格', '内定', '内定承諾']
+
+
+def _decade_expr(today: date):
+    # same rule as before: (today.year - birth year) // 10 * 10, NULL when unknown
+    age = today.year - cast(extract('year', Candidate.birthdate), Integer)
+    return case((Candidate.birthdate.is_(None), None), else_=(age // 10) * 10)
+
+
+def _gender_expr():
+    col = getattr(Candidate, 'gender', None)
+    if col is None:
+        # candidates table has no gender column (yet): everyone is unknown
+        return None
+    return case(
+        (col.in_(('male', '男性')), '男性'),
+        (col.in_(('female', '女性')), '女性'),
+        else_=UNKNOWN,
+    )
+
+
+def decade_label(decade: Optional[int]) -> str:
+    return UNKNOWN if decade is None else f"{int(decade)}代"
+
+
+def _parse_decade(label: str):
+    """'20代' -> 20, '不明' -> None; returns False for garbage."""
+    if label == UNKNOWN:
+        return None
+    try:
+        return int(label.rstrip('代'))
+    except Exception:
+        return False
+
+
+def option_lists(org_id: int) -> Tuple[List[str], List[str]]:
+    """Channel / position values for the filter selects (top 100 by count)."""
+    def top(col):
+        k = func.coalesce(col, 'Unknown').label('k')
+        rows = (
+            db.session.query(k, func.count(Candidate.id))
+            .filter(Candidate.org_id == org_id)
+            .group_by(k)
+            .order_by(func.count(Candidate.id).desc())
+            .limit(100)
+        ).all()
+        return [r[0] for r in rows]
+    return top(Candidate.channel), top(Candidate.applying_position)
+
+
+def _pie_label(col):
+    # NULL and '' are both 'Unknown' in the pies (as the old ``value or 'Unknown'``)
+    return func.coalesce(func.nullif(col, ''), 'Unknown')
+
+
+def _grouped(label_expr, conditions) -> List[Tuple[Any, int]]:
+    # group by the output label: the expressions carry bound parameters,
+    # which PostgreSQL does not match between SELECT and GROUP BY
+    return [
+        (r[0], int(r[1]))
+        for r in (
+            db.session.query(label_expr.label('k'), func.count(Candidate.id))
+            .filter(*conditions)
+            .group_by('k')
+            .order_by(func.count(Candidate.id).desc())
+        ).all()
+    ]
+
+
+def dashboard_2_data(org_id: int, start_date: date, end_date: date, channel: str = '',
+                     position: str = '', decade: str = '', gender: str = '',
+                     today: date = None) -> Dict[str, Any]:
+    """Return ``{'charts', 'options'}`` for dashboard_2 with the given filters."""
+    today = today or date.today()
+    decade_expr = _decade_expr(today)
+    gender_expr = _gender_expr()
+    base = [Candidate.org_id == org_id]
+
+    # decades / genders are over all candidates of the org (as before)
+    decade_rows = sorted(_grouped(decade_expr, base), key=lambda r: (r[0] is None, r[0] if r[0] is not None else 0))
+    decades_labels = [decade_label(r[0]) for r in decade_rows]
+    decades_vals = [int(r[1]) for r in decade_rows]
+
+    gender_counts = {k: 0 for k in GENDER_LABELS}
+    if gender_expr is None:
+        gender_counts[UNKNOWN] = db.session.query(func.count(Candidate.id)).filter(*base).scalar() or 0
+    else:
+        for k, n in _grouped(gender_expr, base):
+            gender_counts[k] = gender_counts.get(k, 0) + n
+
+    # filtered candidate set, expressed as conditions (never as an id list)
+    cond = list(base)
+    cond.append(or_(Candidate.applied_at.is_(None), Candidate.applied_at.between(start_date, end_date)))
+    if channel:
+        cond.append(Candidate.channel == channel)
+    if position:
+        cond.append(Candidate.applying_position == position)
+    if decade:
+        d = _parse_decade(decade)
+        if d is None:
+            cond.append(Candidate.birthdate.is_(None))
+        elif d is False:
+            cond.append(false())
+        else:
+            cond.append(and_(Candidate.birthdate.isnot(None), decade_expr == d))
+    if gender:
+        if gender_expr is None:
+            cond.append(true() if gender == UNKNOWN else false())
+        else:
+            cond.append(gender_expr == gender)
+
+    # funnel: one pass over the filtered candidates joined to per-candidate
+    # interview counts
+    def passed(*where):
+        return func.sum(case((and_(*where), 1), else_=0))
+
+    result = func.coalesce(Interview.result, '')
+    per_cand = (
+        db.session.query(
+            Interview.candidate_id.label('candidate_id'),
+            passed(Interview.step == 'document', result == 'pass').label('doc'),
+            passed(Interview.step == 'first', result == 'pass').label('first'),
+            passed(Interview.step == 'second', result == 'pass').label('second'),
+            passed(result == 'offer').label('offer'),
+        )
+        .filter(Interview.org_id == org_id)
+        .group_by(Interview.candidate_id)
+    ).subquery()
+    funnel = (
+        db.session.query(
+            func.count(Candidate.id),
+            func.coalesce(func.sum(per_cand.c.doc), 0),
+            func.coalesce(func.sum(per_cand.c.first), 0),
+            func.coalesce(func.sum(per_cand.c.second), 0),
+            func.coalesce(func.sum(per_cand.c.offer), 0),
+            func.count(Candidate.acceptance_date),
+        )
+        .select_from(Candidate)
+        .outerjoin(per_cand, per_cand.c.candidate_id == Candidate.id)
+        .filter(*cond)
+    ).one()
+    yield_values = [int(v or 0) for v in funnel]
+
+    # channel / position pies: filtered set, or everyone when nothing matches
+    pie_cond = cond if yield_values[0] else base
+    channels = _grouped(_pie_label(Candidate.channel), pie_cond)
+    positions = _grouped(_pie_label(Candidate.applying_position), pie_cond)
+
+    channel_options, position_options = option_lists(org_id)
+    return {
+        'charts': {
+            'yield': {'labels': list(YIELD_LABELS), 'values': yield_values},
+            'channels': {'labels': [k for k, _ in channels], 'values': [n for _, n in channels]},
+            'positions': {'labels': [k for k, _ in positions], 'values': [n for _, n in positions]},
+            'decades': {'labels': decades_labels, 'values': decades_vals},
+            'genders': {'labels': list(gender_counts), 'values': list(gender_counts.values())},
+        },
+        'options': {
+            'channels': channel_options,
+            'positions': position_options,
+            'decades': decades_labels,
+            'genders': list(gender_counts),
+        },
+    }
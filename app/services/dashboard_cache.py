@@ -0,0 +1,131 @@
+"""Redis cache for dashboard payloads, invalidated by a per-org version counter.
+
+Every viewer refreshing ``/`` or ``/dashboard-2`` used to recompute the same
+aggregates. Payloads are now cached under
+``dash:{org}:v{version}:{name}:{hash of normalized filters}`` with a TTL.
+Writes to candidates, interviews or evaluations (and applications, which
+feed the home series) bump ``dash:ver:{org}`` after the transaction
+commits, so every cached payload of that org is bypassed at once and simply
+expires; nothing has to enumerate keys.
+
+Without Redis the payload is computed on every request, as before.
+"""
+import hashlib
+import json
+from typing import Any, Callable, Dict
+
+from flask import current_app
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from ..extensions import rq
+from ..models.application import Application
+from ..models.candidate import Candidate
+from ..models.evaluation import Evaluation
+from ..models.interview import Interview
+
+INVALIDATING_MODELS = (Candidate, Interview, Evaluation, Application)
+
+_VERSION_KEY = 'dash:ver:{org_id}'
+_PAYLOAD_KEY = 'dash:{org_id}:v{version}:{name}:{digest}'
+_PENDING = 'dashboard_cache_orgs'
+_installed = False
+
+
+def normalize_filters(filters: Dict[str, Any]) -> str:
+    """Canonical JSON of the non-empty filters (order and blanks do not matter)."""
+    clean = {}
+    for k, v in (filters or {}).items():
+        if v in (None, '', [], ()):
+            continue
+        if isinstance(v, (list, tuple, set)):
+            v = sorted(str(x) for x in v)
+        else:
+            v = str(v)
+        clean[str(k)] = v
+    return json.dumps(clean, sort_keys=True, ensure_ascii=False)
+
+
+def _version(org_id) -> int:
+    v = rq.redis.get(_VERSION_KEY.format(org_id=org_id))
+    return int(v or 0)
+
+
+def cached(org_id: int, name: str, filters: Dict[str, Any], compute: Callable[[], Any]):
+    """Return the cached payload for (org, name, filters) or compute and store it."""
+    if rq.redis is None or not current_app.config.get('DASHBOARD_CACHE_ENABLED', True):
+        return compute()
+    try:
+        digest = hashlib.sha1(normalize_filters(filters).encode('utf-8')).hexdigest()
+        key = _PAYLOAD_KEY.format(org_id=org_id, version=_version(org_id), name=name, digest=digest)
+        blob = rq.redis.get(key)
+        if blob is not None:
+            return json.loads(blob)
+    except Exception:
+        return compute()
+    payload = compute()
+    try:
+        rq.redis.set(key, json.dumps(payload, ensure_ascii=False, default=str),
+                     ex=int(current_app.config.get('DASHBOARD_CACHE_TTL_SEC', 300)))
+    except Exception:
+        pass
+    return payload
+
+
+def invalidate(org_id: int):
+    """Bump the org's version so all its cached dashboard payloads are bypassed."""
+    if rq.redis is None:
+        return
+    try:
+        rq.redis.incr(_VERSION_KEY.format(org_id=org_id))
+    except Exception:
+        pass
+
+
+def _previous_orgs(session, obj) -> list:
+    """Orgs an updated row belonged to before this flush (it moved when ``org_id`` changed)."""
+    state = sa_inspect(obj)
+    hist = state.attrs.org_id.history
+    if not hist.added or state.identity is None:
+        return []
+    if hist.deleted:
+        return list(hist.deleted)
+    # org_id was expired (e.g. after a commit) when it was changed, so the
+    # history has no old value; read it from the database
+    model = type(obj)
+    return [session.query(model.org_id).filter(model.id == state.identity[0]).scalar()]
+
+
+def _before_flush(session, flush_context, instances):
+    orgs = session.info.setdefault(_PENDING, set())
+    dirty = [o for o in session.dirty if session.is_modified(o, include_collections=False)]
+    with session.no_autoflush:
+        for obj in list(session.new) + dirty + list(session.deleted):
+            if isinstance(obj, INVALIDATING_MODELS):
+                org_id = getattr(obj, 'org_id', None)
+                if org_id is not None:
+                    orgs.add(org_id)
+        # a row moved to another org also changes the old org's dashboard
+        for obj in dirty:
+            if isinstance(obj, INVALIDATING_MODELS):
+                orgs.update(o for o in _previous_orgs(session, obj) if o is not None)
+
+
+def _after_commit(session):
+    # bump only after commit so a concurrent reader can not cache pre-commit data
+    for org_id in session.info.pop(_PENDING, set()):
+        invalidate(org_id)
+
+
+def _after_rollback(session):
+    session.info.pop(_PENDING, None)
+
+
+def install():
+    """Register the invalidation hooks once per process (called from create_app)."""
+    global _installed
+    if not _installed:
+        event.listen(Session, 'before_flush', _before_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+        _installed = True
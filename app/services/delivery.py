@@ -0,0 +1,145 @@
+"""Send stored files (resumes, recordings, exports) to the browser without proxying them.
+
+Downloads used to read the whole object into memory (``download_bytes``)
+and wrap it in ``BytesIO``: large PDFs and recordings were buffered in the
+web worker and the audio player could not seek. ``send_stored`` picks the
+cheapest way to deliver a stored URL:
+
+* ``s3://``: 302 to a presigned GET URL valid for
+  ``S3_PRESIGN_EXPIRES_SEC`` (the browser fetches from S3 directly and S3
+  handles Range requests). With ``STORAGE_PRESIGN_DOWNLOADS=0`` the object
+  is streamed through instead, forwarding the Range header to S3;
+* ``file://``: handed off to the front web server when configured
+  (``STORAGE_SENDFILE=x-sendfile`` for Apache/lighttpd,
+  ``x-accel-redirect`` for nginx with an ``internal`` location that maps
+  ``STORAGE_ACCEL_PREFIX`` to ``LOCAL_STORAGE_DIR``), otherwise streamed
+  from disk by werkzeug with Range / If-None-Match support.
+"""
+import mimetypes
+import os
+import re
+import unicodedata
+from urllib.parse import quote
+
+from flask import current_app, redirect, request, send_file
+from werkzeug.http import dump_options_header
+
+from . import storage
+
+_RANGE_RE = re.compile(r'^bytes=\d*-\d*$')
+
+
+def _cfg(key, default):
+    try:
+        return current_app.config.get(key, default)
+    except Exception:
+        return default
+
+
+def guess_mimetype(name: str, default: str = 'application/octet-stream') -> str:
+    return mimetypes.guess_type(name or '')[0] or default
+
+
+def content_disposition(filename: str, as_attachment: bool) -> str:
+    """Content-Disposition value built the way werkzeug's ``send_file`` does."""
+    kind = 'attachment' if as_attachment else 'inline'
+    if not filename:
+        return kind
+    try:
+        filename.encode('ascii')
+        names = {'filename': filename}
+    except UnicodeEncodeError:
+        fallback = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii').strip()
+        # RFC 5987 attr-chars stay as they are
+        names = {'filename': fallback or 'download',
+                 'filename*': "UTF-8''" + quote(filename, safe="!#$&+-.^_`|~")}
+    return dump_options_header(kind, names)
+
+
+def _split_s3(url: str):
+    bucket, key = url.replace('s3://', '').split('/', 1)
+    return bucket, key
+
+
+def presigned_url(url: str, filename: str = None, mimetype: str = None, as_attachment: bool = True,
+                  expires: int = None) -> str:
+    bucket, key = _split_s3(url)
+    params = {'Bucket': bucket, 'Key': key,
+              'ResponseContentDisposition': content_disposition(filename or key.split('/')[-1], as_attachment)}
+    if mimetype:
+        params['ResponseContentType'] = mimetype
+    expires = int(expires or _cfg('S3_PRESIGN_EXPIRES_SEC', 300))
+    return storage.presign_client().generate_presigned_url('get_object', Params=params, ExpiresIn=expires)
+
+
+def _stream_s3(url, filename, mimetype, as_attachment):
+    bucket, key = _split_s3(url)
+    kwargs = {'Bucket': bucket, 'Key': key}
+    rng = request.headers.get('Range')
+    if rng and _RANGE_RE.match(rng.strip()):
+        kwargs['Range'] = rng.strip()
+    obj = storage.s3_backend().client.get_object(**kwargs)
+    body = storage.StorageStream(obj['Body'], length=obj.get('ContentLength'))
+
+    def chunks():
+        with body:
+            yield from body
+
+    resp = current_app.response_class(chunks(), mimetype=mimetype, direct_passthrough=True)
+    resp.status_code = obj.get('ResponseMetadata', {}).get('HTTPStatusCode', 200)
+    if obj.get('ContentRange'):
+        resp.headers['Content-Range'] = obj['ContentRange']
+    if obj.get('ContentLength') is not None:
+        resp.headers['Content-Length'] = str(obj['ContentLength'])
+    if obj.get('ETag'):
+        resp.headers['ETag'] = obj['ETag']
+    resp.headers['Accept-Ranges'] = 'bytes'
+    resp.headers['Content-Disposition'] = content_disposition(filename, as_attachment)
+    return resp
+
+
+def _offload_local(path, filename, mimetype, as_attachment):
+    """X-Sendfile / X-Accel-Redirect response, or None when not configured / not applicable."""
+    mode = (_cfg('STORAGE_SENDFILE', '') or '').lower()
+    if mode not in ('x-sendfile', 'x-accel-redirect'):
+        return None
+    resp = current_app.response_class(mimetype=mimetype)
+    resp.headers['Content-Disposition'] = content_disposition(filename, as_attachment)
+    if mode == 'x-sendfile':
+        # percent-encoded: header values are latin-1 (mod_xsendfile unescapes)
+        resp.headers['X-Sendfile'] = quote(path)
+        return resp
+    root = os.path.abspath(_cfg('LOCAL_STORAGE_DIR', './storage'))
+    rel = os.path.relpath(path, root)
+    if rel.startswith('..'):
+        return None
+    prefix = _cfg('STORAGE_ACCEL_PREFIX', '/_protected/')
+    resp.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(rel.replace(os.sep, '/'))
+    return resp
+
+
+def send_stored(url: str, filename: str = None, mimetype: str = None, as_attachment: bool = True,
+                max_age: int = None):
+    """Response delivering the stored object at ``url`` (see module docstring)."""
+    filename = filename or url.rstrip('/').split('/')[-1]
+    mimetype = mimetype or guess_mimetype(filename)
+    if url.startswith('s3://'):
+        if _cfg('STORAGE_PRESIGN_DOWNLOADS', True):
+            resp = redirect(presigned_url(url, filename, mimetype, as_attachment))
+            # the target expires; do not let the browser reuse the redirect
+            resp.headers['Cache-Control'] = 'no-store'
+            return resp
+        return _stream_s3(url, filename, mimetype, as_attachment)
+    if url.startswith('file://'):
+        path = url.replace('file://', '')
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        resp = _offload_local(path, filename, mimetype, as_attachment)
+        if resp is None:
+            # werkzeug streams the file and answers Range / conditional requests
+            resp = send_file(path, mimetype=mimetype, as_attachment=as_attachment, download_name=filename,
+                             conditional=True, max_age=max_age)
+            resp.cache_control.private = True
+            resp.headers['Accept-Ranges'] = 'bytes'
+        return resp
+    raise ValueError("Unsupported URL scheme")
@@ -0,0 +1,336 @@
+"""Browser-to-storage uploads of interview recordings, in parallel resumable parts.
+
+Recordings used to be posted to ``upload_recording`` / ``create_interview``:
+werkzeug spooled the whole file to a temp file, ``save_file`` then copied it
+to S3, and the web worker was busy for the duration of both transfers. The
+browser now uploads the file itself, split into ``part_size`` chunks sent
+concurrently (``app/static/direct_upload.js``):
+
+* ``s3``: an S3 multipart upload; each part is PUT straight to the bucket
+  with a presigned ``upload_part`` URL (presigned for
+  ``S3_PUBLIC_ENDPOINT`` when set). The web app only signs URLs;
+* ``local``: parts are PUT to ``/api/.../parts/<n>`` and written to
+  ``LOCAL_STORAGE_DIR/.uploads/<upload id>/`` as they arrive (the request
+  body is streamed to disk, never spooled or buffered).
+
+The upload state lives in a signed token (``SECRET_KEY``) instead of the
+database, valid for ``DIRECT_UPLOAD_EXPIRES_SEC``. It binds the org, user,
+interview and object key, so a client can only write the object it was
+given. ``describe`` reports which parts are already stored, which lets the
+browser resume an interrupted upload. ``complete`` assembles the object
+(part list is read from S3 / the staging directory, not trusted from the
+client) and returns its storage URL, plus the content hash on local storage
+where the parts are read anyway; the caller creates the ``Recording`` and
+enqueues transcription.
+
+Uploads that are neither completed nor aborted leave billed S3 multipart
+uploads or staging directories behind. Once their token has expired they
+can not be resumed, and ``purge_abandoned`` (``scripts/cleanup_storage.py``)
+removes them. On S3 an ``AbortIncompleteMultipartUpload`` lifecycle rule
+does the same without the script.
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+import time
+import uuid
+from collections import namedtuple
+
+from botocore.exceptions import ClientError
+from flask import current_app
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.utils import secure_filename
+
+from . import storage
+
+MB = storage.MB
+
+# S3 multipart limits
+MIN_PART_SIZE = 5 * MB
+MAX_PARTS = 10000
+
+_COPY_CHUNK = storage.STREAM_CHUNK_SIZE
+
+# sha256 / size are None when the parts were never read (S3)
+Completed = namedtuple('Completed', 'url sha256 size')
+
+
+class UploadError(ValueError):
+    """Invalid, expired or incomplete upload; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _cfg(key, default):
+    try:
+        return current_app.config.get(key, default)
+    except Exception:
+        return default
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='direct-upload')
+
+
+def _backend() -> str:
+    return 's3' if _cfg('STORAGE_BACKEND', 'local') == 's3' else 'local'
+
+
+def _expires_sec() -> int:
+    return int(_cfg('DIRECT_UPLOAD_EXPIRES_SEC', 86400))
+
+
+def plan_parts(size: int, part_size: int) -> tuple:
+    """``(part_size, count)`` for ``size`` bytes: parts of at least 5 MB, at most 10000 of them."""
+    part_size = max(int(part_size), MIN_PART_SIZE)
+    while -(-size // part_size) > MAX_PARTS:
+        part_size *= 2
+    return part_size, max(1, -(-size // part_size))
+
+
+def object_key(org_id: int, interview_id: int, filename: str) -> str:
+    # same prefix as upload_recording; the uuid keeps retried uploads of one file apart
+    name = secure_filename(filename or '')
+    ext = secure_filename(os.path.splitext(filename or '')[1])
+    if not name or (ext and '.' not in name):
+        # non-ASCII names reduce to (part of) the extension: keep the extension at least
+        name = 'recording' + ('.' + ext if ext else '')
+    return f"org{org_id}/interview{interview_id}/{uuid.uuid4().hex[:12]}-{name}"
+
+
+def _staging_dir(upload_id: str) -> str:
+    root = os.path.abspath(_cfg('LOCAL_STORAGE_DIR', './storage'))
+    return os.path.join(root, '.uploads', upload_id)
+
+
+def start(org_id: int, user_id: int, interview_id: int, filename: str, size: int,
+          content_type: str = None) -> dict:
+    """Begin an upload; returns the upload state (see ``token``)."""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size is required')
+    if size <= 0:
+        raise UploadError('empty file')
+    max_mb = int(_cfg('DIRECT_UPLOAD_MAX_MB', 2048))
+    if size > max_mb * MB:
+        raise UploadError(f'file exceeds {max_mb} MB', status=413)
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if not content_type or content_type == 'application/octet-stream':
+        # browsers send no (or a generic) type for some formats: judge by the name
+        content_type = (mimetypes.guess_type(filename or '')[0] or '').lower()
+    if not content_type.startswith(('audio/', 'video/')):
+        raise UploadError('unsupported content type', status=415)
+
+    part_size, count = plan_parts(size, int(_cfg('DIRECT_UPLOAD_PART_MB', 16)) * MB)
+    key = object_key(org_id, interview_id, filename)
+    backend = _backend()
+    if backend == 's3':
+        s3 = storage.s3_backend()
+        upload_id = s3.client.create_multipart_upload(Bucket=s3.bucket, Key=key,
+                                                      ContentType=content_type)['UploadId']
+    else:
+        upload_id = uuid.uuid4().hex
+        os.makedirs(_staging_dir(upload_id), exist_ok=True)
+    return {
+        'org_id': org_id, 'user_id': user_id, 'interview_id': interview_id,
+        'backend': backend, 'key': key, 'upload_id': upload_id, 'filename': filename,
+        'size': size, 'part_size': part_size, 'parts': count,
+    }
+
+
+def token(state: dict) -> str:
+    return _serializer().dumps(state)
+
+
+def load(value: str) -> dict:
+    """The upload state signed into ``value``; UploadError when tampered with or expired."""
+    if not value:
+        raise UploadError('upload token missing', status=401)
+    try:
+        return _serializer().loads(value, max_age=_expires_sec())
+    except SignatureExpired:
+        raise UploadError('upload expired', status=410)
+    except BadSignature:
+        raise UploadError('invalid upload token', status=401)
+
+
+def part_length(state: dict, number: int) -> int:
+    """Expected byte length of part ``number`` (1-based)."""
+    if not 1 <= number <= state['parts']:
+        raise UploadError('part number out of range')
+    if number < state['parts']:
+        return state['part_size']
+    return state['size'] - state['part_size'] * (state['parts'] - 1)
+
+
+def _done_parts(state: dict) -> dict:
+    """``{part number: {size[, etag]}}`` of the parts stored so far."""
+    if state['backend'] == 's3':
+        s3 = storage.s3_backend()
+        done = {}
+        kwargs = {'Bucket': s3.bucket, 'Key': state['key'], 'UploadId': state['upload_id']}
+        while True:
+            try:
+                resp = s3.client.list_parts(**kwargs)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') == 'NoSuchUpload':
+                    raise UploadError('upload not found', status=404)
+                raise
+            for p in resp.get('Parts', []):
+                done[p['PartNumber']] = {'size': p['Size'], 'etag': p['ETag']}
+            if not resp.get('IsTruncated'):
+                return done
+            kwargs['PartNumberMarker'] = resp['NextPartNumberMarker']
+    d = _staging_dir(state['upload_id'])
+    if not os.path.isdir(d):
+        raise UploadError('upload not found', status=404)
+    done = {}
+    for name in os.listdir(d):
+        if name.endswith('.part'):
+            done[int(name[:-5])] = {'size': os.path.getsize(os.path.join(d, name))}
+    return done
+
+
+def describe(state: dict, local_part_url=None) -> list:
+    """Parts of the upload as ``[{number, size, done, url}]``.
+
+    ``url`` is a fresh presigned PUT URL on S3, ``local_part_url(number)``
+    otherwise; parts already stored with the right size are ``done``.
+    """
+    done = _done_parts(state)
+    expires = int(_cfg('S3_PRESIGN_EXPIRES_SEC', 300))
+    # a part may wait behind the others; give each URL time for the whole upload
+    expires = max(expires, 3600)
+    out = []
+    for n in range(1, state['parts'] + 1):
+        length = part_length(state, n)
+        finished = n in done and done[n]['size'] == length
+        url = None
+        if not finished:
+            if state['backend'] == 's3':
+                s3 = storage.s3_backend()
+                url = storage.presign_client().generate_presigned_url(
+                    'upload_part', ExpiresIn=expires,
+                    Params={'Bucket': s3.bucket, 'Key': state['key'],
+                            'UploadId': state['upload_id'], 'PartNumber': n})
+            elif local_part_url is not None:
+                url = local_part_url(n)
+        out.append({'number': n, 'size': length, 'done': finished, 'url': url})
+    return out
+
+
+def write_part(state: dict, number: int, stream) -> int:
+    """Store part ``number`` of a local upload from ``stream``; returns its size."""
+    if state['backend'] != 'local':
+        raise UploadError('parts of S3 uploads go to the bucket')
+    expected = part_length(state, number)
+    d = _staging_dir(state['upload_id'])
+    if not os.path.isdir(d):
+        raise UploadError('upload not found', status=404)
+    path = os.path.join(d, f'{number}.part')
+    tmp = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+    written = 0
+    try:
+        with open(tmp, 'wb') as f:
+            while True:
+                chunk = stream.read(min(_COPY_CHUNK, expected + 1 - written))
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > expected:
+                    raise UploadError('part larger than expected', status=413)
+                f.write(chunk)
+        if written != expected:
+            raise UploadError(f'part {number} incomplete ({written} of {expected} bytes)')
+        # atomic: a retried part replaces the previous attempt
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return written
+
+
+def complete(state: dict) -> Completed:
+    """Assemble the uploaded parts; returns ``Completed(url, sha256, size)`` of the recording."""
+    done = _done_parts(state)
+    missing = [n for n in range(1, state['parts'] + 1)
+               if n not in done or done[n]['size'] != part_length(state, n)]
+    if missing:
+        raise UploadError(f'{len(missing)} part(s) missing', status=409)
+    if state['backend'] == 's3':
+        s3 = storage.s3_backend()
+        parts = [{'PartNumber': n, 'ETag': done[n]['etag']} for n in range(1, state['parts'] + 1)]
+        s3.client.complete_multipart_upload(Bucket=s3.bucket, Key=state['key'], UploadId=state['upload_id'],
+                                            MultipartUpload={'Parts': parts})
+        return Completed(f"s3://{s3.bucket}/{state['key']}", None, None)
+
+    d = _staging_dir(state['upload_id'])
+    root = os.path.abspath(_cfg('LOCAL_STORAGE_DIR', './storage'))
+    dest = os.path.join(root, state['key'])
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f'{dest}.tmp'
+    # hashed while assembling so the transcribe job does not read the file again
+    digest, size = hashlib.sha256(), 0
+    with open(tmp, 'wb') as out:
+        for n in range(1, state['parts'] + 1):
+            with open(os.path.join(d, f'{n}.part'), 'rb') as src:
+                for chunk in iter(lambda: src.read(_COPY_CHUNK), b''):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+    os.replace(tmp, dest)
+    shutil.rmtree(d, ignore_errors=True)
+    return Completed(f"file://{dest}", digest.hexdigest(), size)
+
+
+def stored_url(state: dict) -> str:
+    """URL the finished upload is stored under (to recognise an already completed upload)."""
+    if state['backend'] == 's3':
+        return f"s3://{storage.s3_backend().bucket}/{state['key']}"
+    return f"file://{os.path.join(os.path.abspath(_cfg('LOCAL_STORAGE_DIR', './storage')), state['key'])}"
+
+
+def abort(state: dict):
+    """Discard the parts of an unfinished upload."""
+    if state['backend'] == 's3':
+        s3 = storage.s3_backend()
+        try:
+            s3.client.abort_multipart_upload(Bucket=s3.bucket, Key=state['key'], UploadId=state['upload_id'])
+        except Exception:
+            current_app.logger.warning('direct upload: abort of %s failed', state['key'], exc_info=True)
+    else:
+        shutil.rmtree(_staging_dir(state['upload_id']), ignore_errors=True)
+
+
+def purge_abandoned(max_age_sec: int = None) -> int:
+    """Discard uploads started more than ``max_age_sec`` ago (the token lifetime); returns how many."""
+    cutoff = time.time() - (max_age_sec if max_age_sec is not None else _expires_sec())
+    removed = 0
+    if _backend() == 's3':
+        s3 = storage.s3_backend()
+        paginator = s3.client.get_paginator('list_multipart_uploads')
+        for page in paginator.paginate(Bucket=s3.bucket):
+            for up in page.get('Uploads', []):
+                if up['Initiated'].timestamp() >= cutoff:
+                    continue
+                try:
+                    s3.client.abort_multipart_upload(Bucket=s3.bucket, Key=up['Key'], UploadId=up['UploadId'])
+                    removed += 1
+                except ClientError:
+                    current_app.logger.warning('direct upload: abort of %s failed', up['Key'], exc_info=True)
+    root = os.path.join(os.path.abspath(_cfg('LOCAL_STORAGE_DIR', './storage')), '.uploads')
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            d = os.path.join(root, name)
+            try:
+                # the directory changes with every part written
+                if os.path.isdir(d) and os.path.getmtime(d) < cutoff:
+                    shutil.rmtree(d, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
@@ -0,0 +1,178 @@
+"""Cursor (keyset) pagination for the candidate and interview lists.
+
+``paginate()`` runs ``COUNT(*)`` over the filtered set and an ``OFFSET``
+scan on every page, so deep pages get slower with the table. Here a page is
+``WHERE (sort key) > (last row's sort key) ORDER BY sort key LIMIT n+1``,
+which walks the (org_id, ...) indexes and costs the same on page 1 and page
+5000. Next/prev links carry an opaque token with the boundary row's sort
+key.
+
+Sort columns may be NULL (interviews.scheduled_at); NULLs sort last in both
+directions, matching what the lists showed before on PostgreSQL. The last
+sort column must be unique (the id).
+
+The total shown next to the pager is approximate: an exact count cached per
+org and filter set (``dashboard_cache``, dropped on writes), or on
+PostgreSQL the planner's row estimate once that is above
+``KEYSET_EXACT_COUNT_MAX``.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from flask import current_app
+from sqlalchemy import and_, false, or_
+
+from ..extensions import db
+
+
+def _cfg(key, default):
+    try:
+        return current_app.config.get(key, default)
+    except Exception:
+        return default
+
+
+def _dump(v):
+    if isinstance(v, datetime):
+        return {'dt': v.isoformat()}
+    if isinstance(v, date):
+        return {'d': v.isoformat()}
+    return v
+
+
+def _load(v):
+    if isinstance(v, dict):
+        if 'dt' in v:
+            return datetime.fromisoformat(v['dt'])
+        if 'd' in v:
+            return date.fromisoformat(v['d'])
+    return v
+
+
+def encode_cursor(values: Sequence[Any], direction: str) -> str:
+    raw = json.dumps({'k': [_dump(v) for v in values], 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: Optional[str], n_keys: int) -> Optional[Tuple[List[Any], str]]:
+    """``(values, 'next'|'prev')`` or None for a missing/garbled token."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        values = [_load(v) for v in data['k']]
+        direction = data['d']
+        if len(values) != n_keys or direction not in ('next', 'prev'):
+            return None
+        return values, direction
+    except Exception:
+        return None
+
+
+def _eq(col, v):
+    return col.is_(None) if v is None else col == v
+
+
+def _beyond(col, v, asc: bool, forward: bool):
+    """Rows strictly after (forward) / before value ``v`` in ``col`` (NULLs last)."""
+    if forward:
+        if v is None:
+            return false()
+        return or_(col > v if asc else col < v, col.is_(None))
+    if v is None:
+        return col.isnot(None)
+    return col < v if asc else col > v
+
+
+def _seek(order: Sequence[Tuple[Any, str]], values: Sequence[Any], forward: bool):
+    clauses = []
+    for i, (col, direction) in enumerate(order):
+        prefix = [_eq(order[j][0], values[j]) for j in range(i)]
+        clauses.append(and_(*prefix, _beyond(col, values[i], direction == 'asc', forward)))
+    return or_(*clauses)
+
+
+def _order_by(order, forward: bool):
+    out = []
+    for col, direction in order:
+        asc = (direction == 'asc') == forward
+        term = col.asc() if asc else col.desc()
+        # NULLs last going forward, so first when walking backwards
+        out.append(term.nulls_last() if forward else term.nulls_first())
+    return out
+
+
+class KeysetPage:
+    """One page of rows plus the tokens for the neighbouring pages."""
+    keyset = True
+
+    def __init__(self, items, per_page, next_cursor, prev_cursor, total=None, total_is_estimate=False):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.has_next = next_cursor is not None
+        self.has_prev = prev_cursor is not None
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+
+def paginate(query, order: Sequence[Tuple[Any, str]], cursor: Optional[str], per_page: int = 20,
+             total=None, total_is_estimate: bool = False) -> KeysetPage:
+    """Return the page after/before ``cursor`` of ``query`` ordered by ``order``.
+
+    ``order`` is ``[(column, 'asc'|'desc'), ...]`` ending with a unique column.
+    """
+    per_page = max(1, min(int(per_page or 20), int(_cfg('KEYSET_MAX_PER_PAGE', 200))))
+    cols = [c for c, _ in order]
+    decoded = decode_cursor(cursor, len(cols))
+    forward = decoded is None or decoded[1] == 'next'
+    q = query
+    if decoded is not None:
+        q = q.filter(_seek(order, decoded[0], forward))
+    rows = q.order_by(*_order_by(order, forward)).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def key(row):
+        return [getattr(row, c.key) for c in cols]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if more or not forward:
+            next_cursor = encode_cursor(key(rows[-1]), 'next')
+        if decoded is not None and (forward or more):
+            prev_cursor = encode_cursor(key(rows[0]), 'prev')
+    return KeysetPage(rows, per_page, next_cursor, prev_cursor, total, total_is_estimate)
+
+
+def _planner_estimate(query) -> Optional[int]:
+    conn = db.session.connection()
+    if conn.dialect.name != 'postgresql':
+        return None
+    compiled = query.statement.compile(dialect=conn.dialect)
+    plan = conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def approximate_total(query, org_id: int, name: str, filters) -> Tuple[Optional[int], bool]:
+    """``(total, is_estimate)`` for the filtered list; ``(None, False)`` on failure."""
+    try:
+        estimate = _planner_estimate(query)
+        if estimate is not None and estimate > int(_cfg('KEYSET_EXACT_COUNT_MAX', 10000)):
+            return estimate, True
+        from . import dashboard_cache
+        total = dashboard_cache.cached(org_id, f'count:{name}', filters,
+                                       lambda: query.order_by(None).count())
+        return int(total), False
+    except Exception:
+        current_app.logger.exception('keyset: counting %s failed', name)
+        db.session.rollback()
+        return None, False
@@ -0,0 +1,136 @@
+"""Response cache for deterministic-enough LLM calls.
+
+``gen_evaluation`` and the analyze job are re-run with identical prompts all
+the time (re-analysis without a transcript change, evaluate_application and
+evaluate_interview on the same transcript...). Responses are cached in Redis
+keyed by (model, prompt hash, temperature), with a TTL per entry and LRU
+eviction above ``LLM_CACHE_MAX_ENTRIES``: a sorted set tracks last access and
+the oldest entries are dropped on insert. When Redis is unreachable a small
+per-process LRU is used instead.
+
+Orgs can opt out (fresh evaluation on every call) with the
+``LLM_CACHE_BYPASS`` setting on the org/heuristic page.
+"""
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from flask import current_app
+
+from ..extensions import rq
+
+_ENTRY_KEY = 'llm:resp:{key}'
+_LRU_KEY = 'llm:resp:lru'
+_COUNTER_PREFIX = 'llm:resp:'
+_LOCAL_MAX = 256
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+_local_counters = {'hits': 0, 'misses': 0}
+
+
+def _cfg(key, default):
+    try:
+        return current_app.config.get(key, default)
+    except Exception:
+        return default
+
+
+def cache_key(model: str, prompt: str, temperature=None, **params) -> str:
+    """Stable key for (model, prompt hash, temperature); other params go into the prompt hash."""
+    prompt_hash = hashlib.sha256(
+        (prompt or '').encode('utf-8') + b'\x00' + json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    material = json.dumps({'model': model, 'prompt': prompt_hash, 'temperature': temperature}, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def bypassed(org_id=None) -> bool:
+    """True when caching is disabled globally or for ``org_id``."""
+    if not _cfg('LLM_CACHE_ENABLED', True):
+        return True
+    if org_id is None:
+        return False
+    try:
+        from ..models.setting import Setting
+        row = Setting.query.filter_by(org_id=org_id, key='LLM_CACHE_BYPASS').first()
+        return bool(row and str(row.value).strip().lower() in ('1', 'true', 'on', 'yes'))
+    except Exception:
+        return False
+
+
+def _bump(name: str):
+    try:
+        if rq.redis is not None:
+            rq.redis.incr(_COUNTER_PREFIX + name)
+            return
+    except Exception:
+        pass
+    _local_counters[name] += 1
+
+
+def stats() -> Dict[str, int]:
+    out = dict(_local_counters)
+    try:
+        if rq.redis is not None:
+            vals = rq.redis.mget([_COUNTER_PREFIX + 'hits', _COUNTER_PREFIX + 'misses'])
+            out = {'hits': int(vals[0] or 0), 'misses': int(vals[1] or 0),
+                   'entries': int(rq.redis.zcard(_LRU_KEY) or 0)}
+    except Exception:
+        pass
+    return out
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    value = None
+    try:
+        if rq.redis is None:
+            raise ConnectionError('redis unavailable')
+        blob = rq.redis.get(_ENTRY_KEY.format(key=key))
+        if blob is not None:
+            value = json.loads(zlib.decompress(blob).decode('utf-8'))
+            rq.redis.zadd(_LRU_KEY, {key: time.time()})
+    except Exception:
+        with _local_lock:
+            item = _local.get(key)
+            if item is not None and item[0] > time.time():
+                _local.move_to_end(key)
+                value = item[1]
+            elif item is not None:
+                _local.pop(key, None)
+    _bump('hits' if value is not None else 'misses')
+    return value
+
+
+def put(key: str, value: Dict[str, Any]):
+    ttl = int(_cfg('LLM_CACHE_TTL_SEC', 7 * 86400))
+    max_entries = int(_cfg('LLM_CACHE_MAX_ENTRIES', 5000))
+    try:
+        if rq.redis is None:
+            raise ConnectionError('redis unavailable')
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'), 6)
+        now = time.time()
+        pipe = rq.redis.pipeline()
+        pipe.set(_ENTRY_KEY.format(key=key), blob, ex=ttl)
+        pipe.zadd(_LRU_KEY, {key: now})
+        # members whose entry already expired by TTL
+        pipe.zremrangebyscore(_LRU_KEY, '-inf', now - ttl)
+        pipe.zcard(_LRU_KEY)
+        size = pipe.execute()[-1]
+        if max_entries and size > max_entries:
+            doomed = rq.redis.zrange(_LRU_KEY, 0, size - max_entries - 1)
+            if doomed:
+                pipe = rq.redis.pipeline()
+                pipe.delete(*[_ENTRY_KEY.format(key=k.decode() if isinstance(k, bytes) else k) for k in doomed])
+                pipe.zrem(_LRU_KEY, *doomed)
+                pipe.execute()
+    except Exception:
+        with _local_lock:
+            _local[key] = (time.time() + ttl, value)
+            _local.move_to_end(key)
+            while len(_local) > min(_LOCAL_MAX, max_entries or _LOCAL_MAX):
+                _local.popitem(last=False)
@@ -0,0 +1,313 @@
+"""Shared client for the OpenAI Responses HTTP API.
+
+Every LLM call in the app (``gen_evaluation``, ``app/api/analyze.py``) goes
+through this module so they share:
+
+- one pooled ``requests.Session`` per process (keep-alive, no new TLS
+  handshake per call);
+- a global concurrency and tokens-per-minute limiter, kept in Redis so it
+  applies across all workers (per-process semaphore when Redis is down);
+- one retry policy: short waits are retried inline, anything longer raises
+  ``RetryLater`` so an RQ job can be rescheduled instead of sleeping in the
+  worker (see ``app/jobs/runtime.py``);
+- ``respond_many`` for running several independent calls concurrently;
+- an opt-in response cache (``cache=True``, see ``llm_cache``).
+
+Like ``openai_wrap`` we call the HTTP API with ``requests`` instead of the
+``openai`` SDK.
+"""
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+from flask import current_app
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except Exception:
+    # allow the app to start even if requests is not installed in the environment.
+    requests = None
+    HTTPAdapter = None
+
+from ..extensions import rq
+
+RESPONSES_URL = 'https://api.openai.com/v1/responses'
+
+_INFLIGHT_KEY = 'llm:inflight'
+_TPM_KEY = 'llm:tpm:{window}'
+# a slot whose holder died is reclaimed after this many seconds
+_LEASE_SEC = 120
+
+
+class LLMError(Exception):
+    """Non-retryable LLM failure (bad request, auth, insufficient quota...)."""
+
+
+class RetryLater(LLMError):
+    """Rate limited or transiently failing; try again after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after: float, message: str = 'rate limited'):
+        super().__init__(f'{message} (retry after {retry_after:.1f}s)')
+        self.retry_after = float(retry_after)
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+_local_sem = None
+
+
+def enabled() -> bool:
+    return bool(current_app.config.get('OPENAI_API_KEY')) and requests is not None
+
+
+def _cfg(key, default):
+    try:
+        return current_app.config.get(key, default)
+    except Exception:
+        return default
+
+
+def _get_session():
+    global _session, _session_pid
+    with _session_lock:
+        # sessions (and their sockets) must not be shared across a fork
+        if _session is None or _session_pid != os.getpid():
+            s = requests.Session()
+            size = max(4, int(_cfg('LLM_MAX_CONCURRENCY', 8)))
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=size)
+            s.mount('https://', adapter)
+            s.mount('http://', adapter)
+            _session = s
+            _session_pid = os.getpid()
+        return _session
+
+
+def _get_local_sem():
+    global _local_sem
+    with _session_lock:
+        if _local_sem is None:
+            _local_sem = threading.BoundedSemaphore(max(1, int(_cfg('LLM_MAX_CONCURRENCY', 8))))
+        return _local_sem
+
+
+# KEYS[1] = in-flight zset (member -> lease expiry), KEYS[2] = token counter of this minute
+# ARGV = now, lease_sec, max_inflight, member, tokens, tokens_per_minute
+# returns 0 = acquired, 1 = too many in flight, -1 = minute token budget spent
+_ACQUIRE_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if tonumber(ARGV[3]) > 0 and redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+  return 1
+end
+if tonumber(ARGV[6]) > 0 then
+  local used = tonumber(redis.call('GET', KEYS[2]) or '0')
+  if used > 0 and used + tonumber(ARGV[5]) > tonumber(ARGV[6]) then
+    return -1
+  end
+  redis.call('INCRBY', KEYS[2], ARGV[5])
+  redis.call('EXPIRE', KEYS[2], 120)
+end
+redis.call('ZADD', KEYS[1], tonumber(ARGV[1]) + tonumber(ARGV[2]), ARGV[4])
+return 0
+"""
+_acquire_script = None
+
+
+def estimate_tokens(text: str, max_output_tokens: int = 0) -> int:
+    # rough: Japanese is ~1 token per 1-2 chars; good enough for budgeting
+    return int(len(text or '') / 2) + int(max_output_tokens or 0)
+
+
+@contextmanager
+def _slot(tokens: int, max_wait: float):
+    """Hold one global in-flight slot (and reserve ``tokens``) for a call."""
+    global _acquire_script
+    max_inflight = int(_cfg('LLM_MAX_CONCURRENCY', 8))
+    tpm = int(_cfg('LLM_TOKENS_PER_MINUTE', 0) or 0)
+    member = uuid.uuid4().hex
+    deadline = time.monotonic() + max_wait
+    redis_conn = rq.redis
+
+    if redis_conn is not None:
+        try:
+            if _acquire_script is None:
+                _acquire_script = redis_conn.register_script(_ACQUIRE_LUA)
+            while True:
+                now = time.time()
+                window = int(now // 60)
+                res = _acquire_script(keys=[_INFLIGHT_KEY, _TPM_KEY.format(window=window)],
+                                      args=[now, _LEASE_SEC, max_inflight, member, tokens, tpm],
+                                      client=redis_conn)
+                if int(res) == 0:
+                    break
+                wait = (60 - (now % 60)) if int(res) < 0 else 0.25
+                if time.monotonic() + wait > deadline:
+                    raise RetryLater(wait if int(res) < 0 else 1.0,
+                                     'token budget exhausted' if int(res) < 0 else 'too many concurrent LLM calls')
+                time.sleep(wait)
+        except RetryLater:
+            raise
+        except Exception:
+            # Redis unreachable: fall back to a per-process limit
+            redis_conn = None
+
+    if redis_conn is None:
+        sem = _get_local_sem()
+        if not sem.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise RetryLater(1.0, 'too many concurrent LLM calls')
+        try:
+            yield
+        finally:
+            sem.release()
+        return
+
+    try:
+        yield
+    finally:
+        try:
+            redis_conn.zrem(_INFLIGHT_KEY, member)
+        except Exception:
+            pass
+
+
+def _retry_after(resp) -> float:
+    try:
+        ra = resp.headers.get('Retry-After')
+        return float(ra) if ra else None
+    except Exception:
+        # sometimes Retry-After is an HTTP-date; fall back to backoff
+        return None
+
+
+def respond(input: str, model: str = 'gpt-4o-mini', max_output_tokens: int = 600,
+            temperature: float = None, timeout: float = 30, cache: bool = False,
+            org_id: int = None, **extra) -> Dict[str, Any]:
+    """POST one request to the Responses API and return the JSON body.
+
+    With ``cache=True`` an identical earlier response (same model, prompt
+    and temperature) is returned without calling the API, unless caching is
+    bypassed for ``org_id``.
+
+    Raises ``LLMError`` for non-retryable failures and ``RetryLater`` when
+    the call should be retried later than we are willing to wait inline.
+    """
+    api_key = current_app.config.get('OPENAI_API_KEY')
+    if not api_key or requests is None:
+        raise LLMError('OpenAI is not configured (missing OPENAI_API_KEY or requests)')
+
+    key = None
+    if cache:
+        from . import llm_cache
+        if not llm_cache.bypassed(org_id):
+            key = llm_cache.cache_key(model, input, temperature, max_output_tokens=max_output_tokens, **extra)
+            hit = llm_cache.get(key)
+            if hit is not None:
+                return hit
+
+    body = {'model': model, 'input': input, 'max_output_tokens': max_output_tokens}
+    if temperature is not None:
+        body['temperature'] = temperature
+    body.update(extra)
+    headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
+
+    max_attempts = max(1, int(_cfg('LLM_MAX_ATTEMPTS', 3)))
+    max_inline_wait = float(_cfg('LLM_MAX_INLINE_WAIT_SEC', 5))
+    tokens = estimate_tokens(input, max_output_tokens)
+    session = _get_session()
+    backoff = 1.0
+    wait = backoff
+    for attempt in range(1, max_attempts + 1):
+        resp = None
+        with _slot(tokens, max_wait=max_inline_wait):
+            try:
+                resp = session.post(RESPONSES_URL, headers=headers, json=body, timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                reason = f'network error: {e}'
+                wait = backoff
+
+        if resp is not None:
+            if resp.status_code == 429 or 500 <= resp.status_code < 600:
+                body_text = resp.text or ''
+                # if the response body indicates insufficient_quota, don't retry
+                if resp.status_code == 429 and ('insufficient_quota' in body_text or 'quota' in body_text.lower()):
+                    raise LLMError(f'OpenAI insufficient quota: {body_text[:500]}')
+                reason = f'HTTP {resp.status_code}: {body_text[:500]}'
+                wait = _retry_after(resp) or backoff
+            elif resp.status_code >= 400:
+                raise LLMError(f'OpenAI HTTP error {resp.status_code}: {(resp.text or "")[:1000]}')
+            else:
+                jr = resp.json()
+                if key and output_text(jr):
+                    llm_cache.put(key, jr)
+                return jr
+
+        current_app.logger.warning('OpenAI %s failed, attempt %s/%s, retry in %.1fs: %s',
+                                   model, attempt, max_attempts, wait, reason)
+        if attempt == max_attempts or wait > max_inline_wait:
+            break
+        time.sleep(wait + random.uniform(0, 0.5))
+        backoff *= 2
+    raise RetryLater(wait, f'OpenAI {model} unavailable')
+
+
+def output_text(jr: Dict[str, Any]) -> str:
+    """Extract the text output from a Responses API JSON body."""
+    if not isinstance(jr, dict):
+        return ''
+    text = jr.get('output_text') or ''
+    if text:
+        return text
+    out = jr.get('output') or jr.get('results') or []
+    parts = []
+    for item in out:
+        if isinstance(item, dict):
+            for c in item.get('content', []):
+                if isinstance(c, dict) and 'text' in c:
+                    parts.append(c['text'])
+                elif isinstance(c, str):
+                    parts.append(c)
+        elif isinstance(item, str):
+            parts.append(item)
+    return '\n'.join(parts)
+
+
+def respond_many(calls: List[Dict[str, Any]], max_workers: int = None) -> List[Any]:
+    """Run several ``respond`` calls concurrently (still globally limited).
+
+    ``calls`` is a list of kwargs dicts for ``respond``. Returns results in
+    the same order; a failed call yields its exception instead of a result.
+    """
+    if not calls:
+        return []
+    app = current_app._get_current_object()
+    workers = max_workers or min(len(calls), max(1, int(_cfg('LLM_MAX_CONCURRENCY', 8))))
+
+    def run(kwargs):
+        with app.app_context():
+            try:
+                return respond(**kwargs)
+            except Exception as e:
+                return e
+
+    if len(calls) == 1:
+        return [run(calls[0])]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, calls))
+
+
+def should_defer() -> bool:
+    """True when running in an RQ job that may still be rescheduled on ``RetryLater``."""
+    try:
+        from rq import get_current_job
+        job = get_current_job()
+    except Exception:
+        return False
+    if job is None:
+        return False
+    return int(job.meta.get('llm_reschedules', 0)) < int(_cfg('LLM_MAX_RESCHEDULES', 5))
@@ -17,10 +17,14 @@ import mimetypes
 import re
 from typing import Dict, Any
 
+from . import llm_client
 
-def transcribe_whisper(audio_bytes: bytes, language: str = "ja", filename: str = None) -> str:
-    """Transcribe audio bytes using Deepgram REST API.
 
+def transcribe_whisper(audio_bytes, language: str = "ja", filename: str = None) -> str:
+    """Transcribe audio using Deepgram REST API.
+
+    ``audio_bytes`` may be raw bytes or a readable stream (see
+    ``storage.open_stream``), which is uploaded in chunks.
     Returns a transcript string on success or a short dummy string on failure.
     """
     dg_key = current_app.config.get('DEEPGRAM_API_KEY')
@@ -41,6 +45,7 @@ def transcribe_whisper(audio_bytes: bytes, language: str = "ja", filename: str =
             url += f"&language={language}"
 
         content_type = 'audio/wav'
+        filename = filename or getattr(audio_bytes, 'name', None)
         if filename:
             guessed = mimetypes.guess_type(filename)[0]
             if guessed:
@@ -74,8 +79,12 @@ def transcribe_whisper(audio_bytes: bytes, language: str = "ja", filename: str =
         return "(ダミー) これはDeepgramで文字起こししたテキストです。"
 
 
-def deepgram_raw_transcribe(audio_bytes: bytes, language: str = "ja", filename: str = None) -> dict:
-    """Return the full Deepgram JSON response (best-effort)."""
+def deepgram_raw_transcribe(audio_bytes, language: str = "ja", filename: str = None) -> dict:
+    """Return the full Deepgram JSON response (best-effort).
+
+    ``audio_bytes`` may be raw bytes or a readable stream; streams are sent
+    without buffering the whole recording in memory.
+    """
     dg_key = current_app.config.get('DEEPGRAM_API_KEY')
     if not dg_key:
         return {}
@@ -112,6 +121,7 @@ def deepgram_raw_transcribe(audio_bytes: bytes, language: str = "ja", filename:
         url = 'https://api.deepgram.com/v1/listen' + ('?' + '&'.join(params) if params else '')
 
         content_type = 'audio/wav'
+        filename = filename or getattr(audio_bytes, 'name', None)
         if filename:
             guessed = mimetypes.guess_type(filename)[0]
             if guessed:
@@ -134,10 +144,12 @@ def deepgram_raw_transcribe(audio_bytes: bytes, language: str = "ja", filename:
         return {}
 
 
-def gen_evaluation(payload: Dict[str, Any]) -> Dict[str, Any]:
+def gen_evaluation(payload: Dict[str, Any], org_id: int = None) -> Dict[str, Any]:
     """Generate a structured evaluation JSON from a transcript using OpenAI Responses API.
 
     payload expects keys: rubric (list), transcript (str), role (str), company_values (list)
+    Identical prompts are served from the LLM response cache unless the org
+    (``org_id``) bypasses it.
     """
     rubric = payload.get('rubric', [])
     transcript = payload.get('transcript', '') or ''
@@ -154,6 +166,17 @@ def gen_evaluation(payload: Dict[str, Any]) -> Dict[str, Any]:
             'summary': f'(ダミー) 要約: 候補者は概ね良好です。Transcript抜粋: {transcript[:60]}...'
         }
 
+    # long transcripts are condensed chunk-by-chunk (map stage, cached by chunk
+    # hash) instead of being pasted into the prompt whole
+    from .summarize import condensed_transcript
+    try:
+        transcript = condensed_transcript(text=transcript)
+    except llm_client.RetryLater:
+        if llm_client.should_defer():
+            raise
+        current_app.logger.warning('transcript condensation rate limited, using the truncated transcript')
+        transcript = transcript[:12000]
+
     prompt_lines = ["あなたは採用面接の評価者です。以下の条件に従い出力は必ずJSONのオブジェクトだけを返してください。",
                     "- rubricごとに0-5のスコアを付け、rubric_scoresに辞書で入れること。",
                     "- totalには合計点を、decisionにはpass/hold/failのいずれかを入れること。",
@@ -176,118 +199,19 @@ def gen_evaluation(payload: Dict[str, Any]) -> Dict[str, Any]:
         pass
     prompt = "\n".join(prompt_lines)
 
-    url = 'https://api.openai.com/v1/responses'
-    headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
-    body = {
-        'model': 'gpt-4o-mini',
-        'input': prompt,
-        'max_output_tokens': 600,
-        'temperature': 0.2,
-    }
-
-    # improved retry for rate limits / transient errors
-    # - increase attempts
-    # - respect Retry-After header when present
-    # - use exponential backoff with small jitter
-    import time
-    import random
-    max_attempts = 6
-    backoff = 1.0
+    # shared client: pooled session, global rate limiter and one retry policy.
+    # RetryLater is re-raised inside RQ jobs so the job is rescheduled rather
+    # than sleeping in the worker; elsewhere we fall back to a dummy evaluation.
     jr = None
-    for attempt in range(1, max_attempts + 1):
-        try:
-            if requests is None:
-                try:
-                    current_app.logger.warning('requests not installed; skipping OpenAI call and returning fallback evaluation')
-                except Exception:
-                    pass
-                jr = None
-                break
-            r = requests.post(url, headers=headers, json=body, timeout=30)
-            # if we get an explicit 429, prefer honoring Retry-After header
-            if r.status_code == 429:
-                ra = r.headers.get('Retry-After')
-                wait = None
-                if ra:
-                    try:
-                        wait = float(ra)
-                    except Exception:
-                        try:
-                            # sometimes Retry-After is an HTTP-date; fallback to backoff
-                            wait = backoff
-                        except Exception:
-                            wait = backoff
-                else:
-                    wait = backoff
-                # if the response body indicates insufficient_quota, don't retry
-                body_text = r.text or ''
-                if 'insufficient_quota' in body_text or 'quota' in body_text.lower():
-                    try:
-                        current_app.logger.error('OpenAI 429 indicates insufficient quota, returning fallback evaluation; body=%s', body_text[:2000])
-                    except Exception:
-                        pass
-                    jr = None
-                    break
-                try:
-                    current_app.logger.warning(f'OpenAI request returned 429, attempt {attempt}/{max_attempts}, retrying in {wait}s; resp_body={body_text[:1000]}')
-                except Exception:
-                    pass
-                time.sleep(wait + random.uniform(0, 0.5))
-                backoff *= 2
-                continue
-
-            # raise for other HTTP error statuses
-            try:
-                r.raise_for_status()
-            except requests.exceptions.HTTPError as e:
-                status = getattr(e.response, 'status_code', None)
-                body = None
-                try:
-                    body = e.response.text
-                except Exception:
-                    body = None
-                if status == 429 or (status and 500 <= status < 600):
-                    # transient server error -> retry
-                    try:
-                        ra = e.response.headers.get('Retry-After') if e.response is not None else None
-                        wait = float(ra) if ra else backoff
-                    except Exception:
-                        wait = backoff
-                    try:
-                        current_app.logger.warning(f'OpenAI request failed with {status}, attempt {attempt}/{max_attempts}, retrying in {wait}s; body={body[:1000] if body else None}')
-                    except Exception:
-                        pass
-                    time.sleep(wait + random.uniform(0, 0.5))
-                    backoff *= 2
-                    continue
-                else:
-                    # non-retryable HTTP error
-                    try:
-                        current_app.logger.error(f'OpenAI HTTP error {status}: {body[:1000] if body else None}')
-                    except Exception:
-                        pass
-                    raise
-
-            jr = r.json()
-            break
-        except requests.exceptions.RequestException:
-            # network-level error; retry with backoff
-            try:
-                current_app.logger.warning(f'OpenAI network error, attempt {attempt}/{max_attempts}, retrying in {backoff}s')
-            except Exception:
-                pass
-            time.sleep(backoff + random.uniform(0, 0.5))
-            backoff *= 2
-            continue
-        except Exception:
-            # unexpected parsing/other errors; log and retry a couple times
-            try:
-                current_app.logger.warning(f'OpenAI request unexpected error, attempt {attempt}/{max_attempts}')
-            except Exception:
-                pass
-            time.sleep(backoff + random.uniform(0, 0.5))
-            backoff *= 2
-            continue
+    try:
+        jr = llm_client.respond(prompt, model='gpt-4o-mini', max_output_tokens=600, temperature=0.2,
+                                cache=True, org_id=org_id)
+    except llm_client.RetryLater:
+        if llm_client.should_defer():
+            raise
+        current_app.logger.warning('OpenAI rate limited, returning fallback evaluation')
+    except Exception:
+        current_app.logger.exception('OpenAI Responses call failed, returning fallback evaluation')
 
     # if we couldn't get a response JSON after retries, fallback
     if jr is None:
@@ -306,22 +230,7 @@ def gen_evaluation(payload: Dict[str, Any]) -> Dict[str, Any]:
 
     try:
         # extract text from known shapes
-        text = ''
-        if isinstance(jr, dict):
-            text = jr.get('output_text') or ''
-            if not text:
-                out = jr.get('output') or jr.get('results') or []
-                parts = []
-                for item in out:
-                    if isinstance(item, dict):
-                        for c in item.get('content', []):
-                            if isinstance(c, dict) and 'text' in c:
-                                parts.append(c['text'])
-                            elif isinstance(c, str):
-                                parts.append(c)
-                    elif isinstance(item, str):
-                        parts.append(item)
-                text = '\n'.join(parts)
+        text = llm_client.output_text(jr)
 
         # parse JSON block if present
         m = re.search(r"\{[\s\S]*\}", text)
@@ -1,5 +1,23 @@
+"""HTML previews of office files (docx / xlsx / pptx), rendered once and cached.
+
+``view_file`` used to download the file and re-parse it with python-docx /
+openpyxl / python-pptx on every view. The preview is now rendered by a
+background job right after upload (``app/jobs/preview.py``) and stored next
+to the original as ``<sha256 of the content>.v<RENDERER_VERSION>.html``;
+its location is kept in ``files.file_metadata['preview']``. Views serve the
+stored HTML with an ETag derived from the content hash and renderer
+version, so repeat views are answered with 304 without touching storage.
+
+Bump ``RENDERER_VERSION`` whenever the HTML output changes: previews of an
+older version are re-rendered lazily on their next view.
+"""
+import hashlib
+import html as _html
+from io import BytesIO
+
+from flask import current_app
+
 from .storage import download_bytes
-import mimetypes
 
 try:
     import docx
@@ -16,27 +34,35 @@ try:
 except Exception:
     pptx = None
 
+# 2: text is HTML-escaped
+RENDERER_VERSION = 2
+
+PREVIEW_EXTS = ('docx', 'xls', 'xlsx', 'ppt', 'pptx')
+
+
+def _esc(value) -> str:
+    return _html.escape('' if value is None else str(value))
+
+
 def _extract_docx_to_html(bytes_data: bytes) -> bytes:
     if not docx:
         raise RuntimeError('python-docx not installed')
-    from io import BytesIO
     doc = docx.Document(BytesIO(bytes_data))
     parts = []
     for p in doc.paragraphs:
         text = p.text.strip()
         if text:
-            parts.append(f"<p>{text}</p>")
+            parts.append(f"<p>{_esc(text)}</p>")
     return ('\n'.join(parts)).encode('utf-8')
 
 def _extract_xlsx_to_html(bytes_data: bytes) -> bytes:
     if not openpyxl:
         raise RuntimeError('openpyxl not installed')
-    from io import BytesIO
     wb = openpyxl.load_workbook(filename=BytesIO(bytes_data), read_only=True, data_only=True)
     sheet = wb[wb.sheetnames[0]]
     rows = []
     for r in sheet.iter_rows(values_only=True):
-        cells = ''.join(f'<td>{(c if c is not None else "")}</td>' for c in r)
+        cells = ''.join(f'<td>{_esc(c)}</td>' for c in r)
         rows.append(f'<tr>{cells}</tr>')
     html = '<table border="1">' + '\n'.join(rows) + '</table>'
     return html.encode('utf-8')
@@ -44,7 +70,6 @@ def _extract_xlsx_to_html(bytes_data: bytes) -> bytes:
 def _extract_pptx_to_html(bytes_data: bytes) -> bytes:
     if not pptx:
         raise RuntimeError('python-pptx not installed')
-    from io import BytesIO
     prs = pptx.Presentation(BytesIO(bytes_data))
     slides_html = []
     for i, slide in enumerate(prs.slides, start=1):
@@ -53,39 +78,130 @@ def _extract_pptx_to_html(bytes_data: bytes) -> bytes:
             if hasattr(shape, 'text'):
                 t = shape.text.strip()
                 if t:
-                    texts.append(t)
+                    texts.append(_esc(t))
         if texts:
             slides_html.append(f"<h3>Slide {i}</h3><p>{'<br/>'.join(texts)}</p>")
     return ('\n'.join(slides_html)).encode('utf-8')
 
 
-def render_preview(files_row) -> tuple:
-    """Return (mimetype, bytes, filename) for inline preview if possible.
-    If no preview available, return None.
-    """
-    # determine filename and extension
+def _filename(files_row) -> str:
     meta = files_row.file_metadata or {}
     filename = meta.get('filename') or ''
     if not filename and files_row.storage_url:
         filename = files_row.storage_url.split('/')[-1]
+    return filename
+
+
+def _ext(files_row) -> str:
+    filename = _filename(files_row)
+    return filename.split('.')[-1].lower() if '.' in filename else ''
+
+
+def supports(files_row) -> bool:
+    return _ext(files_row) in PREVIEW_EXTS
+
+
+def _render(ext: str, raw: bytes):
+    if ext == 'docx':
+        return _extract_docx_to_html(raw)
+    if ext in ('xls','xlsx'):
+        return _extract_xlsx_to_html(raw)
+    if ext in ('ppt','pptx'):
+        return _extract_pptx_to_html(raw)
+    return None
 
-    ext = (filename.split('.')[-1].lower() if '.' in filename else '')
+
+def render_preview(files_row) -> tuple:
+    """Return (mimetype, bytes, filename) for inline preview if possible.
+    If no preview available, return None.
+    """
+    filename = _filename(files_row)
+    ext = _ext(files_row)
+    if ext not in PREVIEW_EXTS:
+        return None
 
     # download raw bytes
     raw = download_bytes(files_row.storage_url)
 
     try:
-        if ext == 'docx':
-            html = _extract_docx_to_html(raw)
-            return ('text/html', html, filename)
-        if ext in ('xls','xlsx'):
-            html = _extract_xlsx_to_html(raw)
-            return ('text/html', html, filename)
-        if ext in ('ppt','pptx'):
-            html = _extract_pptx_to_html(raw)
-            return ('text/html', html, filename)
+        html = _render(ext, raw)
+        return ('text/html', html, filename) if html is not None else None
     except Exception:
         # fall through to None -> no preview
         return None
 
-    return None
+
+# --- cached previews -------------------------------------------------------
+
+def etag(info) -> str:
+    return f"{info['sha256']}-v{info['version']}"
+
+
+def cached(files_row):
+    """The stored preview's ``{url, sha256, version, size}`` if it is current, else None."""
+    info = (files_row.file_metadata or {}).get('preview')
+    if not info or info.get('version') != RENDERER_VERSION:
+        return None
+    return info
+
+
+def _preview_key(files_row, sha256: str) -> str:
+    # next to the original upload (see candidates.upload_resume)
+    prefix = f"org{files_row.org_id}/candidate{files_row.candidate_id}" if files_row.candidate_id else f"org{files_row.org_id}"
+    return f"{prefix}/previews/{sha256}.v{RENDERER_VERSION}.html"
+
+
+def generate(files_row, commit: bool = True):
+    """Render and store the preview of ``files_row``; returns the new preview info.
+
+    Files without a preview (unsupported or unreadable) are recorded with
+    ``url: None`` so they are not rendered again until the version changes.
+    """
+    from ..extensions import db
+    from .storage import delete, save_bytes
+
+    ext = _ext(files_row)
+    raw = download_bytes(files_row.storage_url)
+    sha256 = hashlib.sha256(raw).hexdigest()
+    html = None
+    if ext in PREVIEW_EXTS:
+        try:
+            html = _render(ext, raw)
+        except Exception:
+            current_app.logger.warning('preview: rendering file %s failed', files_row.id, exc_info=True)
+    info = {'sha256': sha256, 'version': RENDERER_VERSION, 'url': None, 'size': 0}
+    if html is not None:
+        info['url'] = save_bytes(html, _preview_key(files_row, sha256))
+        info['size'] = len(html)
+
+    meta = dict(files_row.file_metadata or {})
+    old = (meta.get('preview') or {}).get('url')
+    meta['preview'] = info
+    meta.setdefault('sha256', sha256)
+    meta['size'] = meta.get('size') or len(raw)
+    # reassign: in-place changes of a JSON column are not tracked
+    files_row.file_metadata = meta
+    if commit:
+        db.session.commit()
+    if old and old != info['url']:
+        delete(old)
+    return info
+
+
+def load(files_row):
+    """``(info, html bytes)`` of the current preview, rendering it first when missing or outdated.
+
+    ``html`` is None when the file has no preview.
+    """
+    info = cached(files_row)
+    if info is None:
+        info = generate(files_row)
+    if not info.get('url'):
+        return info, None
+    try:
+        return info, download_bytes(info['url'])
+    except Exception:
+        # stored preview went missing: render it again
+        current_app.logger.warning('preview: %s unreadable, re-rendering', info['url'])
+        info = generate(files_row)
+        return info, download_bytes(info['url']) if info.get('url') else None
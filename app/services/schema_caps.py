@@ -0,0 +1,129 @@
+"""Schema capability registry: which optional tables/columns the running DB has.
+
+Views used to ask the database catalog on every request (e.g.
+``sa_inspect(db.engine).get_columns('interviews')`` on each interviews list
+page) to stay compatible with databases that have not run every migration
+yet. The catalog is now introspected once per process and the answers are
+kept as flags (``has_scheduled_at``...).
+
+``alembic upgrade`` (alembic/env.py) calls ``publish()`` after migrating,
+which bumps ``schema:generation`` in Redis; running processes compare that
+counter at most every ``SCHEMA_CAPS_RECHECK_SEC`` and re-introspect when it
+moved. Without Redis the flags are re-read after ``SCHEMA_CAPS_MAX_AGE_SEC``.
+
+Model columns added by a later migration (``Interview.latest_transcript_id``,
+``File``/``Recording.content_sha256``...) are declared ``db.deferred`` so a
+plain query never selects them; databases that have not run the migration
+keep working, and code reads or writes them only behind the matching flag.
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import inspect as sa_inspect
+
+from ..extensions import db, rq
+
+# flag -> (table, column); column None means "the table exists"
+CAPABILITIES = {
+    'has_scheduled_at': ('interviews', 'scheduled_at'),
+    'has_latest_transcript_id': ('interviews', 'latest_transcript_id'),
+    'has_org_daily_stats': ('org_daily_stats', None),
+    'has_search_documents': ('search_documents', None),
+    'has_search_fts': ('search_fts', None),  # SQLite FTS5 table
+    'has_stored_blobs': ('stored_blobs', None),  # + files/recordings.content_sha256
+}
+
+_GENERATION_KEY = 'schema:generation'
+
+_lock = threading.Lock()
+# engine url -> {'caps', 'generation', 'loaded_at', 'checked_at'}
+_state = {}
+
+
+def _cfg(key, default):
+    try:
+        return current_app.config.get(key, default)
+    except Exception:
+        return default
+
+
+def _generation() -> Optional[int]:
+    if rq.redis is None:
+        return None
+    try:
+        return int(rq.redis.get(_GENERATION_KEY) or 0)
+    except Exception:
+        return None
+
+
+def _introspect(bind) -> Dict[str, bool]:
+    insp = sa_inspect(bind)
+    tables = set(insp.get_table_names())
+    columns = {}
+    caps = {}
+    for name, (table, column) in CAPABILITIES.items():
+        if table not in tables:
+            caps[name] = False
+            continue
+        if column is None:
+            caps[name] = True
+            continue
+        if table not in columns:
+            columns[table] = {c['name'] for c in insp.get_columns(table)}
+        caps[name] = column in columns[table]
+    return caps
+
+
+def refresh(bind=None) -> Dict[str, bool]:
+    """Re-introspect the schema now (``bind`` defaults to ``db.engine``)."""
+    bind = bind if bind is not None else db.engine
+    engine = getattr(bind, 'engine', bind)
+    try:
+        caps = _introspect(bind)
+    except Exception:
+        # not cached: the next call tries again (e.g. DB not reachable yet at startup)
+        current_app.logger.exception('schema_caps: introspection failed')
+        return dict.fromkeys(CAPABILITIES, False)
+    now = time.monotonic()
+    with _lock:
+        _state[str(engine.url)] = {'caps': caps, 'generation': _generation(),
+                                   'loaded_at': now, 'checked_at': now}
+    current_app.logger.info('schema capabilities: %s', caps)
+    return caps
+
+
+def _stale(entry) -> bool:
+    now = time.monotonic()
+    if now - entry['checked_at'] < float(_cfg('SCHEMA_CAPS_RECHECK_SEC', 30)):
+        return False
+    entry['checked_at'] = now
+    gen = _generation()
+    if gen is None:
+        return now - entry['loaded_at'] >= float(_cfg('SCHEMA_CAPS_MAX_AGE_SEC', 600))
+    return gen != entry['generation']
+
+
+def capabilities(bind=None) -> Dict[str, bool]:
+    """All flags for the current database (introspected on first use)."""
+    engine = bind if bind is not None else db.engine
+    engine = getattr(engine, 'engine', engine)
+    entry = _state.get(str(engine.url))
+    if entry is None or _stale(entry):
+        return refresh(bind)
+    return entry['caps']
+
+
+def has(name: str, bind=None) -> bool:
+    return bool(capabilities(bind).get(name, False))
+
+
+def publish():
+    """Announce a schema change (after migrations) so every process re-introspects."""
+    try:
+        if rq.redis is not None:
+            rq.redis.incr(_GENERATION_KEY)
+    except Exception:
+        current_app.logger.warning('schema_caps: could not bump %s', _GENERATION_KEY)
+    return refresh()
@@ -0,0 +1,332 @@
+"""Indexed full-text search over candidates and interview transcripts.
+
+Candidate search used to be ``Candidate.name ILIKE '%q%'`` (a sequential
+scan, names only) and transcripts could not be searched at all. Searchable
+text now lives in ``search_documents`` (one row per candidate / transcript,
+kept current by a session ``after_flush`` hook) as space separated tokens:
+
+* Japanese (kana/kanji) runs become overlapping bigrams followed by the
+  run's last character (``山田太郎`` -> ``山田 田太 太郎 郎``), katakana
+  folded to hiragana, so any substring matches without a morphological
+  analyzer (a single character as a prefix: ``"林"*`` finds ``小林``);
+* other text is NFKC-normalized, lower-cased words.
+
+A query term is searched as a phrase of its tokens whose last token is a
+prefix when it is a word or a single character (``yama`` finds
+``Yamada``), terms are ANDed:
+
+* PostgreSQL: GIN index on ``to_tsvector('simple', tokens)``, ranked by
+  ``ts_rank``;
+* SQLite: FTS5 table ``search_fts`` (external content, synced by triggers),
+  ranked by ``bm25``;
+* otherwise, or before the migration ran, ``LIKE`` over the text.
+
+Bulk writes index their rows with ``index_candidates``; anything else
+created outside the ORM is picked up by ``scripts/rebuild_search_index.py``.
+"""
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import Integer, event, false, inspect as sa_inspect, select, text
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models.candidate import Candidate
+from ..models.search_document import SearchDocument
+from ..models.transcript import Transcript
+from . import schema_caps
+
+KINDS = ('candidate', 'transcript')
+CANDIDATE_FIELDS = ('name', 'name_yomi', 'memo', 'skills')
+TRANSCRIPT_FIELDS = ('text',)
+
+_CJK = '぀-ヿ㐀-䶿一-鿿豈-﫿々〆'
+_TOKEN_RE = re.compile(rf'[{_CJK}]+|[^\W_{_CJK}]+')
+_CJK_RE = re.compile(rf'[{_CJK}]')
+_KATAKANA = re.compile('[ァ-ヶ]')
+
+_installed = False
+
+
+def _cfg(key, default):
+    try:
+        return current_app.config.get(key, default)
+    except Exception:
+        return default
+
+
+def normalize(value: str) -> str:
+    s = unicodedata.normalize('NFKC', value or '').lower()
+    return _KATAKANA.sub(lambda m: chr(ord(m.group(0)) - 0x60), s)
+
+
+def _is_cjk(token: str) -> bool:
+    return bool(_CJK_RE.match(token))
+
+
+def tokenize(value: str, query: bool = False) -> List[str]:
+    """Bigrams plus the last character for Japanese runs, whole words otherwise (in text order).
+
+    With ``query`` the final run keeps only its bigrams: the document's run
+    may go on after it.
+    """
+    out = []
+    runs = [m.group(0) for m in _TOKEN_RE.finditer(normalize(value))]
+    for i, run in enumerate(runs):
+        if _is_cjk(run) and len(run) > 1:
+            out.extend(run[j:j + 2] for j in range(len(run) - 1))
+            if not (query and i == len(runs) - 1):
+                out.append(run[-1])
+        else:
+            out.append(run)
+    return out
+
+
+def _terms(q: str) -> List[List[str]]:
+    """Token lists per whitespace separated term of the query."""
+    return [t for t in (tokenize(part, query=True) for part in (q or '').split()) if t]
+
+
+def _is_prefix(token: str) -> bool:
+    # a term's last word or lone character may continue in the document
+    return not _is_cjk(token) or len(token) == 1
+
+
+# --- documents -------------------------------------------------------------
+
+def _flatten(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ' '.join(_flatten(v) for v in value)
+    if isinstance(value, dict):
+        return ' '.join(_flatten(v) for v in value.values())
+    return str(value)
+
+
+def candidate_body(c) -> str:
+    return '\n'.join(_flatten(getattr(c, f, None)) for f in CANDIDATE_FIELDS).strip()
+
+
+def _write(connection, org_id, kind, ref_id, body, candidate_id=None, interview_id=None):
+    table = SearchDocument.__table__
+    connection.execute(table.delete().where(table.c.kind == kind, table.c.ref_id == ref_id))
+    body = (body or '')[:int(_cfg('SEARCH_MAX_BODY_CHARS', 100000))]
+    tokens = ' '.join(tokenize(body))
+    if not tokens or org_id is None:
+        return
+    connection.execute(table.insert().values(
+        org_id=org_id, kind=kind, ref_id=ref_id, candidate_id=candidate_id,
+        interview_id=interview_id, body=normalize(body), tokens=tokens,
+    ))
+
+
+def _transcript_owner(connection, recording_id) -> Tuple[Optional[int], Optional[int]]:
+    row = connection.execute(text(
+        "SELECT i.candidate_id, i.id FROM recordings r JOIN interviews i ON i.id = r.interview_id WHERE r.id = :rid"
+    ), {'rid': recording_id}).fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+
+def _changed(obj, attrs) -> bool:
+    state = sa_inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+def _after_flush(session, flush_context):
+    try:
+        todo, gone = [], []
+        for obj in session.new:
+            if isinstance(obj, (Candidate, Transcript)):
+                todo.append(obj)
+        for obj in session.dirty:
+            if isinstance(obj, Candidate) and _changed(obj, CANDIDATE_FIELDS + ('org_id',)):
+                todo.append(obj)
+            elif isinstance(obj, Transcript) and _changed(obj, TRANSCRIPT_FIELDS + ('org_id', 'recording_id')):
+                todo.append(obj)
+        for obj in session.deleted:
+            if isinstance(obj, (Candidate, Transcript)) and sa_inspect(obj).identity:
+                gone.append(obj)
+    except Exception:
+        current_app.logger.exception('search: collecting changed documents failed')
+        return
+    if not (todo or gone):
+        return
+    connection = session.connection()
+    if not schema_caps.has('has_search_documents', bind=connection):
+        return
+    table = SearchDocument.__table__
+    with session.no_autoflush:
+        for obj in gone:
+            kind = 'candidate' if isinstance(obj, Candidate) else 'transcript'
+            connection.execute(table.delete().where(table.c.kind == kind,
+                                                    table.c.ref_id == sa_inspect(obj).identity[0]))
+        for obj in todo:
+            if isinstance(obj, Candidate):
+                _write(connection, obj.org_id, 'candidate', obj.id, candidate_body(obj), candidate_id=obj.id)
+            else:
+                cand_id, iv_id = _transcript_owner(connection, obj.recording_id)
+                _write(connection, obj.org_id, 'transcript', obj.id, obj.text, candidate_id=cand_id, interview_id=iv_id)
+
+
+def install():
+    """Register the indexing hook once per process (called from create_app)."""
+    global _installed
+    if not _installed:
+        event.listen(Session, 'after_flush', _after_flush)
+        _installed = True
+
+
+def index_candidates(ids) -> int:
+    """Re-index the given candidates (for writes that bypass the flush hook, e.g. bulk import)."""
+    ids = list(ids or ())
+    if not ids or not schema_caps.has('has_search_documents'):
+        return 0
+    connection = db.session.connection()
+    n = 0
+    for i in range(0, len(ids), 500):
+        for c in Candidate.query.filter(Candidate.id.in_(ids[i:i + 500])):
+            _write(connection, c.org_id, 'candidate', c.id, candidate_body(c), candidate_id=c.id)
+            n += 1
+    return n
+
+
+def rebuild(org_id: int = None, batch: int = 500) -> int:
+    """Re-index every candidate and transcript (of one org); returns the document count."""
+    from ..models.interview import Interview
+    from ..models.recording import Recording
+    table = SearchDocument.__table__
+    dq = table.delete()
+    if org_id is not None:
+        dq = dq.where(table.c.org_id == org_id)
+    db.session.execute(dq)
+    connection = db.session.connection()
+    n = 0
+    cq = Candidate.query
+    if org_id is not None:
+        cq = cq.filter(Candidate.org_id == org_id)
+    for c in cq.order_by(Candidate.id).yield_per(batch):
+        _write(connection, c.org_id, 'candidate', c.id, candidate_body(c), candidate_id=c.id)
+        n += 1
+    tq = (
+        db.session.query(Transcript.id, Transcript.org_id, Transcript.text, Interview.candidate_id, Interview.id)
+        .join(Recording, Recording.id == Transcript.recording_id)
+        .join(Interview, Interview.id == Recording.interview_id)
+    )
+    if org_id is not None:
+        tq = tq.filter(Transcript.org_id == org_id)
+    for tid, oid, body, cand_id, iv_id in tq.order_by(Transcript.id).yield_per(batch):
+        _write(connection, oid, 'transcript', tid, body, candidate_id=cand_id, interview_id=iv_id)
+        n += 1
+    db.session.commit()
+    return n
+
+
+# --- queries ---------------------------------------------------------------
+
+def _fts5_query(terms) -> str:
+    return ' AND '.join('"' + ' '.join(toks) + '"' + ('*' if _is_prefix(toks[-1]) else '')
+                        for toks in terms)
+
+
+def _tsquery(terms) -> str:
+    parts = []
+    for toks in terms:
+        lexemes = [f"'{t}'" for t in toks]
+        if _is_prefix(toks[-1]):
+            lexemes[-1] += ':*'
+        parts.append('(' + ' <-> '.join(lexemes) + ')')
+    return ' & '.join(parts)
+
+
+def _snippet(body: str, terms, width: int = 40) -> str:
+    body = body or ''
+    pos = -1
+    for toks in terms:
+        pos = body.find(toks[0])
+        if pos >= 0:
+            break
+    if pos < 0:
+        return body[:width * 2]
+    start = max(0, pos - width)
+    return ('…' if start else '') + body[start:pos + width].replace('\n', ' ') + ('…' if pos + width < len(body) else '')
+
+
+def backend() -> str:
+    """'postgres', 'fts5', 'like' or 'none' (no search_documents table yet)."""
+    if not schema_caps.has('has_search_documents'):
+        return 'none'
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return 'postgres'
+    if dialect == 'sqlite' and schema_caps.has('has_search_fts'):
+        return 'fts5'
+    return 'like'
+
+
+def _match(mode: str, terms, params) -> Tuple[str, str, str]:
+    """``(FROM, WHERE, score)`` SQL for documents ``d`` matching ``terms``; adds its ``params``."""
+    if mode == 'postgres':
+        params['search_q'] = _tsquery(terms)
+        return ("search_documents d, to_tsquery('simple', :search_q) q",
+                "to_tsvector('simple', d.tokens) @@ q",
+                "ts_rank(to_tsvector('simple', d.tokens), q)")
+    if mode == 'fts5':
+        params['search_q'] = _fts5_query(terms)
+        return ("search_fts JOIN search_documents d ON d.id = search_fts.rowid",
+                "search_fts MATCH :search_q", "-bm25(search_fts)")
+    conds = []
+    for i, toks in enumerate(terms):
+        params[f'search_t{i}'] = '%' + ' '.join(toks) + '%'
+        conds.append(f'd.tokens LIKE :search_t{i}')
+    return 'search_documents d', ' AND '.join(conds), '0'
+
+
+def search(org_id: int, q: str, kinds=None, limit: int = 20, offset: int = 0) -> Tuple[List[Dict[str, Any]], bool]:
+    """Ranked hits for ``q`` in the org: ``([{kind, ref_id, candidate_id, interview_id, score, snippet}], has_more)``."""
+    terms = _terms(q)
+    mode = backend()
+    if not terms or mode == 'none':
+        return [], False
+    kinds = [k for k in (kinds or KINDS) if k in KINDS]
+    if not kinds:
+        return [], False
+    params = {'org_id': org_id, 'limit': int(limit) + 1, 'offset': int(offset)}
+    kind_sql = ' AND d.kind IN (' + ', '.join(f"'{k}'" for k in kinds) + ')'
+    from_sql, where_sql, score_sql = _match(mode, terms, params)
+    order_sql = 'd.id DESC' if mode == 'like' else 'score DESC, d.id'
+    sql = (
+        f"SELECT d.kind, d.ref_id, d.candidate_id, d.interview_id, d.body, {score_sql} AS score "
+        f"FROM {from_sql} WHERE d.org_id = :org_id{kind_sql} AND {where_sql} "
+        f"ORDER BY {order_sql} LIMIT :limit OFFSET :offset"
+    )
+    rows = db.session.execute(text(sql), params).fetchall()
+    hits = [
+        {'kind': r[0], 'ref_id': r[1], 'candidate_id': r[2], 'interview_id': r[3],
+         'score': float(r[5] or 0), 'snippet': _snippet(r[4], terms)}
+        for r in rows[:limit]
+    ]
+    return hits, len(rows) > limit
+
+
+def matching_candidates(org_id: int, q: str):
+    """Subquery of the ids of candidates matching ``q`` in their profile or transcripts.
+
+    Not capped, so the candidate list filters (and counts) on every match:
+    ``Candidate.id.in_(matching_candidates(org_id, q))``. None when search
+    is not available (caller falls back to ``ILIKE``).
+    """
+    mode = backend()
+    if mode == 'none':
+        return None
+    terms = _terms(q)
+    if not terms:
+        return select(SearchDocument.candidate_id).where(false())
+    params = {'search_org_id': org_id}
+    from_sql, where_sql, _ = _match(mode, terms, params)
+    return text(
+        f"SELECT d.candidate_id FROM {from_sql} "
+        f"WHERE d.org_id = :search_org_id AND d.candidate_id IS NOT NULL AND {where_sql}"
+    ).bindparams(**params).columns(candidate_id=Integer)
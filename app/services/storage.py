@@ -1,9 +1,32 @@
+"""Object storage for uploads, recordings and generated files (local disk or S3).
+
+Objects are addressed by URL: ``file:///abs/path`` or ``s3://bucket/key``.
+
+S3 access goes through one ``S3Backend`` per process (``s3_backend()``):
+a single boto3 client (clients are thread-safe; the STT segment threads
+share it) with a connection pool sized for ``S3_MAX_CONCURRENCY``, and a
+``TransferConfig`` so uploads and downloads of large recordings are split
+into concurrent multipart / ranged requests instead of one long request
+holding the whole body in memory. The backend is rebuilt after a fork (RQ
+work horses) or a change of the S3 settings.
+"""
 import os
+import shutil
+import tempfile
+import threading
+import time
+
 from werkzeug.utils import secure_filename
 from flask import current_app
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 
+MB = 1024 * 1024
+
+# read size used when streaming stored objects (uploads to STT, downloads)
+STREAM_CHUNK_SIZE = 1024 * 1024
+
 
 def _ensure_local_dir():
     d = current_app.config['LOCAL_STORAGE_DIR']
@@ -11,77 +34,148 @@ def _ensure_local_dir():
     return d
 
 
+def _split_s3(url: str):
+    bucket, key = url.replace('s3://','').split('/',1)
+    return bucket, key
+
+
+# --- S3 backend ------------------------------------------------------------
+
+class S3Backend:
+    """Process-wide S3 client plus multipart transfer settings."""
+
+    def __init__(self, config):
+        self.bucket = config.get('S3_BUCKET')
+        concurrency = max(1, int(config.get('S3_MAX_CONCURRENCY', 8)))
+        self.transfer = TransferConfig(
+            multipart_threshold=int(config.get('S3_MULTIPART_THRESHOLD_MB', 16)) * MB,
+            multipart_chunksize=int(config.get('S3_MULTIPART_CHUNKSIZE_MB', 16)) * MB,
+            max_concurrency=concurrency,
+            use_threads=concurrency > 1,
+        )
+        client_config = Config(
+            signature_version='s3v4',
+            s3={'addressing_style': config.get('S3_ADDRESSING_STYLE') or 'virtual'},
+            # transfers + STT segment threads share the pool
+            max_pool_connections=max(10, concurrency * 2),
+            retries={'max_attempts': int(config.get('S3_MAX_ATTEMPTS', 5)), 'mode': 'adaptive'},
+            connect_timeout=float(config.get('S3_CONNECT_TIMEOUT_SEC', 5)),
+            read_timeout=float(config.get('S3_READ_TIMEOUT_SEC', 60)),
+        )
+        kwargs = {
+            'aws_access_key_id': config.get('S3_ACCESS_KEY'),
+            'aws_secret_access_key': config.get('S3_SECRET_KEY'),
+            'config': client_config,
+        }
+        if config.get('S3_REGION'):
+            kwargs['region_name'] = config.get('S3_REGION')
+        # build boto3 client kwargs flexibly: endpoint_url may be empty in AWS-managed S3
+        session = boto3.session.Session()
+        self.client = session.client('s3', endpoint_url=config.get('S3_ENDPOINT') or None, **kwargs)
+        public = config.get('S3_PUBLIC_ENDPOINT')
+        # presigned URLs are handed to browsers, which may not reach S3_ENDPOINT
+        self.presigner = (session.client('s3', endpoint_url=public, **kwargs)
+                          if public and public != config.get('S3_ENDPOINT') else self.client)
+
+    def upload_fileobj(self, fileobj, key, bucket=None, content_type=None):
+        extra = {'ContentType': content_type} if content_type else None
+        self.client.upload_fileobj(fileobj, bucket or self.bucket, key, ExtraArgs=extra, Config=self.transfer)
+        return f"s3://{bucket or self.bucket}/{key}"
+
+    def upload_file(self, path, key, bucket=None):
+        self.client.upload_file(path, bucket or self.bucket, key, Config=self.transfer)
+        return f"s3://{bucket or self.bucket}/{key}"
+
+    def download_file(self, bucket, key, path):
+        self.client.download_file(bucket, key, path, Config=self.transfer)
+
+    def download_fileobj(self, bucket, key, fileobj):
+        self.client.download_fileobj(bucket, key, fileobj, Config=self.transfer)
+
+
+_S3_KEYS = ('S3_ENDPOINT', 'S3_PUBLIC_ENDPOINT', 'S3_REGION', 'S3_BUCKET', 'S3_ACCESS_KEY', 'S3_SECRET_KEY',
+            'S3_ADDRESSING_STYLE', 'S3_MAX_CONCURRENCY', 'S3_MULTIPART_THRESHOLD_MB', 'S3_MULTIPART_CHUNKSIZE_MB',
+            'S3_MAX_ATTEMPTS', 'S3_CONNECT_TIMEOUT_SEC', 'S3_READ_TIMEOUT_SEC')
+_backend = None
+_backend_sig = None
+_backend_lock = threading.Lock()
+
+
+def s3_backend() -> S3Backend:
+    """The process's ``S3Backend`` for the current app config."""
+    global _backend, _backend_sig
+    config = current_app.config
+    sig = (os.getpid(),) + tuple(config.get(k) for k in _S3_KEYS)
+    backend = _backend
+    if backend is not None and _backend_sig == sig:
+        return backend
+    with _backend_lock:
+        if _backend is None or _backend_sig != sig:
+            _backend = S3Backend(config)
+            _backend_sig = sig
+        return _backend
+
+
+def reset():
+    """Drop the cached backend (tests, benchmarks)."""
+    global _backend, _backend_sig
+    with _backend_lock:
+        _backend = None
+        _backend_sig = None
+
+
+def _s3_download_client():
+    return s3_backend().client
+
+
+def presign_client():
+    """Client for presigned URLs handed to browsers (S3_PUBLIC_ENDPOINT when the API endpoint is internal)."""
+    return s3_backend().presigner
+
+
+# --- saving ----------------------------------------------------------------
+
+class _KeepOpen:
+    """File proxy whose ``close`` is a no-op (s3transfer closes the source on failure)."""
+
+    def __init__(self, f):
+        self._f = f
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def close(self):
+        pass
+
+
 def save_file(file_storage, prefix=""):
     backend = current_app.config.get('STORAGE_BACKEND','local')
     filename = secure_filename(file_storage.filename)
     key = f"{prefix}/{filename}" if prefix else filename
 
     if backend == 's3':
-        # build boto3 client kwargs flexibly: endpoint_url may be empty in AWS-managed S3
-        s3_kwargs = {}
-        endpoint = current_app.config.get('S3_ENDPOINT')
-        if endpoint:
-            s3_kwargs['endpoint_url'] = endpoint
-        region = current_app.config.get('S3_REGION')
-        if region:
-            s3_kwargs['region_name'] = region
-
-        # prefer virtual-hosted style addressing; ensure sigv4
-        s3_config = Config(signature_version='s3v4', s3={'addressing_style': 'virtual'})
-
-        s3 = boto3.client(
-            's3',
-            aws_access_key_id=current_app.config.get('S3_ACCESS_KEY'),
-            aws_secret_access_key=current_app.config.get('S3_SECRET_KEY'),
-            config=s3_config,
-            **s3_kwargs,
-        )
-        bucket = current_app.config.get('S3_BUCKET')
-
-        # read whole uploaded file into memory buffer so we can retry/fallback safely
-        from io import BytesIO
-        try:
-            buf = BytesIO(file_storage.read())
-        except Exception:
-            # some file_storage implementations expose 'stream'
-            try:
-                stream = getattr(file_storage, 'stream', None)
-                if stream:
-                    buf = BytesIO(stream.read())
-                else:
-                    raise
-            except Exception:
-                # as a last resort, attempt to save directly and let caller see failure
-                buf = None
-
+        # stream the upload (werkzeug spools it to a temp file) in multipart
+        # chunks instead of reading it into memory first
+        stream = getattr(file_storage, 'stream', file_storage)
         try:
-            upload_obj = buf if buf is not None else getattr(file_storage, 'stream', file_storage)
-            if buf is not None:
-                upload_obj.seek(0)
-            s3.upload_fileobj(upload_obj, bucket, key)
-            return f"s3://{bucket}/{key}"
+            return s3_backend().upload_fileobj(_KeepOpen(stream), key, content_type=getattr(file_storage, 'mimetype', None))
         except Exception as e:
             try:
                 current_app.logger.exception('S3 upload failed, falling back to local storage: %s', e)
             except Exception:
                 pass
             # fallback to local storage to avoid returning 500 for user uploads
+            try:
+                stream.seek(0)
+            except Exception:
+                # the upload can not be re-read; let the caller see the failure
+                raise e
             d = _ensure_local_dir()
             path = os.path.join(d, key)
             os.makedirs(os.path.dirname(path), exist_ok=True)
-            try:
-                # write from buffer if available, otherwise attempt to save original
-                if buf is not None:
-                    with open(path, 'wb') as dst:
-                        buf.seek(0)
-                        dst.write(buf.read())
-                else:
-                    # attempt to save original file_storage (may fail if stream closed)
-                    file_storage.save(path)
-                return f"file://{os.path.abspath(path)}"
-            except Exception:
-                # if even local write fails, re-raise the original error
-                raise
+            with open(path, 'wb') as dst:
+                shutil.copyfileobj(stream, dst, STREAM_CHUNK_SIZE)
+            return f"file://{os.path.abspath(path)}"
     else:
         d = _ensure_local_dir()
         path = os.path.join(d, key)
@@ -90,20 +184,155 @@ def save_file(file_storage, prefix=""):
         return f"file://{os.path.abspath(path)}"
 
 
-def download_bytes(url: str) -> bytes:
+def save_path(path, key):
+    """Store a finished local file (e.g. a generated export) under ``key`` and return its URL.
+
+    The file is streamed to S3 with a multipart upload, or moved into
+    LOCAL_STORAGE_DIR; ``path`` no longer exists afterwards.
+    """
+    backend = current_app.config.get('STORAGE_BACKEND','local')
+    if backend == 's3':
+        url = s3_backend().upload_file(path, key)
+        os.remove(path)
+        return url
+    d = _ensure_local_dir()
+    dest = os.path.join(d, key)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    shutil.move(path, dest)
+    return f"file://{os.path.abspath(dest)}"
+
+
+def save_bytes(data: bytes, key):
+    """Store an in-memory payload (e.g. a rendered preview) under ``key`` and return its URL."""
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    try:
+        return save_path(path, key)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# --- reading ---------------------------------------------------------------
+
+class StorageStream:
+    """Read-only, chunked file-like view over a stored object.
+
+    Exposes ``read``/iteration in ``chunk_size`` blocks and ``len()`` (when the
+    backend reports a size) so ``requests`` can send it with a Content-Length
+    without ever holding the whole object in memory.
+    """
+
+    def __init__(self, raw, length=None, name=None, chunk_size=STREAM_CHUNK_SIZE):
+        self._raw = raw
+        self.length = length
+        self.name = name
+        self.chunk_size = chunk_size
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self._raw.read()
+        return self._raw.read(size)
+
+    def __iter__(self):
+        while True:
+            chunk = self._raw.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def __len__(self):
+        return int(self.length or 0)
+
+    def __bool__(self):
+        return True
+
+    def close(self):
+        try:
+            self._raw.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def open_stream(url: str, chunk_size: int = STREAM_CHUNK_SIZE) -> StorageStream:
+    """Open a stored object for chunked reading. Use as a context manager.
+
+    Each call returns a new stream positioned at the start of the object, so
+    callers that need to read the content twice should open it twice.
+    """
     if url.startswith('s3://'):
-        bucket_key = url.replace('s3://','').split('/',1)
-        bucket, key = bucket_key[0], bucket_key[1]
-        s3 = boto3.client('s3',
-            endpoint_url=current_app.config['S3_ENDPOINT'],
-            aws_access_key_id=current_app.config['S3_ACCESS_KEY'],
-            aws_secret_access_key=current_app.config['S3_SECRET_KEY'],
-            config=Config(signature_version='s3v4'))
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        return obj['Body'].read()
+        bucket, key = _split_s3(url)
+        obj = _s3_download_client().get_object(Bucket=bucket, Key=key)
+        return StorageStream(obj['Body'], length=obj.get('ContentLength'), name=key.split('/')[-1], chunk_size=chunk_size)
     elif url.startswith('file://'):
         path = url.replace('file://','')
-        with open(path, 'rb') as f:
-            return f.read()
+        f = open(path, 'rb')
+        return StorageStream(f, length=os.path.getsize(path), name=os.path.basename(path), chunk_size=chunk_size)
+    else:
+        raise ValueError("Unsupported URL scheme")
+
+
+def download_to_path(url: str, path: str):
+    """Copy a stored object to a local file (concurrent ranged GETs on S3)."""
+    if url.startswith('s3://'):
+        bucket, key = _split_s3(url)
+        s3_backend().download_file(bucket, key, path)
+    elif url.startswith('file://'):
+        shutil.copyfile(url.replace('file://',''), path)
     else:
-        raise ValueError("Unsupported URL scheme")
\ No newline at end of file
+        raise ValueError("Unsupported URL scheme")
+
+
+def download_bytes(url: str) -> bytes:
+    """Read a whole stored object into memory. Prefer ``open_stream`` for large files."""
+    with open_stream(url) as stream:
+        return stream.read()
+
+
+def delete(url: str) -> bool:
+    """Remove a stored object; False when it could not be removed."""
+    try:
+        if url.startswith('s3://'):
+            bucket, key = _split_s3(url)
+            _s3_download_client().delete_object(Bucket=bucket, Key=key)
+        elif url.startswith('file://'):
+            os.remove(url.replace('file://',''))
+        else:
+            return False
+        return True
+    except Exception:
+        current_app.logger.exception('storage: delete %s failed', url)
+        return False
+
+
+def delete_older_than(prefix: str, max_age_sec: int) -> int:
+    """Remove the objects under ``prefix`` last modified more than ``max_age_sec`` ago; returns how many."""
+    cutoff = time.time() - max_age_sec
+    removed = 0
+    if current_app.config.get('STORAGE_BACKEND', 'local') == 's3':
+        s3 = s3_backend()
+        paginator = s3.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=s3.bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if obj['LastModified'].timestamp() < cutoff and delete(f"s3://{s3.bucket}/{obj['Key']}"):
+                    removed += 1
+        return removed
+    root = os.path.join(os.path.abspath(current_app.config['LOCAL_STORAGE_DIR']), prefix)
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
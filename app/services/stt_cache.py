@@ -0,0 +1,156 @@
+"""Persistent cache of raw Deepgram responses keyed by audio content.
+
+Re-analysing an interview re-enqueues ``transcribe_recording``; without a
+cache that re-uploads (and re-pays for) the same audio. Entries are keyed by
+the audio's SHA-256 plus the effective ``DEEPGRAM_OPTIONS`` and language,
+stored zlib-compressed in the ``stt_cache`` table, and evicted least recently
+used first once the total exceeds ``STT_CACHE_MAX_BYTES``.
+
+Hit/miss counters live in Redis (shared by all workers) when it is reachable
+and fall back to per-process counters otherwise.
+"""
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from flask import current_app
+
+from ..extensions import db, rq
+from ..models.stt_cache import SttCacheEntry
+from .storage import open_stream
+
+_COUNTER_PREFIX = 'stt_cache:'
+_local_counters = {'hits': 0, 'misses': 0}
+
+
+def content_sha256(url: str) -> str:
+    """SHA-256 of a stored object, computed while streaming it."""
+    h = hashlib.sha256()
+    with open_stream(url) as stream:
+        for chunk in stream:
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _effective_options() -> Dict[str, Any]:
+    return dict(current_app.config.get('DEEPGRAM_OPTIONS', {}) or {})
+
+
+def cache_key(audio_sha256: str, language: str, options: Dict[str, Any] = None) -> str:
+    opts = _effective_options() if options is None else options
+    material = json.dumps({'audio': audio_sha256, 'lang': language or '', 'opts': opts}, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def _enabled() -> bool:
+    return bool(current_app.config.get('STT_CACHE_ENABLED', True))
+
+
+def _bump(name: str):
+    try:
+        if rq.redis is not None:
+            rq.redis.incr(_COUNTER_PREFIX + name)
+            return
+    except Exception:
+        pass
+    _local_counters[name] += 1
+
+
+def stats() -> Dict[str, int]:
+    """Return hit/miss counters plus current entry count and total size."""
+    out = dict(_local_counters)
+    try:
+        if rq.redis is not None:
+            vals = rq.redis.mget([_COUNTER_PREFIX + 'hits', _COUNTER_PREFIX + 'misses'])
+            out = {'hits': int(vals[0] or 0), 'misses': int(vals[1] or 0)}
+    except Exception:
+        pass
+    try:
+        count, size = db.session.query(db.func.count(SttCacheEntry.id), db.func.coalesce(db.func.sum(SttCacheEntry.size_bytes), 0)).one()
+        out['entries'] = int(count or 0)
+        out['size_bytes'] = int(size or 0)
+    except Exception:
+        pass
+    return out
+
+
+def get(audio_sha256: str, language: str) -> Optional[Dict[str, Any]]:
+    """Return the cached raw response for this audio/options/language, if any."""
+    if not _enabled() or not audio_sha256:
+        return None
+    key = cache_key(audio_sha256, language)
+    try:
+        entry = SttCacheEntry.query.filter_by(cache_key=key).first()
+    except Exception:
+        current_app.logger.exception('stt_cache lookup failed')
+        return None
+    if entry is None:
+        _bump('misses')
+        return None
+    try:
+        raw = json.loads(zlib.decompress(entry.payload).decode('utf-8'))
+    except Exception:
+        current_app.logger.exception('stt_cache entry %s is corrupt, dropping it', entry.id)
+        db.session.delete(entry)
+        db.session.commit()
+        _bump('misses')
+        return None
+    entry.hits = (entry.hits or 0) + 1
+    entry.last_used_at = datetime.utcnow()
+    db.session.commit()
+    _bump('hits')
+    return raw
+
+
+def put(audio_sha256: str, language: str, raw: Dict[str, Any]):
+    """Store a raw response, then evict LRU entries above the size budget."""
+    if not _enabled() or not audio_sha256 or not raw:
+        return None
+    options = _effective_options()
+    key = cache_key(audio_sha256, language, options)
+    payload = zlib.compress(json.dumps(raw, ensure_ascii=False).encode('utf-8'), 6)
+    max_bytes = int(current_app.config.get('STT_CACHE_MAX_BYTES', 0) or 0)
+    if max_bytes and len(payload) > max_bytes:
+        return None
+    try:
+        entry = SttCacheEntry.query.filter_by(cache_key=key).first()
+        if entry is None:
+            entry = SttCacheEntry(cache_key=key, audio_sha256=audio_sha256, language=language, options=options)
+            db.session.add(entry)
+        entry.payload = payload
+        entry.size_bytes = len(payload)
+        entry.last_used_at = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        # most likely a concurrent insert of the same key; the other copy wins
+        db.session.rollback()
+        current_app.logger.warning('stt_cache put failed for %s', key, exc_info=True)
+        return None
+    if max_bytes:
+        evict(max_bytes)
+    return entry.id
+
+
+def evict(max_bytes: int) -> int:
+    """Delete least recently used entries until the total is within ``max_bytes``."""
+    total = db.session.query(db.func.coalesce(db.func.sum(SttCacheEntry.size_bytes), 0)).scalar() or 0
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    rows = (
+        db.session.query(SttCacheEntry.id, SttCacheEntry.size_bytes)
+        .order_by(SttCacheEntry.last_used_at.asc(), SttCacheEntry.id.asc())
+        .yield_per(200)
+    )
+    doomed = []
+    for entry_id, size in rows:
+        if total <= max_bytes:
+            break
+        doomed.append(entry_id)
+        total -= size or 0
+    if doomed:
+        removed = SttCacheEntry.query.filter(SttCacheEntry.id.in_(doomed)).delete(synchronize_session=False)
+        db.session.commit()
+    return removed
@@ -0,0 +1,305 @@
+"""Segmented (chunked, parallel) Deepgram transcription for long recordings.
+
+A single Deepgram POST for a 60-90 minute interview is slow and prone to
+time out. Here the recording is cut into overlapping windows with ffmpeg,
+the windows are transcribed concurrently through a bounded thread pool, and
+the per-window responses are stitched back into one Deepgram-shaped dict
+(``results.channels[0].alternatives[0].words`` + ``utterances``) so the rest
+of the transcription pipeline does not need to know about segmentation.
+
+Requires ``ffmpeg``/``ffprobe`` on PATH; when they are missing, or the
+recording is short, ``transcribe_segmented`` returns None and callers fall
+back to the single-request path. The length is decided before anything is
+downloaded: from the stored duration, else by probing the object in place
+(a presigned URL for S3), so short recordings are only read once.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from .openai_wrap import deepgram_raw_transcribe
+from .storage import download_to_path, s3_backend
+
+# words from adjacent windows closer than this (seconds) are treated as the same word
+_MATCH_TOLERANCE_SEC = 0.5
+
+
+def plan_windows(duration: float, window_sec: float, overlap_sec: float) -> List[Tuple[float, float]]:
+    """Return ``[(start, end), ...]`` windows covering ``duration`` with overlap."""
+    if not duration or duration <= 0:
+        return []
+    overlap_sec = max(0.0, min(overlap_sec, window_sec / 2.0))
+    step = window_sec - overlap_sec
+    windows = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + window_sec)
+        windows.append((start, end))
+        if end >= duration:
+            break
+        start += step
+        # do not emit a trailing window that only repeats the overlap
+        if duration - start <= overlap_sec:
+            break
+    if windows and windows[-1][1] < duration:
+        windows[-1] = (windows[-1][0], duration)
+    return windows
+
+
+def _first_alternative(raw: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return raw.get('results', {}).get('channels', [])[0].get('alternatives', [])[0] or {}
+    except Exception:
+        return {}
+
+
+def _word_text(w: Dict[str, Any]) -> str:
+    return w.get('punctuated_word') or w.get('word') or ''
+
+
+def _shift(item: Dict[str, Any], offset: float) -> Dict[str, Any]:
+    out = dict(item)
+    for k in ('start', 'end'):
+        if out.get(k) is not None:
+            out[k] = float(out[k]) + offset
+    return out
+
+
+def _match_speakers(prev_words, words, lo: float, hi: float) -> Dict[Any, Any]:
+    """Map this window's diarization labels onto the previous window's.
+
+    Deepgram numbers speakers independently per request, so labels are
+    aligned by voting over words both windows transcribed in the overlap.
+    """
+    votes = {}
+    prev_in = [w for w in prev_words if w.get('start') is not None and lo <= w['start'] <= hi]
+    for w in words:
+        if w.get('start') is None or w.get('speaker') is None or not (lo <= w['start'] <= hi):
+            continue
+        token = (w.get('word') or '').lower()
+        best = None
+        for p in prev_in:
+            if (p.get('word') or '').lower() != token or p.get('speaker') is None:
+                continue
+            d = abs(p['start'] - w['start'])
+            if d <= _MATCH_TOLERANCE_SEC and (best is None or d < best[0]):
+                best = (d, p['speaker'])
+        if best is not None:
+            votes.setdefault(w['speaker'], Counter())[best[1]] += 1
+
+    mapping = {spk: c.most_common(1)[0][0] for spk, c in votes.items()}
+    used = set(mapping.values())
+    seen = {w.get('speaker') for w in prev_words if w.get('speaker') is not None}
+    next_id = max([s for s in seen | used if isinstance(s, int)] or [-1]) + 1
+    # speakers silent in the overlap take a label the previous window used but
+    # nobody matched (typical two-person interview), then a fresh label
+    free = sorted((s for s in seen - used), key=str)
+    for w in words:
+        spk = w.get('speaker')
+        if spk is None or spk in mapping:
+            continue
+        if free:
+            mapping[spk] = free.pop(0)
+        elif spk not in used and spk not in seen:
+            mapping[spk] = spk
+        else:
+            mapping[spk] = next_id
+            next_id += 1
+        used.add(mapping[spk])
+    return mapping
+
+
+def stitch_segments(parts: List[Tuple[float, float, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Merge per-window Deepgram responses into one response.
+
+    ``parts`` is ``[(window_start, window_end, raw), ...]`` in time order.
+    Timestamps are shifted by the window start; inside each overlap, items
+    starting before the overlap midpoint come from the earlier window and
+    the rest from the later one, so nothing is emitted twice.
+    """
+    n = len(parts)
+    words_out: List[Dict[str, Any]] = []
+    utts_out: List[Dict[str, Any]] = []
+    texts: List[str] = []
+    prev_words: List[Dict[str, Any]] = []
+
+    for i, (offset, end, raw) in enumerate(parts):
+        raw = raw or {}
+        lo = (offset + parts[i - 1][1]) / 2.0 if i > 0 else float('-inf')
+        hi = (parts[i + 1][0] + end) / 2.0 if i + 1 < n else float('inf')
+
+        alt = _first_alternative(raw)
+        words = [_shift(w, offset) for w in (alt.get('words') or [])]
+        utts = [_shift(u, offset) for u in (raw.get('utterances') or [])]
+
+        if i > 0 and words:
+            mapping = _match_speakers(prev_words, words, offset, parts[i - 1][1])
+            for item in words + utts:
+                if item.get('speaker') in mapping:
+                    item['speaker'] = mapping[item['speaker']]
+
+        kept = [w for w in words if w.get('start') is not None and lo <= w['start'] < hi]
+
+        for u in utts:
+            if words:
+                # rebuild the utterance from the words this window keeps so an
+                # utterance crossing the boundary is split rather than duplicated
+                us, ue = u.get('start'), u.get('end')
+                if us is None or ue is None:
+                    continue
+                uw = [w for w in kept if us - 1e-6 <= w['start'] <= ue + 1e-6]
+                if not uw:
+                    continue
+                nu = {k: v for k, v in u.items() if k != 'words'}
+                nu['start'] = uw[0]['start']
+                nu['end'] = uw[-1].get('end', uw[-1]['start'])
+                nu['transcript'] = ' '.join(_word_text(w) for w in uw)
+                utts_out.append(nu)
+            elif u.get('start') is not None and lo <= u['start'] < hi:
+                utts_out.append(u)
+
+        if words:
+            texts.append(' '.join(_word_text(w) for w in kept))
+        elif alt.get('transcript'):
+            texts.append(alt.get('transcript'))
+        words_out.extend(kept)
+        prev_words = words
+
+    return {
+        'metadata': {'segments': n},
+        'results': {'channels': [{'alternatives': [{
+            'transcript': ' '.join(t for t in texts if t),
+            'words': words_out,
+        }]}]},
+        'utterances': utts_out,
+    }
+
+
+def probe_duration(path: str) -> Optional[float]:
+    try:
+        out = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            capture_output=True, text=True, timeout=60, check=True,
+        ).stdout.strip()
+        return float(out) if out else None
+    except Exception:
+        return None
+
+
+def _probe_target(url: str) -> str:
+    """Path or URL ffprobe can read without downloading the whole recording."""
+    if url.startswith('file://'):
+        return url.replace('file://', '')
+    if url.startswith('s3://'):
+        bucket, key = url.replace('s3://', '').split('/', 1)
+        # the worker's own client: S3_PUBLIC_ENDPOINT is for browsers
+        return s3_backend().client.generate_presigned_url(
+            'get_object', Params={'Bucket': bucket, 'Key': key}, ExpiresIn=600)
+    return url
+
+
+def _extract(src: str, start: float, duration: float, dst: str):
+    # re-encode to mono 16kHz FLAC: accurate cuts and small uploads
+    subprocess.run(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+         '-ss', f'{start:.3f}', '-t', f'{duration:.3f}', '-i', src,
+         '-vn', '-ac', '1', '-ar', '16000', '-c:a', 'flac', dst],
+        check=True, timeout=600,
+    )
+
+
+@contextmanager
+def _local_source(url: str, filename: str = None):
+    """Yield a local path for ``url``; remote objects are spooled to a temp file."""
+    if url.startswith('file://'):
+        yield url.replace('file://', '')
+        return
+    suffix = os.path.splitext(filename or url)[1]
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        download_to_path(url, path)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except Exception:
+            pass
+
+
+def transcribe_segmented(url: str, language: str = "ja", filename: str = None,
+                         duration: float = None) -> Optional[Dict[str, Any]]:
+    """Transcribe a long recording window-by-window, in parallel.
+
+    ``duration`` is the known length in seconds (``Recording.duration_sec``);
+    without it the object is probed remotely. Returns a stitched
+    Deepgram-shaped response, or None when segmentation is disabled or not
+    applicable (short file, ffmpeg missing, all windows failed) so the
+    caller can use the single-request path instead.
+    """
+    cfg = current_app.config
+    if not cfg.get('STT_SEGMENTED', True):
+        return None
+    if not shutil.which('ffmpeg') or not shutil.which('ffprobe'):
+        return None
+
+    window_sec = float(cfg.get('STT_SEGMENT_SEC', 300))
+    overlap_sec = float(cfg.get('STT_SEGMENT_OVERLAP_SEC', 4))
+    min_sec = float(cfg.get('STT_SEGMENT_MIN_SEC', 900))
+    workers = max(1, int(cfg.get('STT_SEGMENT_WORKERS', 4)))
+
+    if not duration:
+        try:
+            duration = probe_duration(_probe_target(url))
+        except Exception:
+            current_app.logger.exception('Could not probe %s', url)
+    if duration and duration < min_sec:
+        return None
+
+    app = current_app._get_current_object()
+    # only recordings that will be segmented are downloaded
+    with _local_source(url, filename) as src:
+        duration = probe_duration(src) or duration
+        if not duration or duration < min_sec:
+            return None
+        windows = plan_windows(duration, window_sec, overlap_sec)
+        if len(windows) < 2:
+            return None
+
+        with tempfile.TemporaryDirectory() as tmp:
+            def work(idx, start, end):
+                with app.app_context():
+                    dst = os.path.join(tmp, f'seg{idx:04d}.flac')
+                    try:
+                        _extract(src, start, end - start, dst)
+                    except Exception:
+                        current_app.logger.exception('ffmpeg failed for segment %s (%.1f-%.1fs)', idx, start, end)
+                        return {}
+                    # one retry per window; deepgram_raw_transcribe returns {} on failure
+                    for _ in range(2):
+                        with open(dst, 'rb') as fh:
+                            res = deepgram_raw_transcribe(fh, language=language, filename=dst)
+                        if res:
+                            return res
+                    return {}
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(work, i, s, e) for i, (s, e) in enumerate(windows)]
+                results = [f.result() for f in futures]
+
+    failed = sum(1 for r in results if not r)
+    if failed == len(results):
+        return None
+    if failed:
+        current_app.logger.warning('Segmented transcription: %s/%s segments failed for %s', failed, len(results), url)
+    raw = stitch_segments([(s, e, r) for (s, e), r in zip(windows, results)])
+    raw['metadata'].update({'duration': duration, 'segments_failed': failed})
+    return raw
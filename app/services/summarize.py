@@ -0,0 +1,158 @@
+"""Map-reduce summarization of long interview transcripts.
+
+A 60-90 minute interview does not fit a single prompt, and truncating to
+the first N utterances silently drops most of it. Instead the transcript is
+cut into chunks by token budget, every chunk is condensed into timestamped
+notes with the cheap ``map`` model (concurrently, through
+``llm_client.respond_many``), and the notes are reduced into the final
+summary with the ``reduce`` model (see ``app/jobs/analyze.py``).
+
+Chunk notes are cached in Redis by a hash of (model, prompt version, chunk
+text), so re-running an analysis, or evaluating the same transcript from
+another job, only pays for chunks that changed.
+"""
+import hashlib
+import re
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+
+from ..extensions import rq
+from . import llm_client
+
+MODEL_MAP = {
+    "map": "gpt-4.1-mini",    # 安価・JSON安定
+    "reduce": "gpt-4.1",      # 品質
+}
+
+# bump when the map prompt changes so stale chunk notes are not reused
+MAP_PROMPT_VERSION = 1
+
+_CACHE_KEY = 'llm:chunk:{digest}'
+
+MAP_PROMPT = (
+    "以下は採用面接の文字起こしの一部です。候補者の経験・スキル・考え方・志望動機・懸念点が分かる"
+    "発言を、元の時刻[秒]と話者を残したまま日本語の箇条書きで簡潔にまとめてください。"
+    "評価の根拠になりそうな短い発言は原文のまま引用してください。\n\n"
+)
+
+
+def _cfg(key, default):
+    try:
+        return current_app.config.get(key, default)
+    except Exception:
+        return default
+
+
+def transcript_lines(utterances: Optional[List[Dict[str, Any]]], text: str = '') -> List[str]:
+    """One line per utterance (``[12s][spk0] ...``), or per sentence of ``text``."""
+    if utterances:
+        return [
+            f"[{(u.get('start') or 0):.0f}s][spk{u.get('speaker')}] {u.get('text', '')}"
+            for u in utterances if (u.get('text') or '').strip()
+        ]
+    parts = re.split(r'(?<=[。！？!?])\s*|\n+', text or '')
+    return [p.strip() for p in parts if p and p.strip()]
+
+
+def chunk_lines(lines: List[str], max_tokens: int, max_chunks: int = 0) -> List[str]:
+    """Pack lines into chunks of at most ``max_tokens`` (estimated) each.
+
+    With ``max_chunks`` the budget is raised as needed so a very long
+    transcript never produces more than that many chunks.
+    """
+    if not lines:
+        return []
+    if max_chunks:
+        total = sum(llm_client.estimate_tokens(l) + 1 for l in lines)
+        max_tokens = max(max_tokens, -(-total // max_chunks))
+    chunks, cur, cur_tokens = [], [], 0
+    for line in lines:
+        t = llm_client.estimate_tokens(line) + 1
+        if cur and cur_tokens + t > max_tokens:
+            chunks.append('\n'.join(cur))
+            cur, cur_tokens = [], 0
+        # a single over-long line is split hard rather than exceeding the budget
+        while t > max_tokens and len(line) > 1:
+            cut = max(1, max_tokens * 2)
+            chunks.append(line[:cut])
+            line = line[cut:]
+            t = llm_client.estimate_tokens(line) + 1
+        cur.append(line)
+        cur_tokens += t
+    if cur:
+        chunks.append('\n'.join(cur))
+    return chunks
+
+
+def chunk_digest(chunk: str, model: str) -> str:
+    material = f'{model}\x00{MAP_PROMPT_VERSION}\x00{chunk}'
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def _cache_get_many(digests: List[str]) -> List[Optional[str]]:
+    if rq.redis is None or not digests:
+        return [None] * len(digests)
+    try:
+        vals = rq.redis.mget([_CACHE_KEY.format(digest=d) for d in digests])
+        return [v.decode('utf-8') if isinstance(v, bytes) else v for v in vals]
+    except Exception:
+        return [None] * len(digests)
+
+
+def _cache_put(digest: str, notes: str):
+    if rq.redis is None or not notes:
+        return
+    try:
+        rq.redis.set(_CACHE_KEY.format(digest=digest), notes.encode('utf-8'),
+                     ex=int(_cfg('SUMMARY_CHUNK_CACHE_TTL_SEC', 30 * 86400)))
+    except Exception:
+        pass
+
+
+def map_chunks(chunks: List[str], model: str = None) -> List[str]:
+    """Condense every chunk into notes with the map model (cached by chunk hash).
+
+    A chunk whose call fails falls back to its raw text (truncated) so the
+    reduce step still sees every part of the interview. ``RetryLater`` is
+    re-raised when the current RQ job can be rescheduled.
+    """
+    model = model or MODEL_MAP['map']
+    digests = [chunk_digest(c, model) for c in chunks]
+    notes = _cache_get_many(digests)
+    todo = [i for i, n in enumerate(notes) if not n]
+    if todo:
+        max_out = int(_cfg('SUMMARY_MAP_MAX_OUTPUT_TOKENS', 400))
+        results = llm_client.respond_many([
+            dict(input=MAP_PROMPT + chunks[i], model=model, max_output_tokens=max_out, timeout=30)
+            for i in todo
+        ])
+        for i, res in zip(todo, results):
+            if isinstance(res, llm_client.RetryLater) and llm_client.should_defer():
+                raise res
+            text = '' if isinstance(res, Exception) else llm_client.output_text(res).strip()
+            if text:
+                notes[i] = text
+                _cache_put(digests[i], text)
+            else:
+                current_app.logger.warning('chunk summary failed, using raw chunk text: %s', res if isinstance(res, Exception) else 'empty output')
+                notes[i] = chunks[i][:max_out * 2]
+    current_app.logger.info('map stage: %s chunks, %s cached', len(chunks), len(chunks) - len(todo))
+    return notes
+
+
+def condensed_transcript(utterances=None, text: str = '', max_tokens: int = None) -> str:
+    """Return the transcript itself if it fits ``max_tokens``, else map-stage notes.
+
+    Used to keep evaluation prompts bounded while still covering the whole
+    interview.
+    """
+    max_tokens = max_tokens or int(_cfg('SUMMARY_CHUNK_TOKENS', 3000))
+    lines = transcript_lines(utterances, text)
+    joined = '\n'.join(lines)
+    if llm_client.estimate_tokens(joined) <= max_tokens or not llm_client.enabled():
+        return joined
+    chunks = chunk_lines(lines, max_tokens, int(_cfg('SUMMARY_MAX_CHUNKS', 40)))
+    notes = map_chunks(chunks)
+    return '\n\n'.join(f'--- part {i + 1}/{len(notes)} ---\n{n}' for i, n in enumerate(notes))
+
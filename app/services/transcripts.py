@@ -0,0 +1,95 @@
+"""Latest transcript of an interview via ``interviews.latest_transcript_id``.
+
+The detail view, the evaluation jobs and the analyze job each used to find
+"the latest transcript" with ``transcripts JOIN recordings ... ORDER BY
+created_at DESC LIMIT 1`` (the detail view twice, plus two more queries for
+the status badge). The transcribe job now maintains a pointer on the
+interview in the same transaction that creates the transcript, and readers
+load the interview together with its transcript in one primary-key join.
+
+Until the column exists (``schema_caps.has_latest_transcript_id``) the old
+join is used.
+"""
+from typing import Optional, Tuple
+
+from sqlalchemy import func, or_, select
+
+from ..extensions import db
+from ..models.interview import Interview
+from ..models.recording import Recording
+from ..models.transcript import Transcript
+from . import schema_caps
+
+
+def _latest_by_join(interview_id: int) -> Optional[Transcript]:
+    return (
+        Transcript.query
+        .join(Recording, Recording.id == Transcript.recording_id)
+        .filter(Recording.interview_id == interview_id)
+        .order_by(Transcript.created_at.desc(), Transcript.id.desc())
+        .first()
+    )
+
+
+def latest_transcript(interview_id: int) -> Optional[Transcript]:
+    """Newest transcript of the interview's recordings, or None."""
+    if not schema_caps.has('has_latest_transcript_id'):
+        return _latest_by_join(interview_id)
+    return (
+        db.session.query(Transcript)
+        .join(Interview, Interview.latest_transcript_id == Transcript.id)
+        .filter(Interview.id == interview_id)
+    ).first()
+
+
+def load_interview(interview_id: int, org_id: int = None,
+                   with_recording: bool = False) -> Tuple[Optional[Interview], Optional[Transcript], Optional[int]]:
+    """Return ``(interview, latest transcript, latest recording id)`` in one query.
+
+    The recording id is only looked up with ``with_recording`` (the detail
+    page uses it to tell "uploaded, not transcribed yet" apart).
+    """
+    cols = [Interview]
+    if with_recording:
+        cols.append(
+            select(func.max(Recording.id)).where(Recording.interview_id == Interview.id)
+            .correlate(Interview).scalar_subquery()
+        )
+    if schema_caps.has('has_latest_transcript_id'):
+        q = (
+            db.session.query(*cols, Transcript)
+            .outerjoin(Transcript, Transcript.id == Interview.latest_transcript_id)
+            .filter(Interview.id == interview_id)
+        )
+        if org_id is not None:
+            q = q.filter(Interview.org_id == org_id)
+        row = q.first()
+        if row is None:
+            return None, None, None
+        return row[0], row[-1], (row[1] if with_recording else None)
+
+    q = db.session.query(*cols).filter(Interview.id == interview_id)
+    if org_id is not None:
+        q = q.filter(Interview.org_id == org_id)
+    row = q.first()
+    if row is None:
+        return None, None, None
+    iv = row[0] if with_recording else row
+    return iv, _latest_by_join(iv.id), (row[1] if with_recording else None)
+
+
+def set_latest(interview_id: int, transcript_id: int):
+    """Point the interview at ``transcript_id`` unless it already points at a newer one.
+
+    Runs in the caller's transaction. Transcript ids are increasing, so two
+    overlapping transcriptions of the same interview can not move the
+    pointer backwards.
+    """
+    if not schema_caps.has('has_latest_transcript_id'):
+        return
+    db.session.execute(
+        Interview.__table__.update()
+        .where(Interview.id == interview_id)
+        .where(or_(Interview.latest_transcript_id.is_(None), Interview.latest_transcript_id < transcript_id))
+        .values(latest_transcript_id=transcript_id)
+    )
@@ -0,0 +1,147 @@
+// Direct upload of interview recordings (see app/services/direct_upload.py).
+//
+// Forms marked with data-direct-upload send the chosen recording straight to
+// storage in parallel parts instead of posting it with the form:
+//  - edit (data-upload-start set): upload, then submit the form without the file;
+//  - create: post the form without the file (JSON), upload to the new interview,
+//    then open its detail page.
+// Upload tokens are kept in localStorage per file, so re-selecting the same
+// file after an interruption only sends the missing parts.
+(function(){
+  var MAX_RETRIES = 3;
+
+  function json(resp){
+    return resp.json().catch(function(){ return {}; }).then(function(body){
+      if(!resp.ok){ throw new Error(body.error || ('HTTP ' + resp.status)); }
+      return body;
+    });
+  }
+
+  function fileKey(url, file){
+    return 'direct-upload:' + url + ':' + file.name + ':' + file.size + ':' + file.lastModified;
+  }
+
+  function begin(startUrl, file){
+    var key = fileKey(startUrl, file);
+    var saved = null;
+    try { saved = JSON.parse(localStorage.getItem(key) || 'null'); } catch(e) {}
+    var fresh = function(){
+      return fetch(startUrl, {
+        method: 'POST', credentials: 'same-origin',
+        headers: {'Content-Type': 'application/json', 'Accept': 'application/json'},
+        body: JSON.stringify({filename: file.name, size: file.size, content_type: file.type || 'application/octet-stream'})
+      }).then(json).then(function(up){
+        try { localStorage.setItem(key, JSON.stringify({token: up.token, status_url: up.status_url})); } catch(e) {}
+        return up;
+      });
+    };
+    if(!saved){ return fresh().then(function(up){ up.storageKey = key; return up; }); }
+    // resume: the status endpoint lists the stored parts and re-signs the rest
+    return fetch(saved.status_url, {credentials: 'same-origin', headers: {'X-Upload-Token': saved.token}})
+      .then(json).then(function(up){ up.token = saved.token; return up; })
+      .catch(function(){ localStorage.removeItem(key); return fresh(); })
+      .then(function(up){ up.storageKey = key; return up; });
+  }
+
+  function putPart(up, part, file){
+    var blob = file.slice((part.number - 1) * up.part_size, (part.number - 1) * up.part_size + part.size);
+    // S3 URLs are presigned; local parts go to the app and carry the token
+    var headers = up.backend === 'local' ? {'X-Upload-Token': up.token, 'Content-Type': 'application/octet-stream'} : {};
+    var attempt = function(n){
+      return fetch(part.url, {method: 'PUT', body: blob, headers: headers,
+                              credentials: up.backend === 'local' ? 'same-origin' : 'omit'})
+        .then(function(resp){ if(!resp.ok){ throw new Error('part ' + part.number + ': HTTP ' + resp.status); } })
+        .catch(function(err){
+          if(n >= MAX_RETRIES){ throw err; }
+          return new Promise(function(r){ setTimeout(r, 1000 * Math.pow(2, n)); }).then(function(){ return attempt(n + 1); });
+        });
+    };
+    return attempt(0);
+  }
+
+  function upload(startUrl, file, concurrency, onProgress){
+    return begin(startUrl, file).then(function(up){
+      var pending = up.parts.filter(function(p){ return !p.done; });
+      var sent = file.size - pending.reduce(function(a, p){ return a + p.size; }, 0);
+      onProgress(sent, file.size);
+      var next = 0;
+      var worker = function(){
+        if(next >= pending.length){ return Promise.resolve(); }
+        var part = pending[next++];
+        return putPart(up, part, file).then(function(){
+          sent += part.size;
+          onProgress(sent, file.size);
+          return worker();
+        });
+      };
+      var workers = [];
+      for(var i = 0; i < Math.max(1, concurrency); i++){ workers.push(worker()); }
+      return Promise.all(workers).then(function(){
+        return fetch(up.complete_url, {
+          method: 'POST', credentials: 'same-origin',
+          headers: {'Content-Type': 'application/json', 'Accept': 'application/json', 'X-Upload-Token': up.token},
+          body: '{}'
+        }).then(json);
+      }).then(function(done){
+        try { localStorage.removeItem(up.storageKey); } catch(e) {}
+        return done;
+      });
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function(){
+    var forms = document.querySelectorAll('form[data-direct-upload]');
+    Array.prototype.forEach.call(forms, function(form){
+      var input = form.querySelector('input[type=file]');
+      var progress = form.querySelector('[data-upload-progress]');
+      if(!input || !window.fetch || !window.Blob || !Blob.prototype.slice){ return; }
+      var concurrency = parseInt(form.getAttribute('data-concurrency') || '4', 10);
+      var busy = false;
+
+      var show = function(text){ if(progress){ progress.hidden = false; progress.textContent = text; } };
+      var onProgress = function(sent, total){
+        show('アップロード中… ' + Math.floor(sent * 100 / Math.max(total, 1)) + '%');
+      };
+
+      form.addEventListener('submit', function(ev){
+        var file = input.files && input.files[0];
+        if(!file || busy){ if(busy){ ev.preventDefault(); } return; }
+        ev.preventDefault();
+        busy = true;
+        var buttons = form.querySelectorAll('button[type=submit]');
+        Array.prototype.forEach.call(buttons, function(b){ b.disabled = true; });
+        var fail = function(err){
+          busy = false;
+          Array.prototype.forEach.call(buttons, function(b){ b.disabled = false; });
+          show('アップロードに失敗しました: ' + err.message + '（もう一度保存すると続きから再開します）');
+        };
+        var startUrl = form.getAttribute('data-upload-start');
+        if(startUrl){
+          upload(startUrl, file, concurrency, onProgress).then(function(){
+            // the recording is stored; save the rest of the form without it
+            input.disabled = true;
+            form.submit();
+          }).catch(fail);
+          return;
+        }
+        var data = new FormData(form);
+        data.delete(input.name);
+        fetch(form.action || window.location.href, {
+          method: 'POST', body: data, credentials: 'same-origin', headers: {'Accept': 'application/json'}
+        }).then(function(resp){
+          return resp.json().then(function(body){
+            if(!resp.ok){ throw new Error(body.errors ? '入力内容を確認してください' : ('HTTP ' + resp.status)); }
+            return body;
+          });
+        }).then(function(created){
+          // the interview exists now; a failed upload is retried from its page
+          form.setAttribute('data-upload-start', created.upload_url);
+          form.action = created.detail_url;
+          return upload(created.upload_url, file, concurrency, onProgress).then(function(){
+            window.location.href = created.detail_url;
+          });
+        }).catch(fail);
+      });
+    });
+  });
+})();
@@ -42,4 +42,89 @@ class Config:
     # transcription/utterance fallback thresholds
     DG_WORD_GAP_THRESHOLD = float(os.getenv('DG_WORD_GAP_THRESHOLD', '0.35'))
     # filler tokens, comma separated
-    FILLER_TOKENS = os.getenv('FILLER_TOKENS', 'えー,あの,えっと,うーん,うー,あー,um,uh')
\ No newline at end of file
+    FILLER_TOKENS = os.getenv('FILLER_TOKENS', 'えー,あの,えっと,うーん,うー,あー,um,uh')
+    # segmented (chunked, parallel) transcription of long recordings; needs ffmpeg/ffprobe on PATH
+    STT_SEGMENTED = os.getenv('STT_SEGMENTED', '1') == '1'
+    STT_SEGMENT_MIN_SEC = float(os.getenv('STT_SEGMENT_MIN_SEC', '900'))
+    STT_SEGMENT_SEC = float(os.getenv('STT_SEGMENT_SEC', '300'))
+    STT_SEGMENT_OVERLAP_SEC = float(os.getenv('STT_SEGMENT_OVERLAP_SEC', '4'))
+    STT_SEGMENT_WORKERS = int(os.getenv('STT_SEGMENT_WORKERS', '4'))
+    # cache of raw Deepgram responses keyed by audio hash + options (0 = unbounded)
+    STT_CACHE_ENABLED = os.getenv('STT_CACHE_ENABLED', '1') == '1'
+    STT_CACHE_MAX_BYTES = int(os.getenv('STT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+    # shared OpenAI client: global limits are enforced across workers via Redis
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '0'))  # 0 = unlimited
+    LLM_MAX_ATTEMPTS = int(os.getenv('LLM_MAX_ATTEMPTS', '3'))
+    # longer backoffs reschedule the RQ job instead of sleeping in the worker
+    LLM_MAX_INLINE_WAIT_SEC = float(os.getenv('LLM_MAX_INLINE_WAIT_SEC', '5'))
+    LLM_MAX_RESCHEDULES = int(os.getenv('LLM_MAX_RESCHEDULES', '5'))
+    # map-reduce summarization of long transcripts (app/services/summarize.py)
+    SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '3000'))
+    SUMMARY_MAX_CHUNKS = int(os.getenv('SUMMARY_MAX_CHUNKS', '40'))
+    SUMMARY_MAP_MAX_OUTPUT_TOKENS = int(os.getenv('SUMMARY_MAP_MAX_OUTPUT_TOKENS', '400'))
+    SUMMARY_CHUNK_CACHE_TTL_SEC = int(os.getenv('SUMMARY_CHUNK_CACHE_TTL_SEC', str(30 * 86400)))
+    # cache of LLM responses keyed by (model, prompt hash, temperature); orgs can
+    # opt out with the LLM_CACHE_BYPASS setting
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') == '1'
+    LLM_CACHE_TTL_SEC = int(os.getenv('LLM_CACHE_TTL_SEC', str(7 * 86400)))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))
+    # timezone of the calendar dates shown and typed in (applied_at, the home
+    # 30-day window and the daily rollup's default day)
+    APP_TIMEZONE = os.getenv('APP_TIMEZONE', 'Asia/Tokyo')
+    # Redis cache of dashboard payloads per org + filters (invalidated on writes)
+    DASHBOARD_CACHE_ENABLED = os.getenv('DASHBOARD_CACHE_ENABLED', '1') == '1'
+    DASHBOARD_CACHE_TTL_SEC = int(os.getenv('DASHBOARD_CACHE_TTL_SEC', '300'))
+    # schema capability registry: how often to look for a migration (Redis
+    # schema:generation) and max age of the flags when Redis is unavailable
+    SCHEMA_CAPS_RECHECK_SEC = float(os.getenv('SCHEMA_CAPS_RECHECK_SEC', '30'))
+    SCHEMA_CAPS_MAX_AGE_SEC = float(os.getenv('SCHEMA_CAPS_MAX_AGE_SEC', '600'))
+    # keyset pagination of the candidate/interview lists: page size cap, and
+    # above how many (planner-estimated) rows the total is shown as an estimate
+    KEYSET_MAX_PER_PAGE = int(os.getenv('KEYSET_MAX_PER_PAGE', '200'))
+    KEYSET_EXACT_COUNT_MAX = int(os.getenv('KEYSET_EXACT_COUNT_MAX', '10000'))
+    # full-text search: max indexed characters per document
+    SEARCH_MAX_BODY_CHARS = int(os.getenv('SEARCH_MAX_BODY_CHARS', '100000'))
+    # org data export (/org/export): rows fetched per server-side cursor batch,
+    # and timeout / result retention of the background export job (the stored
+    # file is deleted when its result expires, see app/jobs/export.py)
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '500'))
+    EXPORT_JOB_TIMEOUT_SEC = int(os.getenv('EXPORT_JOB_TIMEOUT_SEC', '3600'))
+    EXPORT_RESULT_TTL_SEC = int(os.getenv('EXPORT_RESULT_TTL_SEC', '86400'))
+    # candidate import (/org/import): rows per transaction, and timeout /
+    # result retention of the background import job
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '1000'))
+    IMPORT_JOB_TIMEOUT_SEC = int(os.getenv('IMPORT_JOB_TIMEOUT_SEC', '3600'))
+    IMPORT_RESULT_TTL_SEC = int(os.getenv('IMPORT_RESULT_TTL_SEC', '86400'))
+    # browser cache lifetime of stored office file previews (revalidated by ETag)
+    PREVIEW_CACHE_MAX_AGE_SEC = int(os.getenv('PREVIEW_CACHE_MAX_AGE_SEC', '86400'))
+    # file delivery (app/services/delivery.py): S3 downloads redirect to a
+    # presigned URL (S3_PUBLIC_ENDPOINT when browsers can not reach S3_ENDPOINT);
+    # local files can be offloaded to the web server ('x-sendfile' or
+    # 'x-accel-redirect' with an nginx internal location at STORAGE_ACCEL_PREFIX)
+    STORAGE_PRESIGN_DOWNLOADS = os.getenv('STORAGE_PRESIGN_DOWNLOADS', '1') == '1'
+    S3_PRESIGN_EXPIRES_SEC = int(os.getenv('S3_PRESIGN_EXPIRES_SEC', '300'))
+    S3_PUBLIC_ENDPOINT = os.getenv('S3_PUBLIC_ENDPOINT')
+    STORAGE_SENDFILE = os.getenv('STORAGE_SENDFILE', '')
+    STORAGE_ACCEL_PREFIX = os.getenv('STORAGE_ACCEL_PREFIX', '/_protected/')
+    # S3 client shared per process (app/services/storage.py): addressing style,
+    # multipart transfer tuning and connection behaviour
+    S3_REGION = os.getenv('S3_REGION')
+    S3_ADDRESSING_STYLE = os.getenv('S3_ADDRESSING_STYLE', 'virtual')  # virtual / path / auto
+    S3_MAX_CONCURRENCY = int(os.getenv('S3_MAX_CONCURRENCY', '8'))
+    S3_MULTIPART_THRESHOLD_MB = int(os.getenv('S3_MULTIPART_THRESHOLD_MB', '16'))
+    S3_MULTIPART_CHUNKSIZE_MB = int(os.getenv('S3_MULTIPART_CHUNKSIZE_MB', '16'))
+    S3_MAX_ATTEMPTS = int(os.getenv('S3_MAX_ATTEMPTS', '5'))
+    S3_CONNECT_TIMEOUT_SEC = float(os.getenv('S3_CONNECT_TIMEOUT_SEC', '5'))
+    S3_READ_TIMEOUT_SEC = float(os.getenv('S3_READ_TIMEOUT_SEC', '60'))
+    # direct browser uploads of recordings (app/services/direct_upload.py):
+    # part size, largest accepted file, lifetime of an upload token and the
+    # number of parts the browser sends at once
+    DIRECT_UPLOADS = os.getenv('DIRECT_UPLOADS', '1') == '1'
+    DIRECT_UPLOAD_PART_MB = int(os.getenv('DIRECT_UPLOAD_PART_MB', '16'))
+    DIRECT_UPLOAD_MAX_MB = int(os.getenv('DIRECT_UPLOAD_MAX_MB', '2048'))
+    DIRECT_UPLOAD_EXPIRES_SEC = int(os.getenv('DIRECT_UPLOAD_EXPIRES_SEC', '86400'))
+    DIRECT_UPLOAD_CONCURRENCY = int(os.getenv('DIRECT_UPLOAD_CONCURRENCY', '4'))
+    # RQ: default timeout of jobs on the "stt" queue (long recordings); the
+    # other queues keep RQ's default unless the call site passes job_timeout
+    RQ_STT_JOB_TIMEOUT_SEC = int(os.getenv('RQ_STT_JOB_TIMEOUT_SEC', '7200'))
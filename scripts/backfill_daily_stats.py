@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Rebuild the org_daily_stats rollup from candidates/applications/interviews/evaluations.
+
+Run once after applying the migration, and whenever rows were changed
+outside the ORM (bulk updates, raw SQL).
+
+Usage:
+  python scripts/backfill_daily_stats.py                 # all orgs, all days
+  python scripts/backfill_daily_stats.py --org-id 1
+  python scripts/backfill_daily_stats.py --since 2026-09-01
+"""
+import os, sys, argparse
+from datetime import date
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import create_app
+from app.services import daily_stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--org-id', type=int)
+    parser.add_argument('--since', type=date.fromisoformat, help='only rebuild days on/after YYYY-MM-DD')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        n = daily_stats.backfill(org_id=args.org_id, since=args.since)
+        print(f'Rebuilt {n} daily rows')
+
+
+if __name__ == '__main__':
+    main()
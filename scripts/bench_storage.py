@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Benchmark storage uploads/downloads through app/services/storage.py.
+
+Uploads N files of the given size with ``save_file`` (as the upload views
+do), reads them back with ``download_to_path`` and ``open_stream``, and
+prints per-file latency, throughput and the peak RSS of the process.
+
+Point it at a local MinIO with the usual settings, e.g.
+  STORAGE_BACKEND=s3 S3_ENDPOINT=http://localhost:9000 S3_BUCKET=bench \
+  S3_ACCESS_KEY=minioadmin S3_SECRET_KEY=minioadmin S3_ADDRESSING_STYLE=path \
+  python scripts/bench_storage.py --count 5 --size-mb 300
+or use --moto to run against an in-process moto S3 (``pip install moto``).
+--per-call-client drops the shared client before every operation, which
+reproduces the old one-client-per-call behaviour for comparison.
+
+Usage:
+  python scripts/bench_storage.py --count 10 --size-mb 50
+  python scripts/bench_storage.py --moto --count 3 --size-mb 200 --per-call-client
+"""
+import os, sys, argparse, resource, statistics, tempfile, time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+from app import create_app
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def _report(name, times, size_mb):
+    total = sum(times)
+    print(f'{name:<14} p50 {statistics.median(times):7.3f}s  max {max(times):7.3f}s  '
+          f'{size_mb * len(times) / total if total else 0:8.1f} MB/s')
+
+
+def run(args):
+    from app.services import storage
+    src_fd, src = tempfile.mkstemp()
+    with os.fdopen(src_fd, 'wb') as f:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            f.write(block)
+    urls, up, down, stream = [], [], [], []
+    rss0 = _peak_rss_mb()
+    try:
+        for i in range(args.count):
+            if args.per_call_client:
+                storage.reset()
+            with open(src, 'rb') as fh:
+                t = time.perf_counter()
+                urls.append(storage.save_file(FileStorage(fh, filename=f'bench{i}.bin'), prefix='bench'))
+                up.append(time.perf_counter() - t)
+        for url in urls:
+            if args.per_call_client:
+                storage.reset()
+            fd, dst = tempfile.mkstemp()
+            os.close(fd)
+            t = time.perf_counter()
+            storage.download_to_path(url, dst)
+            down.append(time.perf_counter() - t)
+            os.remove(dst)
+            t = time.perf_counter()
+            with storage.open_stream(url) as s:
+                for _ in s:
+                    pass
+            stream.append(time.perf_counter() - t)
+    finally:
+        os.remove(src)
+        for url in urls:
+            storage.delete(url)
+    print(f'{args.count} x {args.size_mb} MB, backend={current_app.config.get("STORAGE_BACKEND")}'
+          f'{" (client per call)" if args.per_call_client else ""}')
+    _report('upload', up, args.size_mb)
+    _report('download', down, args.size_mb)
+    _report('open_stream', stream, args.size_mb)
+    print(f'peak RSS {_peak_rss_mb():.0f} MB (+{_peak_rss_mb() - rss0:.0f} MB during the run)')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=5)
+    parser.add_argument('--size-mb', type=int, default=50)
+    parser.add_argument('--moto', action='store_true', help='run against an in-process moto S3')
+    parser.add_argument('--per-call-client', action='store_true', help='new client for every operation (old behaviour)')
+    args = parser.parse_args(argv)
+
+    if args.moto:
+        try:
+            from moto import mock_aws
+        except ImportError:
+            sys.exit('moto is not installed (pip install moto)')
+        with mock_aws():
+            app = create_app()
+            app.config.update(STORAGE_BACKEND='s3', S3_BUCKET='bench', S3_ENDPOINT=None,
+                              S3_ACCESS_KEY='x', S3_SECRET_KEY='x', S3_REGION='us-east-1')
+            with app.app_context():
+                from app.services import storage
+                storage.s3_backend().client.create_bucket(Bucket='bench')
+                run(args)
+        return
+
+    app = create_app()
+    with app.app_context():
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
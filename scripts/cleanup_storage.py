@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Remove expired generated files from storage.
+
+* background exports (``exports/``) older than EXPORT_RESULT_TTL_SEC: their
+  job result, the only link to them, has expired. The export job normally
+  schedules its own deletion; this catches files whose deletion was lost
+  (Redis flushed, no worker with the scheduler running);
+* candidate import files (``imports/``: error reports with the rejected
+  rows, uploads left by failed jobs) older than IMPORT_RESULT_TTL_SEC;
+* direct recording uploads (``app/services/direct_upload.py``) started
+  more than DIRECT_UPLOAD_EXPIRES_SEC ago and never completed or aborted:
+  S3 multipart uploads are aborted, local ``.uploads/`` staging
+  directories removed.
+
+Run it daily from cron (or as a scheduled job on the maintenance queue).
+
+Usage:
+  python scripts/cleanup_storage.py
+  python scripts/cleanup_storage.py --max-age-sec 3600
+"""
+import os, sys, argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import create_app
+from app.jobs.export import purge_exports
+from app.services import direct_upload
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-age-sec', type=int, help='export/import file age to delete after (default EXPORT_/IMPORT_RESULT_TTL_SEC)')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        n = purge_exports(args.max_age_sec)
+        print(f'Deleted {n} expired export/import file(s)')
+        n = direct_upload.purge_abandoned()
+        print(f'Discarded {n} abandoned upload(s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Run EXPLAIN on the org-scoped hot queries and report which index each one uses.
+
+Every query is built the same way the views/jobs build it and paired with
+the index from the 20261018_add_hot_query_indexes migration it is expected
+to use. On small databases PostgreSQL prefers sequential scans; use
+--no-seqscan to check that the index is at least usable.
+
+Usage:
+  python scripts/explain_hot_queries.py --org-id 1
+  python scripts/explain_hot_queries.py --org-id 1 --no-seqscan --analyze   # PostgreSQL
+  python scripts/explain_hot_queries.py --strict      # exit 1 when an index is not used
+"""
+import os, sys, argparse
+from datetime import date, datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sqlalchemy import func
+from app import create_app
+from app.extensions import db
+
+
+def hot_queries(org_id):
+    """``[(name, expected index, select statement)]``."""
+    from app.models.application import Application
+    from app.models.candidate import Candidate
+    from app.models.evaluation import Evaluation
+    from app.models.file import Files
+    from app.models.interview import Interview
+    from app.models.recording import Recording
+    from app.models.transcript import Transcript
+
+    today = date.today()
+    since = today - timedelta(days=29)
+    utc_start = datetime.combine(today, datetime.min.time())
+    q = db.session.query
+    return [
+        ('interviews list (date filter)', 'ix_interviews_org_scheduled_date',
+         q(Interview.id).filter(Interview.org_id == org_id, func.date(Interview.scheduled_at) >= since)),
+        ("today's interviews", 'ix_interviews_org_scheduled_at',
+         q(Interview.id).filter(Interview.org_id == org_id, Interview.scheduled_at >= utc_start,
+                                Interview.scheduled_at < utc_start + timedelta(days=1))
+         .order_by(Interview.scheduled_at.asc())),
+        ('candidate detail interviews', 'ix_interviews_candidate_created_at',
+         q(Interview.id).filter(Interview.candidate_id == 1).order_by(Interview.created_at.desc())),
+        ('candidates by applied_at', 'ix_candidates_org_applied_at',
+         q(Candidate.id).filter(Candidate.org_id == org_id, Candidate.applied_at >= since)),
+        ('candidates by status', 'ix_candidates_org_status_applied_at',
+         q(Candidate.id).filter(Candidate.org_id == org_id, Candidate.status == 'screening')
+         .order_by(Candidate.applied_at.desc())),
+        ('latest recording', 'ix_recordings_interview_id_id',
+         q(Recording.id).filter(Recording.interview_id == 1).order_by(Recording.id.desc()).limit(1)),
+        ('latest transcript of a recording', 'ix_transcripts_recording_created_at',
+         q(Transcript.id).filter(Transcript.recording_id == 1).order_by(Transcript.created_at.desc()).limit(1)),
+        ('interview evaluations', 'ix_interview_evaluations_interview_created_at',
+         q(Evaluation.id).filter(Evaluation.interview_id == 1).order_by(Evaluation.created_at.desc())),
+        ('candidate files', 'ix_files_candidate_created_at',
+         q(Files.id).filter(Files.candidate_id == 1).order_by(Files.created_at.desc())),
+        ('home series applications', 'ix_applications_org_created_date',
+         q(func.date(Application.created_at), func.count(Application.id))
+         .filter(Application.org_id == org_id, func.date(Application.created_at) >= since)
+         .group_by(func.date(Application.created_at))),
+    ]
+
+
+def explain(conn, query, analyze=False):
+    stmt = query.statement
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[k] for k in compiled.positiontup)
+    if conn.dialect.name == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+    elif conn.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    rows = conn.exec_driver_sql(prefix + str(compiled), params).fetchall()
+    # sqlite: (id, parent, notused, detail); postgres/mysql: one text column
+    return [str(r[-1]) if conn.dialect.name == 'sqlite' else ' | '.join(str(c) for c in r) for r in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--org-id', type=int, default=1)
+    parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (PostgreSQL; runs the queries)')
+    parser.add_argument('--no-seqscan', action='store_true', help='SET enable_seqscan = off (PostgreSQL)')
+    parser.add_argument('--strict', action='store_true', help='exit 1 if an expected index is not used')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    missing = 0
+    with app.app_context():
+        conn = db.session.connection()
+        if args.no_seqscan and conn.dialect.name == 'postgresql':
+            conn.exec_driver_sql('SET enable_seqscan = off')
+        for name, index, query in hot_queries(args.org_id):
+            try:
+                plan = explain(conn, query, analyze=args.analyze)
+            except Exception as e:
+                db.session.rollback()
+                conn = db.session.connection()
+                print(f'[ERROR] {name}: {e}')
+                missing += 1
+                continue
+            used = any(index in line for line in plan)
+            missing += 0 if used else 1
+            print(f"[{'OK' if used else 'NO INDEX'}] {name} (expects {index})")
+            for line in plan:
+                print(f'    {line}')
+        db.session.rollback()
+    print(f'{missing} queries without their expected index' if missing else 'all hot queries use their index')
+    if args.strict and missing:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""Rebuild search_documents (full-text search) from candidates and transcripts.
+
+Run once after applying the migration, and whenever rows were changed
+outside the ORM (bulk updates, raw SQL, imports).
+
+Usage:
+  python scripts/rebuild_search_index.py              # all orgs
+  python scripts/rebuild_search_index.py --org-id 1
+"""
+import os, sys, argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import create_app
+from app.services import search
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--org-id', type=int)
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        n = search.rebuild(org_id=args.org_id)
+        print(f'Indexed {n} documents (backend: {search.backend()})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Re-derive transcript utterances/metrics from stored raw STT output.
+
+Applies the current DG_WORD_GAP_THRESHOLD / FILLER_TOKENS (org settings or
+app config) without calling Deepgram again.
+
+Usage:
+  python scripts/recompute_transcripts.py --org-id 1
+  python scripts/recompute_transcripts.py --transcript-id 42
+  python scripts/recompute_transcripts.py --org-id 1 --enqueue   # run on an RQ worker
+"""
+import os, sys, argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import create_app
+from app.extensions import rq
+from app.jobs.recompute import recompute_org_transcripts, recompute_transcript
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--org-id', type=int)
+    target.add_argument('--transcript-id', type=int)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--enqueue', action='store_true', help='enqueue as an RQ job instead of running inline')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        if args.transcript_id:
+            func, func_args = recompute_transcript, (args.transcript_id,)
+        else:
+            func, func_args = recompute_org_transcripts, (args.org_id, args.batch_size)
+        if args.enqueue:
+            job = rq.enqueue(func, *func_args, queue="maintenance", job_timeout=3600)
+            print('Enqueued job:', getattr(job, 'id', job))
+        else:
+            print('Result:', func(*func_args))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,22 @@
-"""Run an RQ worker inside the Flask app context.
+"""Run RQ workers inside the Flask app context.
 
 Usage:
   source .venv/bin/activate
   export OBJC_DISABLE_INITIALIZE_FORK_SAFETY=YES   # macOS fork safety if needed
-  python scripts/run_rq_worker.py
+  python scripts/run_rq_worker.py          # one worker on every queue, by priority
+  python scripts/run_rq_worker.py --fork   # fork a work horse per job
+  python scripts/run_rq_worker.py --queues notify+llm,default,maintenance,stt=2 --concurrency 3
+
+Jobs are routed to named queues (app/extensions.py QUEUES, highest priority
+first): notify, llm, default, maintenance, stt. A single worker drains them
+in that order but still runs one job at a time, so an hour-long
+transcription blocks everything behind it. With ``--queues`` the script
+supervises a pool instead: every comma separated item gets its own workers
+(``--concurrency`` processes each, or ``=N`` for that item), and ``a+b``
+makes those workers listen on ``a`` first, then ``b``. ``--concurrency N``
+without ``--queues`` runs N workers on each queue. Short jobs then keep
+their own workers during an STT backlog. Crashed workers are restarted;
+SIGTERM / Ctrl-C stops all of them after their current job.
 
 This ensures the app and extensions are initialized in the worker process
 so jobs that use `current_app` or the Flask-SQLAlchemy session work normally.
@@ -18,24 +31,132 @@ if ROOT not in sys.path:
   sys.path.insert(0, ROOT)
 
 from app import create_app
+from app.extensions import QUEUES
+from app.jobs.runtime import register_app
+import argparse
+import multiprocessing
+import signal
+import time
 import redis
-from rq import Worker, Queue, Connection
+from rq import Worker, SimpleWorker, Queue
+
+# a worker that dies sooner than this after starting is restarted with a delay
+_FLAP_SEC = 10
+_RESTART_DELAY_SEC = 5
+
+
+def parse_queues(spec, concurrency):
+  """``[(queue names, worker count)]`` for a ``--queues`` value; ValueError on unknown names."""
+  plan = []
+  for item in (spec or '').split(','):
+    item = item.strip()
+    if not item:
+      continue
+    names, _, count = item.partition('=')
+    names = tuple(n.strip() for n in names.split('+') if n.strip())
+    unknown = [n for n in names if n not in QUEUES]
+    if not names or unknown:
+      raise ValueError(f'unknown queue in {item!r} (queues: {", ".join(QUEUES)})')
+    count = int(count) if count else concurrency
+    if count < 1:
+      raise ValueError(f'worker count must be at least 1 in {item!r}')
+    plan.append((names, count))
+  return plan
 
 
-def main():
-  app = create_app()
+def run_worker(queue_names, fork=False, log_level='DEBUG'):
+  # restarted workers are forked from the supervisor: drop its handlers (RQ installs its own)
+  signal.signal(signal.SIGTERM, signal.SIG_DFL)
+  signal.signal(signal.SIGINT, signal.default_int_handler)
+  # build the app once; job entrypoints reuse it (and its DB pool) via app.jobs.runtime
+  app = register_app(create_app())
   redis_url = app.config.get('REDIS_URL') or os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
   conn = redis.from_url(redis_url)
   with app.app_context():
-    q = Queue('default', connection=conn)
-    worker = Worker([q], connection=conn)
-    print('RQ worker starting (pid', os.getpid(), ')')
+    queues = [Queue(name, connection=conn) for name in queue_names]
+    worker_cls = Worker if fork else SimpleWorker
+    worker = worker_cls(queues, connection=conn)
+    print('RQ worker starting (pid', os.getpid(), ', class', worker_cls.__name__,
+          ', queues', ','.join(queue_names), ')')
     try:
-            # run in long-running mode (not burst) and show verbose logs for debugging
-            worker.work(burst=False, with_scheduler=True, logging_level='DEBUG')
+      # run in long-running mode (not burst)
+      worker.work(burst=False, with_scheduler=True, logging_level=log_level)
     finally:
       print('RQ worker exiting (pid', os.getpid(), ')')
 
 
+def supervise(plan, fork=False, log_level='DEBUG'):
+  """Run ``count`` worker processes per ``(queue names, count)`` of ``plan`` until signalled."""
+  stopping = []
+
+  def start(names):
+    proc = multiprocessing.Process(target=run_worker, args=(names, fork, log_level),
+                                   name='rq-' + '+'.join(names))
+    proc.start()
+    return {'proc': proc, 'names': names, 'started': time.monotonic(), 'restart_at': None}
+
+  def stop(signum, frame):
+    if not stopping:
+      print('RQ supervisor stopping workers (signal', signum, ')')
+    stopping.append(signum)
+    # Ctrl-C already reached the workers through the process group
+    if signum != signal.SIGINT:
+      for slot in slots:
+        if slot['proc'] is not None and slot['proc'].is_alive():
+          os.kill(slot['proc'].pid, signal.SIGTERM)
+
+  slots = [start(names) for names, count in plan for _ in range(count)]
+  signal.signal(signal.SIGTERM, stop)
+  signal.signal(signal.SIGINT, stop)
+  print('RQ supervisor (pid', os.getpid(), ') running', len(slots), 'workers:',
+        ', '.join(f"{'+'.join(names)} x{count}" for names, count in plan))
+
+  while not stopping:
+    time.sleep(1)
+    now = time.monotonic()
+    for slot in slots:
+      if stopping:
+        break
+      proc = slot['proc']
+      if proc is not None and not proc.is_alive():
+        print('RQ worker', proc.pid, '(' + '+'.join(slot['names']) + ') exited with', proc.exitcode)
+        slot['proc'] = None
+        flapping = now - slot['started'] < _FLAP_SEC
+        slot['restart_at'] = now + (_RESTART_DELAY_SEC if flapping else 0)
+      if slot['proc'] is None and slot['restart_at'] is not None and now >= slot['restart_at']:
+        slot.update(start(slot['names']))
+
+  for slot in slots:
+    if slot['proc'] is not None:
+      slot['proc'].join()
+  print('RQ supervisor exiting')
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Run RQ workers inside the Flask app context.')
+  parser.add_argument('--fork', action='store_true',
+                      help='fork a work horse per job (isolates jobs, but every job reconnects to the DB)')
+  parser.add_argument('--queues',
+                      help='comma separated queue groups, e.g. "notify+llm,stt=2" (runs a supervised worker pool)')
+  parser.add_argument('--concurrency', type=int, default=1,
+                      help='worker processes per queue group without an explicit =N (default 1)')
+  parser.add_argument('--log-level', default='DEBUG', help='RQ worker log level (default DEBUG)')
+  args = parser.parse_args(argv)
+
+  if not args.queues:
+    if args.concurrency == 1:
+      run_worker(QUEUES, fork=args.fork, log_level=args.log_level)
+      return
+    # --concurrency alone: N workers on each queue
+    args.queues = ','.join(QUEUES)
+  try:
+    plan = parse_queues(args.queues, args.concurrency)
+  except ValueError as e:
+    parser.error(str(e))
+  if not plan:
+    parser.error('--queues is empty')
+  supervise(plan, fork=args.fork, log_level=args.log_level)
+
+
 if __name__ == '__main__':
   main()
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from flask import Flask
+
+import app.models  # noqa: F401  (registers every table)
+from app.extensions import db
+from app.services import schema_caps
+
+
+@pytest.fixture
+def db_app():
+    """Bare Flask app on an in-memory SQLite database with every table created (inside its app context)."""
+    flask_app = Flask(__name__)
+    flask_app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SECRET_KEY='test')
+    db.init_app(flask_app)
+    with flask_app.app_context():
+        db.create_all()
+        schema_caps.refresh()
+        yield flask_app
+        db.session.remove()
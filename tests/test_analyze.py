@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.extensions import db
+from app.jobs import analyze
+from app.models import Candidate, Interview, Organization
+from app.models.evaluation import Evaluation
+from app.models.recording import Recording
+from app.models.transcript import Transcript
+from app.services import llm_client
+
+
+def test_rubric_scores_use_gen_evaluation_scale():
+    scores, total = analyze._rubric_scores(
+        {'communication': 80, 'problem_solving': '70', 'role_fit': 130, 'culture_fit': None})
+    assert scores == {'communication': 4.0, 'problem_solving': 3.5, 'role_fit': 5.0}
+    assert total == 12.5
+    assert analyze._rubric_scores({}) == ({}, None)
+
+
+def test_analysis_stores_rubric_total_as_overall_score(db_app, monkeypatch):
+    org = Organization(name='acme')
+    db.session.add(org); db.session.flush()
+    cand = Candidate(org_id=org.id, name='山田 太郎', applied_at=date(2026, 10, 1))
+    db.session.add(cand); db.session.flush()
+    iv = Interview(org_id=org.id, candidate_id=cand.id)
+    db.session.add(iv); db.session.flush()
+    rec = Recording(org_id=org.id, interview_id=iv.id, storage_url='file:///tmp/x.m4a')
+    db.session.add(rec); db.session.flush()
+    tr = Transcript(org_id=org.id, recording_id=rec.id, text='よろしくお願いします', status='ok',
+                    utterances=[{'speaker': 0, 'start': 0.0, 'end': 1.0, 'text': 'よろしくお願いします'}])
+    db.session.add(tr); db.session.flush()
+    iv.latest_transcript_id = tr.id
+    db.session.commit()
+
+    reply = {'ai_score': 72, 'summary_short': '良好',
+             'aspect_scores': {'communication': 80, 'problem_solving': 60, 'role_fit': 70, 'culture_fit': 90}}
+    monkeypatch.setattr(llm_client, 'enabled', lambda: True)
+    monkeypatch.setattr(llm_client, 'respond_many', lambda calls: [object() for _ in calls])
+    monkeypatch.setattr(llm_client, 'output_text', lambda res: json.dumps(reply))
+
+    out = analyze._run_analyze_interview(iv.id)
+    assert out['ai_score'] == 72.0
+    ev = Evaluation.query.filter_by(interview_id=iv.id).one()
+    # 4 rubric items x 0-5, like evaluate.py's rows (not the 0-100 ai_score)
+    assert float(ev.overall_score) == 15.0
+    assert ev.raw_metrics == {'communication': 4.0, 'problem_solving': 3.0, 'role_fit': 3.5, 'culture_fit': 4.5}
@@ -0,0 +1,90 @@
+import hashlib
+import io
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import blobs, storage
+
+
+class _Pipe(io.RawIOBase):
+    """Non-seekable stream (like a request body)."""
+
+    def __init__(self, data):
+        self._buf = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def read(self, size=-1):
+        return self._buf.read(size)
+
+
+def test_hash_stream_rewinds_seekable_and_spools_others():
+    data = os.urandom(300000)
+    digest = hashlib.sha256(data).hexdigest()
+    for stream in (io.BytesIO(data), _Pipe(data)):
+        sha, size, out = blobs._hash_stream(stream)
+        assert (sha, size) == (digest, len(data))
+        assert out.read() == data
+
+
+def test_blob_key_is_content_addressed():
+    sha = 'ab' + '0' * 62
+    assert blobs.blob_key(3, sha, '履歴書.PDF') == f'org3/blobs/ab/{sha}.pdf'
+    assert blobs.blob_key(3, sha, 'cv.docx') == f'org3/blobs/ab/{sha}.docx'
+    assert blobs.blob_key(3, sha) == f'org3/blobs/ab/{sha}'
+
+
+def test_local_copy_hashes_the_single_download(monkeypatch):
+    data = os.urandom(300000)
+    opened = []
+
+    def open_stream(url):
+        opened.append(url)
+        return storage.StorageStream(io.BytesIO(data), length=len(data), name='rec.mp4')
+
+    monkeypatch.setattr(blobs.storage, 'open_stream', open_stream)
+    with blobs.local_copy('s3://bucket/org1/rec.mp4') as (path, sha, size):
+        assert path.endswith('.mp4')
+        with open(path, 'rb') as f:
+            assert f.read() == data
+        assert (sha, size) == (hashlib.sha256(data).hexdigest(), len(data))
+    assert not os.path.exists(path)
+    assert opened == ['s3://bucket/org1/rec.mp4']
+
+
+def test_find_transcript_skips_transcripts_with_gaps(db_app):
+    from datetime import date
+    from app.extensions import db
+    from app.models import Candidate, Interview, Organization
+    from app.models.recording import Recording
+    from app.models.transcript import Transcript
+
+    org = Organization(name='acme')
+    db.session.add(org); db.session.flush()
+    cand = Candidate(org_id=org.id, name='山田', applied_at=date(2026, 10, 1))
+    db.session.add(cand); db.session.flush()
+    iv = Interview(org_id=org.id, candidate_id=cand.id)
+    db.session.add(iv); db.session.flush()
+    old, new = [Recording(org_id=org.id, interview_id=iv.id, storage_url=f'file:///x/{n}.wav',
+                          content_sha256='ab' * 32, size_bytes=10) for n in ('old', 'new')]
+    db.session.add_all([old, new]); db.session.flush()
+    # saved as 'ok' before partial transcripts got their own status
+    db.session.add(Transcript(org_id=org.id, recording_id=old.id, text='…', lang='ja', status='ok',
+                              raw_response={'metadata': {'segments': 3, 'segments_failed': 1}}))
+    db.session.add(Transcript(org_id=org.id, recording_id=old.id, text='…', lang='ja', status='partial'))
+    db.session.commit()
+    assert blobs.find_transcript(new, 'ja') is None
+
+    done = Transcript(org_id=org.id, recording_id=old.id, text='全文', lang='ja', status='ok',
+                      raw_response={'metadata': {'segments': 3, 'segments_failed': 0}})
+    db.session.add(done); db.session.commit()
+    db.session.add(Transcript(org_id=org.id, recording_id=old.id, text='…', lang='ja', status='ok',
+                              raw_response={'metadata': {'segments': 3, 'segments_failed': 2}}))
+    db.session.commit()
+    assert blobs.find_transcript(new, 'ja').id == done.id
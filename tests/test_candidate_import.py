@@ -0,0 +1,114 @@
+import io
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from sqlalchemy import text
+
+from app.extensions import db, rq
+from app.models import Candidate, Organization
+from app.models.daily_stat import OrgDailyStat
+from app.models.search_document import SearchDocument
+from app.services import candidate_import as importer
+
+
+def test_convert_types_and_rejects_bad_values():
+    data = importer.convert({'name': ' 山田 ', 'grad_year': 2020.0, 'applied_at': '2025/01/02',
+                             'skills': 'Python, SQL', 'id': '99', 'unknown': 'x', 'memo': ''})
+    assert data == {'name': '山田', 'grad_year': 2020, 'applied_at': date(2025, 1, 2), 'skills': ['Python', 'SQL']}
+    with pytest.raises(importer.RowError, match='birthdate'):
+        importer.convert({'name': 'a', 'birthdate': '02-01-2025'})
+    with pytest.raises(importer.RowError, match='email'):
+        importer.convert({'name': 'a', 'email': 'not-an-email'})
+
+
+def test_csv_reader_reports_line_numbers_and_strips_bom():
+    raw = '﻿name,email\n山田,a@example.com\n"複数\n行",b@example.com\n'.encode('utf-8')
+    rows = list(importer.iter_file(io.BytesIO(raw), 'csv'))
+    assert rows[0] == (2, {'name': '山田', 'email': 'a@example.com'})
+    assert rows[1][0] == 4
+
+
+def test_ndjson_reader_accepts_export_lines():
+    raw = b'{"table": "users", "row": {"email": "u@x.jp"}}\n{"table": "candidates", "row": {"name": "a"}}\n{"name": "b"}\n'
+    assert [r for _, r in importer.iter_file(io.BytesIO(raw), 'ndjson')] == [{'name': 'a'}, {'name': 'b'}]
+
+
+def test_detect_format():
+    assert importer.detect_format('list.XLSX') == 'xlsx'
+    assert importer.detect_format('upload', 'text/csv') == 'csv'
+    assert importer.detect_format('a.txt') is None
+
+
+class _Redis(dict):
+    def get(self, k):
+        return dict.get(self, k)
+
+    def incr(self, k):
+        self[k] = int(dict.get(self, k) or 0) + 1
+        return self[k]
+
+
+@pytest.fixture
+def org(db_app, monkeypatch):
+    monkeypatch.setattr(rq, 'redis', _Redis())
+    acme, other = Organization(name='acme'), Organization(name='other')
+    db.session.add_all([acme, other]); db.session.flush()
+    db.session.add_all([
+        Candidate(org_id=acme.id, name='山田', email='yamada@example.com', applied_at=date(2026, 9, 1)),
+        Candidate(org_id=other.id, name='佐藤', email='sato@example.com', applied_at=date(2026, 9, 1)),
+    ])
+    db.session.commit()
+    return acme.id
+
+
+def _rows(*rows):
+    return [(i, r) for i, r in enumerate(rows, 2)]
+
+
+def test_plan_updates_by_email_and_rejects_foreign_emails(org):
+    result = importer.ImportResult()
+    inserts, updates = importer._plan(org, _rows(
+        {'name': '山田 太郎', 'email': 'yamada@example.com'},
+        {'name': '佐藤', 'email': 'sato@example.com'},
+        {'name': '鈴木', 'email': 'suzuki@example.com', 'memo': 'first'},
+        {'email': 'suzuki@example.com', 'memo': 'second'},
+        {'email': 'nameless@example.com'},
+    ), result)
+    existing = Candidate.query.filter_by(email='yamada@example.com').one()
+    assert [d for _, d in updates] == [{'id': existing.id, 'name': '山田 太郎', 'email': 'yamada@example.com'}]
+    # duplicate emails in the file are merged, the later row winning
+    assert [(line, d['name'], d['memo']) for line, d in inserts] == [(5, '鈴木', 'second')]
+    assert sorted((line, msg) for line, _, msg in result.errors) == [
+        (3, 'email: 他の組織で使用されています'), (6, 'name: 必須項目です')]
+
+
+def test_failed_bulk_chunk_is_retried_row_by_row(org):
+    db.session.execute(text(
+        "CREATE TRIGGER reject_bad BEFORE INSERT ON candidates WHEN NEW.name = 'bad' "
+        "BEGIN SELECT RAISE(ABORT, 'bad row'); END"))
+    db.session.commit()
+    result = importer.ImportResult()
+    importer.apply_chunk(org, _rows(
+        {'name': 'good', 'applied_at': date(2026, 10, 1)},
+        {'name': 'bad', 'applied_at': date(2026, 10, 1)},
+        {'name': '山田 太郎', 'email': 'yamada@example.com'},
+    ), result)
+    assert (result.inserted, result.updated) == (1, 1)
+    assert [(line, msg.startswith('登録できませんでした')) for line, _, msg in result.errors] == [(3, True)]
+    assert sorted(c.name for c in Candidate.query.filter_by(org_id=org)) == ['good', '山田 太郎']
+
+
+def test_run_refreshes_search_rollup_and_dashboard_cache(org):
+    raw = 'name,email,applied_at\n鈴木,suzuki@example.com,2026-10-01\n田中,,2026-10-01\n山田 太郎,yamada@example.com,\n'
+    result = importer.run(org, importer.iter_file(io.BytesIO(raw.encode('utf-8')), 'csv'), chunk_size=2)
+    assert result.as_dict()['inserted'] == 2 and result.updated == 1 and not result.errors
+
+    docs = {d.body for d in SearchDocument.query.filter_by(org_id=org, kind='candidate')}
+    assert {'鈴木', '田中', '山田 太郎'} <= docs
+    stats = {s.day: s.candidates for s in OrgDailyStat.query.filter_by(org_id=org)}
+    assert stats[date(2026, 10, 1)] == 2 and stats[date(2026, 9, 1)] == 1
+    assert rq.redis.get(f'dash:ver:{org}') == 1
@@ -0,0 +1,93 @@
+import os
+import sys
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from app.extensions import db
+from app.models import Candidate, Interview, Organization
+from app.models.daily_stat import OrgDailyStat
+from app.services import daily_stats
+
+
+@pytest.fixture
+def org(db_app):
+    # SQLite's now() is UTC: keep the hook's default day on the same calendar
+    db_app.config['APP_TIMEZONE'] = 'UTC'
+    daily_stats.install()
+    acme, other = Organization(name='acme'), Organization(name='other')
+    db.session.add_all([acme, other]); db.session.commit()
+    return acme.id, other.id
+
+
+def _rollup():
+    return {(r.org_id, r.day): {c: getattr(r, c) for c in daily_stats.COLUMNS if getattr(r, c)}
+            for r in OrgDailyStat.query}
+
+
+def _nonzero(rollup):
+    return {k: v for k, v in rollup.items() if v}
+
+
+def test_hook_tracks_inserts_deletes_and_changes(org):
+    acme, other = org
+    d1, d2 = date(2026, 10, 1), date(2026, 10, 2)
+    a = Candidate(org_id=acme, name='a', applied_at=d1)
+    b = Candidate(org_id=acme, name='b', applied_at=d1)
+    db.session.add_all([a, b]); db.session.commit()
+    iv = Interview(org_id=acme, candidate_id=a.id)
+    db.session.add(iv); db.session.commit()
+    today = daily_stats.today()
+    assert _nonzero(_rollup()) == {(acme, d1): {'candidates': 2}, (acme, today): {'interviews': 1}}
+
+    # a status change alone moves nothing; an acceptance date counts a hire
+    b.status = 'screening'
+    db.session.commit()
+    assert _nonzero(_rollup())[(acme, d1)] == {'candidates': 2}
+    b.status, b.acceptance_date = 'hired', d2
+    db.session.commit()
+    assert _nonzero(_rollup())[(acme, d2)] == {'hires': 1}
+
+    # date change and org change move the count (attributes expired by the commit)
+    a.applied_at = d2
+    db.session.commit()
+    b.org_id = other
+    db.session.commit()
+    assert _nonzero(_rollup()) == {(acme, d2): {'candidates': 1}, (acme, today): {'interviews': 1},
+                                   (other, d1): {'candidates': 1}, (other, d2): {'hires': 1}}
+
+    db.session.delete(iv)
+    db.session.delete(b)
+    db.session.commit()
+    assert _nonzero(_rollup()) == {(acme, d2): {'candidates': 1}}
+
+
+def test_backfill_matches_the_hook(org):
+    acme, other = org
+    for n in range(6):
+        c = Candidate(org_id=(acme, other)[n % 2], name=f'c{n}', applied_at=date(2026, 9, 1 + n % 3),
+                      acceptance_date=date(2026, 10, 1) if n % 3 == 0 else None)
+        db.session.add(c); db.session.flush()
+        db.session.add(Interview(org_id=c.org_id, candidate_id=c.id))
+    db.session.commit()
+    moved = Candidate.query.filter_by(name='c1').one()
+    moved.applied_at = date(2026, 9, 20)
+    db.session.delete(Candidate.query.filter_by(name='c4').one())
+    db.session.commit()
+
+    by_hook = _nonzero(_rollup())
+    assert daily_stats.backfill() > 0
+    db.session.commit()
+    assert _nonzero(_rollup()) == by_hook
+    # one org / a date range only
+    daily_stats.backfill(org_id=acme, since=date(2026, 9, 2))
+    db.session.commit()
+    assert _nonzero(_rollup()) == by_hook
+
+
+def test_today_uses_the_configured_timezone(db_app):
+    db_app.config['APP_TIMEZONE'] = 'Pacific/Kiritimati'
+    assert daily_stats.today() == datetime.now(ZoneInfo('Pacific/Kiritimati')).date()
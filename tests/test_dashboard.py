@@ -0,0 +1,96 @@
+import os
+import random
+import sys
+from datetime import date
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from app.extensions import db
+from app.models import Candidate, Interview, Organization
+from app.services import dashboard
+
+TODAY = date(2026, 10, 18)
+START, END = date(2026, 9, 1), date(2026, 9, 30)
+
+
+def _gender(c):
+    g = getattr(c, 'gender', None)
+    return '男性' if g in ('male', '男性') else '女性' if g in ('female', '女性') else '不明'
+
+
+def _decade(c):
+    return f"{((TODAY.year - c.birthdate.year) // 10) * 10}代" if c.birthdate else '不明'
+
+
+def _old_dashboard_2(org_id, channel='', position='', decade='', gender=''):
+    """The per-row loop dashboard_2 used before the grouped SQL (reference)."""
+    cand_all = Candidate.query.filter_by(org_id=org_id).all()
+    decades, genders = {}, {'男性': 0, '女性': 0, '不明': 0}
+    for c in cand_all:
+        decades[_decade(c)] = decades.get(_decade(c), 0) + 1
+        genders[_gender(c)] += 1
+    filtered = [
+        c for c in cand_all
+        if not (c.applied_at and (c.applied_at < START or c.applied_at > END))
+        and not (channel and c.channel != channel)
+        and not (position and c.applying_position != position)
+        and not (decade and _decade(c) != decade)
+        and not (gender and _gender(c) != gender)
+    ]
+    ids = {c.id for c in filtered}
+    ivs = [i for i in Interview.query.filter_by(org_id=org_id) if i.candidate_id in ids]
+    passed = lambda step: sum(1 for i in ivs if i.step == step and (i.result or '') == 'pass')
+    yields = [len(filtered), passed('document'), passed('first'), passed('second'),
+              sum(1 for i in ivs if (i.result or '') == 'offer'),
+              sum(1 for c in filtered if c.acceptance_date is not None)]
+
+    def top_group(field, source):
+        m = {}
+        for c in source:
+            key = getattr(c, field) or 'Unknown'
+            m[key] = m.get(key, 0) + 1
+        return m
+
+    source = filtered or cand_all
+    return {'yield': yields, 'channels': top_group('channel', source),
+            'positions': top_group('applying_position', source), 'decades': decades, 'genders': genders}
+
+
+@pytest.fixture
+def org_id(db_app):
+    rnd = random.Random(7)
+    org, other = Organization(name='acme'), Organization(name='other')
+    db.session.add_all([org, other]); db.session.flush()
+    for n in range(80):
+        c = Candidate(
+            org_id=org.id if n % 9 else other.id, name=f'c{n}',
+            channel=rnd.choice(['web', 'agent', 'referral', '', None]),
+            applying_position=rnd.choice(['engineer', 'sales', '', None]),
+            birthdate=rnd.choice([None, date(1970 + rnd.randrange(35), 1 + rnd.randrange(12), 1)]),
+            applied_at=date(2026, 8 + rnd.randrange(3), 1 + rnd.randrange(28)),
+            acceptance_date=rnd.choice([None, None, date(2026, 10, 1)]),
+        )
+        db.session.add(c); db.session.flush()
+        for _ in range(rnd.randrange(4)):
+            db.session.add(Interview(org_id=c.org_id, candidate_id=c.id,
+                                     step=rnd.choice(['document', 'first', 'second', 'final', None]),
+                                     result=rnd.choice(['pass', 'fail', 'offer', '', None])))
+    db.session.commit()
+    return org.id
+
+
+@pytest.mark.parametrize('filters', [
+    {}, {'channel': 'web'}, {'position': 'engineer', 'decade': '30代'}, {'decade': '不明'},
+    {'gender': '不明'}, {'gender': '男性'}, {'channel': 'nope'},
+])
+def test_grouped_sql_matches_the_old_loop(org_id, filters):
+    new = dashboard.dashboard_2_data(org_id, START, END, today=TODAY, **filters)['charts']
+    old = _old_dashboard_2(org_id, **filters)
+    assert new['yield']['values'] == old['yield']
+    for name in ('channels', 'positions', 'decades', 'genders'):
+        assert dict(zip(new[name]['labels'], new[name]['values'])) == old[name], name
+    # '' and NULL share the 'Unknown' slice
+    assert '' not in new['channels']['labels'] and '' not in new['positions']['labels']
+    assert new['channels']['values'] == sorted(new['channels']['values'], reverse=True)
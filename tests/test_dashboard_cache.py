@@ -0,0 +1,68 @@
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.extensions import db, rq
+from app.models import Candidate, Organization
+from app.services import dashboard_cache
+
+
+class _Redis(dict):
+    def get(self, k):
+        return dict.get(self, k)
+
+    def set(self, k, v, ex=None):
+        self[k] = v.encode('utf-8') if isinstance(v, str) else v
+
+    def incr(self, k):
+        self[k] = str(int(dict.get(self, k) or 0) + 1).encode()
+        return int(self[k])
+
+
+def test_normalize_filters_ignores_order_and_blanks():
+    a = dashboard_cache.normalize_filters({'channel': 'web', 'position': '', 'tags': ['b', 'a']})
+    b = dashboard_cache.normalize_filters({'tags': ['a', 'b'], 'gender': None, 'channel': 'web'})
+    assert a == b
+    assert a != dashboard_cache.normalize_filters({'channel': 'agent'})
+
+
+def test_cached_until_org_is_invalidated(monkeypatch):
+    app = create_app()
+    monkeypatch.setattr(rq, 'redis', _Redis())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'n': len(calls)}
+
+    with app.app_context():
+        assert dashboard_cache.cached(1, 'home', {'day': 'x'}, compute) == {'n': 1}
+        assert dashboard_cache.cached(1, 'home', {'day': 'x'}, compute) == {'n': 1}
+        assert dashboard_cache.cached(2, 'home', {'day': 'x'}, compute) == {'n': 2}
+        dashboard_cache.invalidate(1)
+        assert dashboard_cache.cached(1, 'home', {'day': 'x'}, compute) == {'n': 3}
+
+
+def test_moving_a_row_invalidates_both_orgs(db_app, monkeypatch):
+    dashboard_cache.install()
+    monkeypatch.setattr(rq, 'redis', _Redis())
+    a, b, c = Organization(name='a'), Organization(name='b'), Organization(name='c')
+    db.session.add_all([a, b, c]); db.session.flush()
+    cand = Candidate(org_id=a.id, name='山田', applied_at=date(2026, 10, 1))
+    db.session.add(cand); db.session.commit()
+    versions = lambda: {o.id: int(rq.redis.get(f'dash:ver:{o.id}') or 0) for o in (a, b, c)}
+    start = versions()
+
+    # org_id expired by the commit: the old org is read from the database
+    cand.org_id = b.id
+    db.session.commit()
+    assert versions() == {a.id: start[a.id] + 1, b.id: start[b.id] + 1, c.id: start[c.id]}
+
+    # org_id loaded: the old org comes from the attribute history
+    assert cand.org_id == b.id
+    cand.org_id = c.id
+    db.session.commit()
+    assert versions() == {a.id: start[a.id] + 1, b.id: start[b.id] + 2, c.id: start[c.id] + 1}
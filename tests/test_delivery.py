@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import delivery
+
+
+def test_content_disposition_ascii_and_utf8():
+    assert delivery.content_disposition('cv.pdf', True) == 'attachment; filename=cv.pdf'
+    assert delivery.content_disposition('my cv.pdf', True) == 'attachment; filename="my cv.pdf"'
+    assert delivery.content_disposition('履歴書.pdf', False) == (
+        "inline; filename=.pdf; filename*=UTF-8''%E5%B1%A5%E6%AD%B4%E6%9B%B8.pdf")
+    assert delivery.content_disposition('山田.pdf', True).startswith('attachment; filename=.pdf;')
+    assert delivery.content_disposition('', True) == 'attachment'
+
+
+def test_content_disposition_quotes_the_filename():
+    assert delivery.content_disposition('a"b\\c.pdf', True) == 'attachment; filename="a\\"b\\\\c.pdf"'
+    assert delivery.content_disposition('x"; filename=evil.exe', True) == (
+        'attachment; filename="x\\"; filename=evil.exe"')
+    # the header matches werkzeug's send_file for the same name
+    from flask import Flask, send_file
+    from io import BytesIO
+    app = Flask(__name__)
+    for name in ('a"b\\c.pdf', '履歴書(1).pdf', 'my cv.pdf'):
+        with app.test_request_context():
+            sent = send_file(BytesIO(b'x'), download_name=name, as_attachment=True)
+            assert sent.headers['Content-Disposition'] == delivery.content_disposition(name, True)
+
+
+def test_guess_mimetype_defaults():
+    assert delivery.guess_mimetype('a.pdf') == 'application/pdf'
+    assert delivery.guess_mimetype('noext', 'audio/mpeg') == 'audio/mpeg'
@@ -0,0 +1,95 @@
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+from app.services import direct_upload
+
+MB = direct_upload.MB
+
+
+def _app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', STORAGE_BACKEND='local', LOCAL_STORAGE_DIR=str(tmp_path),
+                      DIRECT_UPLOAD_PART_MB=5, DIRECT_UPLOAD_MAX_MB=100)
+    return app
+
+
+def test_plan_parts_respects_s3_limits():
+    assert direct_upload.plan_parts(1, 1 * MB) == (5 * MB, 1)
+    assert direct_upload.plan_parts(12 * MB, 5 * MB) == (5 * MB, 3)
+    part_size, count = direct_upload.plan_parts(100000 * MB, 5 * MB)
+    assert count <= direct_upload.MAX_PARTS and part_size * count >= 100000 * MB
+
+
+def test_token_roundtrip_and_tampering(tmp_path):
+    with _app(tmp_path).app_context():
+        state = direct_upload.start(1, 2, 3, '面接 録音.m4a', 12 * MB, 'audio/mp4')
+        assert state['key'].startswith('org1/interview3/') and state['parts'] == 3
+        assert direct_upload.load(direct_upload.token(state)) == state
+        with pytest.raises(direct_upload.UploadError) as e:
+            direct_upload.load(direct_upload.token(state) + 'x')
+        assert e.value.status == 401
+        with pytest.raises(direct_upload.UploadError) as e:
+            direct_upload.start(1, 2, 3, 'big.wav', 101 * MB)
+        assert e.value.status == 413
+
+
+def test_content_type_is_required_or_taken_from_the_name(tmp_path):
+    with _app(tmp_path).app_context():
+        assert direct_upload.start(1, 2, 3, 'rec.mp3', MB)['parts'] == 1
+        assert direct_upload.start(1, 2, 3, 'rec.m4a', MB, 'application/octet-stream')['parts'] == 1
+        for filename, content_type in (('payload.html', None), ('payload', None),
+                                       ('payload.exe', 'application/octet-stream'), ('rec.mp3', 'text/html')):
+            with pytest.raises(direct_upload.UploadError) as e:
+                direct_upload.start(1, 2, 3, filename, MB, content_type)
+            assert e.value.status == 415
+
+
+def test_local_parts_assemble_in_order(tmp_path):
+    data = os.urandom(11 * MB)
+    with _app(tmp_path).app_context():
+        state = direct_upload.start(1, 2, 3, 'rec.mp3', len(data), 'audio/mpeg')
+        # parts arrive out of order; the last one is short
+        for n in (3, 1, 2):
+            start = (n - 1) * state['part_size']
+            direct_upload.write_part(state, n, io.BytesIO(data[start:start + state['part_size']]))
+        assert [p['done'] for p in direct_upload.describe(state)] == [True, True, True]
+        done = direct_upload.complete(state)
+        assert done.url == direct_upload.stored_url(state)
+        assert (done.sha256, done.size) == (hashlib.sha256(data).hexdigest(), len(data))
+        with open(done.url.replace('file://', ''), 'rb') as f:
+            assert f.read() == data
+
+
+def test_incomplete_upload_is_rejected(tmp_path):
+    with _app(tmp_path).app_context():
+        state = direct_upload.start(1, 2, 3, 'rec.mp3', 6 * MB)
+        with pytest.raises(direct_upload.UploadError):
+            direct_upload.write_part(state, 1, io.BytesIO(b'x' * MB))
+        direct_upload.write_part(state, 2, io.BytesIO(b'x' * MB))
+        with pytest.raises(direct_upload.UploadError) as e:
+            direct_upload.complete(state)
+        assert e.value.status == 409
+        direct_upload.abort(state)
+        assert not os.path.exists(os.path.join(str(tmp_path), '.uploads', state['upload_id']))
+
+
+def test_abandoned_local_uploads_are_purged_after_token_lifetime(tmp_path):
+    import time
+    app = _app(tmp_path)
+    app.config['DIRECT_UPLOAD_EXPIRES_SEC'] = 3600
+    with app.app_context():
+        stale = direct_upload.start(1, 2, 3, 'old.mp3', MB)
+        fresh = direct_upload.start(1, 2, 3, 'new.mp3', MB)
+        old_dir = os.path.join(str(tmp_path), '.uploads', stale['upload_id'])
+        os.utime(old_dir, (time.time() - 7200,) * 2)
+        assert direct_upload.purge_abandoned() == 1
+        assert not os.path.exists(old_dir)
+        assert os.path.isdir(os.path.join(str(tmp_path), '.uploads', fresh['upload_id']))
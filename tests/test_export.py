@@ -0,0 +1,96 @@
+import io
+import json
+import os
+import sys
+import zipfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import Column, Integer, MetaData, String, Table
+
+from app.services import export
+
+
+class _Model:
+    __table__ = Table('things', MetaData(), Column('id', Integer), Column('name', String),
+                      Column('password_hash', String), Column('meta', String))
+
+
+def _fake(monkeypatch, n):
+    rows = [{'id': i, 'name': f'名前{i}', 'meta': {'k': [i]}} for i in range(1, n + 1)]
+    monkeypatch.setattr(export, 'tables', lambda: {'things': _Model})
+    monkeypatch.setattr(export, 'EXCLUDED_COLUMNS', {'things': {'password_hash'}})
+    monkeypatch.setattr(export, 'iter_rows', lambda name, org_id, batch=500: iter(rows))
+
+
+def test_csv_zip_is_streamed_in_chunks_and_readable(monkeypatch):
+    _fake(monkeypatch, 25)
+    chunks = list(export.stream('csv', 1, ['things', 'unknown'], batch=10))
+    assert len([c for c in chunks if c]) > 1
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        assert zf.namelist() == ['things.csv']
+        text = zf.read('things.csv').decode('utf-8-sig').splitlines()
+    assert text[0] == 'id,name,meta'
+    assert text[1] == '1,名前1,"{""k"": [1]}"'
+    assert len(text) == 26
+
+
+def test_ndjson_one_object_per_line(monkeypatch):
+    _fake(monkeypatch, 3)
+    lines = b''.join(export.stream('ndjson', 1, ['things'])).decode('utf-8').splitlines()
+    assert [json.loads(x) for x in lines][2] == {'table': 'things', 'row': {'id': 3, 'name': '名前3', 'meta': {'k': [3]}}}
+
+
+def _app(tmp_path):
+    from flask import Flask
+    app = Flask(__name__)
+    app.config.update(STORAGE_BACKEND='local', LOCAL_STORAGE_DIR=str(tmp_path), EXPORT_RESULT_TTL_SEC=3600)
+    return app
+
+
+def test_export_deletion_is_scheduled_for_result_expiry(tmp_path, monkeypatch):
+    import rq
+    from app.jobs import export as export_job
+
+    scheduled = []
+
+    class _Queue:
+        def __init__(self, name, connection=None):
+            self.name = name
+
+        def enqueue_in(self, delay, func, *args):
+            scheduled.append((self.name, delay.total_seconds(), func, args))
+
+    class _Job:
+        origin, connection, result_ttl = 'maintenance', None, 600
+
+    monkeypatch.setattr(rq, 'Queue', _Queue)
+    monkeypatch.setattr(rq, 'get_current_job', lambda: _Job())
+    with _app(tmp_path).app_context():
+        export_job.schedule_delete('file:///x/exports/org1/a.ndjson')
+    assert scheduled == [('maintenance', 600, export_job.delete_export, ('file:///x/exports/org1/a.ndjson',))]
+
+
+def test_purge_removes_only_expired_exports(tmp_path):
+    import time
+    from app.jobs import export as export_job
+
+    folder = tmp_path / 'exports' / 'org1'
+    folder.mkdir(parents=True)
+    old, new = folder / 'old.ndjson', folder / 'new.ndjson'
+    old.write_bytes(b'{}'); new.write_bytes(b'{}')
+    os.utime(old, (time.time() - 7200,) * 2)
+    report = tmp_path / 'imports' / 'org1' / 'errors-x.csv'
+    report.parent.mkdir(parents=True)
+    report.write_bytes(b'line,email\n')
+    os.utime(report, (time.time() - 2 * 86400,) * 2)
+    # imports keep their own (default one day) retention
+    recent = report.parent / 'errors-y.csv'
+    recent.write_bytes(b'line,email\n')
+    os.utime(recent, (time.time() - 7200,) * 2)
+    (tmp_path / 'org1').mkdir()
+    (tmp_path / 'org1' / 'resume.pdf').write_bytes(b'%PDF')
+    os.utime(tmp_path / 'org1' / 'resume.pdf', (time.time() - 7200,) * 2)
+    with _app(tmp_path).app_context():
+        assert export_job.purge_exports() == 2
+    assert not old.exists() and new.exists() and not report.exists() and recent.exists() and (tmp_path / 'org1' / 'resume.pdf').exists()
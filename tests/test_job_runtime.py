@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import current_app
+
+from app import create_app
+from app.jobs import runtime
+
+
+def test_run_with_app_reuses_registered_app(monkeypatch):
+    app = create_app()
+    monkeypatch.setattr(runtime, '_app', None)
+    runtime.register_app(app)
+
+    def fail_create_app():
+        raise AssertionError('create_app must not be called per job')
+
+    monkeypatch.setattr('app.create_app', fail_create_app)
+
+    seen = []
+
+    def job(x):
+        seen.append(current_app._get_current_object())
+        return x * 2
+
+    assert runtime.run_with_app(job, 2) == 4
+    assert runtime.run_with_app(job, 3) == 6
+    assert seen == [app, app]
@@ -0,0 +1,59 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import Column, DateTime, Integer, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from app.services import keyset
+
+Base = declarative_base()
+
+
+class Row(Base):
+    __tablename__ = 'rows'
+    id = Column(Integer, primary_key=True)
+    at = Column(DateTime, nullable=True)
+
+
+def _walk(session, order, per_page):
+    pages, cursor = [], None
+    while True:
+        page = keyset.paginate(session.query(Row), order, cursor, per_page=per_page)
+        pages.append([r.id for r in page.items])
+        if not page.has_next:
+            return pages, page
+        cursor = page.next_cursor
+
+
+def test_pages_cover_every_row_once_with_nulls_last_and_walk_back():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    base = datetime(2026, 1, 1)
+    with Session(engine) as s:
+        # duplicate timestamps and NULLs
+        s.add_all([Row(id=i, at=None if i % 5 == 0 else base + timedelta(hours=i % 7)) for i in range(1, 48)])
+        s.commit()
+        order = [(Row.at, 'asc'), (Row.id, 'asc')]
+        expected = [r.id for r in sorted(s.query(Row).all(), key=lambda r: (r.at is None, r.at or base, r.id))]
+
+        pages, last = _walk(s, order, per_page=10)
+        assert [i for p in pages for i in p] == expected
+        assert len(pages) == 5 and pages[-1] == expected[40:]
+
+        back, page = [], last
+        while page.has_prev:
+            page = keyset.paginate(s.query(Row), order, page.prev_cursor, per_page=10)
+            back.insert(0, [r.id for r in page.items])
+        assert back == pages[:-1]
+
+        desc_pages, _ = _walk(s, [(Row.id, 'desc')], per_page=20)
+        assert [i for p in desc_pages for i in p] == list(range(47, 0, -1))
+
+
+def test_garbled_cursor_starts_from_the_first_page():
+    assert keyset.decode_cursor('not-a-cursor', 2) is None
+    token = keyset.encode_cursor([datetime(2026, 1, 1, 9, 30), 7], 'next')
+    assert keyset.decode_cursor(token, 2) == ([datetime(2026, 1, 1, 9, 30), 7], 'next')
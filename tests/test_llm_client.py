@@ -0,0 +1,86 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from app import create_app
+from app.services import llm_client
+
+
+class _Resp:
+    def __init__(self, status, body=None, headers=None, text=''):
+        self.status_code = status
+        self._body = body or {}
+        self.headers = headers or {}
+        self.text = text
+
+    def json(self):
+        return self._body
+
+
+class _Session:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def post(self, *a, **kw):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def _app():
+    app = create_app()
+    app.config.update(OPENAI_API_KEY='k', LLM_MAX_ATTEMPTS=3, LLM_MAX_INLINE_WAIT_SEC=5)
+    return app
+
+
+def test_respond_retries_short_waits_inline(monkeypatch):
+    app = _app()
+    sess = _Session([_Resp(503), _Resp(200, {'output_text': 'ok'})])
+    monkeypatch.setattr(llm_client, '_get_session', lambda: sess)
+    monkeypatch.setattr(llm_client.time, 'sleep', lambda s: None)
+    with app.app_context():
+        jr = llm_client.respond('hi')
+    assert llm_client.output_text(jr) == 'ok'
+    assert sess.calls == 2
+
+
+def test_respond_raises_retry_later_for_long_retry_after(monkeypatch):
+    app = _app()
+    sess = _Session([_Resp(429, headers={'Retry-After': '30'}, text='rate limit')])
+    monkeypatch.setattr(llm_client, '_get_session', lambda: sess)
+    with app.app_context():
+        with pytest.raises(llm_client.RetryLater) as ei:
+            llm_client.respond('hi')
+    assert ei.value.retry_after == 30
+    assert sess.calls == 1
+
+
+def test_respond_does_not_retry_insufficient_quota(monkeypatch):
+    app = _app()
+    sess = _Session([_Resp(429, text='{"error": {"code": "insufficient_quota"}}')])
+    monkeypatch.setattr(llm_client, '_get_session', lambda: sess)
+    with app.app_context():
+        with pytest.raises(llm_client.LLMError) as ei:
+            llm_client.respond('hi')
+    assert not isinstance(ei.value, llm_client.RetryLater)
+
+
+def test_respond_cache_serves_identical_prompt(monkeypatch):
+    from app.services import llm_cache
+    app = _app()
+    sess = _Session([_Resp(200, {'output_text': 'first'}), _Resp(200, {'output_text': 'second'}),
+                     _Resp(200, {'output_text': 'third'})])
+    monkeypatch.setattr(llm_client, '_get_session', lambda: sess)
+    monkeypatch.setattr(llm_cache, 'bypassed', lambda org_id=None: org_id == 2)
+    with app.app_context():
+        a = llm_client.respond('cache me', temperature=0.2, cache=True, org_id=1)
+        b = llm_client.respond('cache me', temperature=0.2, cache=True, org_id=1)
+        c = llm_client.respond('cache me', temperature=0.2, cache=True, org_id=2)
+        d = llm_client.respond('cache me', temperature=0.7, cache=True, org_id=1)
+    assert llm_client.output_text(a) == llm_client.output_text(b) == 'first'
+    assert llm_client.output_text(c) == 'second'
+    assert llm_client.output_text(d) == 'third'
+    assert sess.calls == 3
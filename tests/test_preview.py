@@ -0,0 +1,36 @@
+import os
+import sys
+from io import BytesIO
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import openpyxl
+
+from app.services import preview
+
+
+class _File:
+    def __init__(self, meta):
+        self.id = 1
+        self.file_metadata = meta
+        self.storage_url = 'file:///tmp/x/resume.xlsx'
+
+
+def test_xlsx_preview_escapes_cell_text():
+    wb = openpyxl.Workbook()
+    wb.active.append(['<script>alert(1)</script>', None, 3])
+    buf = BytesIO()
+    wb.save(buf)
+    html = preview._extract_xlsx_to_html(buf.getvalue()).decode('utf-8')
+    assert '<script>' not in html
+    assert '<td>&lt;script&gt;alert(1)&lt;/script&gt;</td><td></td><td>3</td>' in html
+
+
+def test_cached_preview_requires_current_renderer_version():
+    info = {'url': 'file:///tmp/p.html', 'sha256': 'ab', 'version': preview.RENDERER_VERSION}
+    assert preview.cached(_File({'filename': 'cv.xlsx', 'preview': info})) == info
+    assert preview.etag(info) == f'ab-v{preview.RENDERER_VERSION}'
+    stale = dict(info, version=preview.RENDERER_VERSION - 1)
+    assert preview.cached(_File({'filename': 'cv.xlsx', 'preview': stale})) is None
+    assert preview.supports(_File({'filename': 'cv.XLSX'}))
+    assert not preview.supports(_File({'filename': 'cv.pdf'}))
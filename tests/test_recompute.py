@@ -0,0 +1,74 @@
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from app.extensions import db
+from app.jobs import recompute, transcribe
+from app.models import Candidate, Interview, Organization
+from app.models.recording import Recording
+from app.models.setting import Setting
+from app.models.transcript import Transcript
+from app.services import openai_wrap, stt_segments
+
+WORDS = [
+    {'word': 'えー', 'start': 0.0, 'end': 0.3, 'speaker': 0},
+    {'word': 'はい', 'start': 0.4, 'end': 0.8, 'speaker': 0},
+    {'word': 'よろしく', 'start': 1.0, 'end': 1.6, 'speaker': 1},
+    {'word': 'お願いします', 'start': 1.6, 'end': 2.4, 'speaker': 1},
+]
+RAW = {'results': {'channels': [{'alternatives': [{'transcript': 'えー はい よろしく お願いします', 'words': WORDS}]}]}}
+
+
+def _no_stt(*args, **kwargs):
+    raise AssertionError('recompute must not call STT')
+
+
+@pytest.fixture
+def org(db_app, monkeypatch):
+    for target in (transcribe, openai_wrap, stt_segments):
+        monkeypatch.setattr(target, 'deepgram_raw_transcribe', _no_stt)
+    for target in (transcribe, openai_wrap):
+        monkeypatch.setattr(target, 'transcribe_whisper', _no_stt)
+    monkeypatch.setattr(transcribe, 'transcribe_segmented', _no_stt)
+    org = Organization(name='acme')
+    db.session.add(org); db.session.flush()
+    cand = Candidate(org_id=org.id, name='山田', applied_at=date(2026, 10, 1))
+    db.session.add(cand); db.session.flush()
+    iv = Interview(org_id=org.id, candidate_id=cand.id)
+    db.session.add(iv); db.session.flush()
+    rec = Recording(org_id=org.id, interview_id=iv.id, storage_url='s3://bucket/missing.wav')
+    db.session.add(rec); db.session.flush()
+    for raw in (RAW, RAW, None):
+        db.session.add(Transcript(org_id=org.id, recording_id=rec.id, text='stale', lang='ja', status='ok',
+                                  utterances=[{'speaker': 9, 'text': 'stale'}], metrics={'filler_rate': 0.9},
+                                  raw_response=raw))
+    db.session.commit()
+    return org.id
+
+
+def test_recompute_rebuilds_from_raw_response(org):
+    tr_id = Transcript.query.order_by(Transcript.id).first().id
+    assert recompute._run_recompute_transcript(tr_id) is True
+    db.session.expire_all()
+    tr = db.session.get(Transcript, tr_id)
+    expected = transcribe.derive_transcript(RAW, RAW['results']['channels'][0]['alternatives'][0]['transcript'])
+    assert tr.utterances == expected['utterances']
+    assert {u['speaker'] for u in tr.utterances} == {0, 1}
+    assert tr.text == expected['text'] and 'stale' not in tr.text
+    assert tr.metrics['filler_rate'] == pytest.approx(0.25)
+    assert tr.raw_response == RAW
+
+
+def test_recompute_org_applies_saved_heuristics(org):
+    db.session.add(Setting(org_id=org, key='FILLER_TOKENS', value='えー,はい'))
+    db.session.commit()
+    stats = recompute._run_recompute_org_transcripts(org, batch_size=1)
+    assert stats == {'processed': 2, 'updated': 2, 'failed': 0}
+    rows = Transcript.query.order_by(Transcript.id).all()
+    assert [tr.metrics['filler_rate'] for tr in rows[:2]] == [pytest.approx(0.5)] * 2
+    # no raw output: left as it was
+    assert (rows[2].text, rows[2].metrics) == ('stale', {'filler_rate': 0.9})
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from app.extensions import QUEUES, RQWrapper
+import run_rq_worker
+
+
+def test_queues_by_priority():
+    assert QUEUES[-1] == 'stt'
+    assert QUEUES.index('notify') < QUEUES.index('llm') < QUEUES.index('maintenance')
+
+
+def test_enqueue_routes_by_name_and_rejects_unknown_queues():
+    rq = RQWrapper()  # no Redis: jobs run synchronously
+    assert rq.enqueue(lambda a, b=0: a + b, 1, b=2, queue='stt', job_timeout=10) == 3
+    with pytest.raises(ValueError):
+        rq.enqueue(print, 'x', queue='nope')
+
+
+def test_worker_queue_spec():
+    plan = run_rq_worker.parse_queues('notify+llm, default,stt=2', 3)
+    assert plan == [(('notify', 'llm'), 3), (('default',), 3), (('stt',), 2)]
+    for bad in ('stt,foo', 'llm=0', '+'):
+        with pytest.raises(ValueError):
+            run_rq_worker.parse_queues(bad, 1)
@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text
+
+from app import create_app
+from app.services import schema_caps
+
+
+def test_flags_are_introspected_once_and_refreshed_on_demand(tmp_path):
+    app = create_app()
+    engine = create_engine(f"sqlite:///{tmp_path / 'caps.db'}")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE interviews (id INTEGER PRIMARY KEY, created_at DATETIME)'))
+    with app.app_context():
+        caps = schema_caps.capabilities(engine)
+        assert set(caps) == set(schema_caps.CAPABILITIES) and not any(caps.values())
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE interviews ADD COLUMN scheduled_at DATETIME'))
+        # cached until the next refresh (alembic env calls publish())
+        assert schema_caps.has('has_scheduled_at', bind=engine) is False
+        schema_caps.refresh(engine)
+        assert schema_caps.has('has_scheduled_at', bind=engine) is True
@@ -0,0 +1,96 @@
+import importlib.util
+import os
+import sys
+from datetime import date
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from sqlalchemy import text
+
+from app.extensions import db
+from app.models import Candidate, Organization
+from app.services import schema_caps, search
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _migration(name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, 'alembic', 'versions', name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def app(db_app):
+    search.install()
+    for stmt in _migration('20261018_add_search_documents').SQLITE_FTS:
+        db.session.execute(text(stmt))
+    db.session.commit()
+    schema_caps.refresh()
+    return db_app
+
+
+def test_tokenize_bigrams_japanese_and_keeps_words():
+    assert search.tokenize('山田太郎') == ['山田', '田太', '太郎', '郎']
+    # katakana folded to hiragana, full-width normalized, lower-cased
+    assert search.tokenize('ヤマダ ＰｙｔｈｏｎとSQL') == ['やま', 'まだ', 'だ', 'python', 'と', 'sql']
+    assert search.tokenize('、。!?') == []
+    # a query's final run may continue in the document
+    assert search.tokenize('山田', query=True) == ['山田']
+    assert search.tokenize('小林python', query=True) == ['小林', '林', 'python']
+
+
+def test_query_terms_are_phrases_anded():
+    terms = search._terms('決済システム  Go')
+    assert search._fts5_query(terms) == '"決済 済し しす すて てむ" AND "go"*'
+    assert search._tsquery(search._terms('田')) == "('田':*)"
+    assert search._tsquery(search._terms('山田 yama')) == "('山田') & ('yama':*)"
+
+
+def test_search_matches_word_prefixes_and_single_characters(app):
+    org = Organization(name='acme')
+    db.session.add(org); db.session.flush()
+    for name in ('Yamada Taro', '小林 花子', '山田太郎'):
+        db.session.add(Candidate(org_id=org.id, name=name, applied_at=date(2026, 10, 1)))
+    db.session.commit()
+    assert search.backend() == 'fts5'
+
+    def names(q):
+        hits, _ = search.search(org.id, q)
+        return sorted(db.session.get(Candidate, h['candidate_id']).name for h in hits)
+
+    assert names('yama') == ['Yamada Taro']
+    assert names('林') == ['小林 花子']
+    assert names('郎') == ['山田太郎']
+    assert names('田太') == ['山田太郎']
+    assert names('山田 太郎') == ['山田太郎']
+    assert names('yamada tar') == ['Yamada Taro']
+
+
+def test_candidate_filter_is_an_uncapped_subquery(app):
+    org, other = Organization(name='acme'), Organization(name='other')
+    db.session.add_all([org, other]); db.session.flush()
+    for i in range(30):
+        db.session.add(Candidate(org_id=org.id, name=f'山田 {i}', applied_at=date(2026, 10, 1)))
+    db.session.add(Candidate(org_id=org.id, name='佐藤', memo='山田さんの紹介', applied_at=date(2026, 10, 1)))
+    db.session.add(Candidate(org_id=other.id, name='山田', applied_at=date(2026, 10, 1)))
+    db.session.commit()
+
+    def count(q):
+        query = Candidate.query.filter_by(org_id=org.id)
+        return query.filter(Candidate.id.in_(search.matching_candidates(org.id, q))).count()
+
+    assert count('山田') == 31
+    assert count('山田 紹介') == 1
+    assert count('、') == 0
+
+
+def test_unknown_kind_returns_no_hits(app):
+    org = Organization(name='acme')
+    db.session.add(org); db.session.flush()
+    db.session.add(Candidate(org_id=org.id, name='山田太郎', applied_at=date(2026, 10, 1)))
+    db.session.commit()
+    assert search.search(org.id, '山田', kinds=['memo']) == ([], False)
+    assert len(search.search(org.id, '山田', kinds=['candidate'])[0]) == 1
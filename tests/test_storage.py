@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+from app.services import storage
+
+
+def _app(**config):
+    app = Flask(__name__)
+    app.config.update(S3_ENDPOINT='http://minio:9000', S3_BUCKET='b', S3_ACCESS_KEY='k', S3_SECRET_KEY='s',
+                      S3_REGION='us-east-1', S3_MAX_CONCURRENCY=4, S3_MULTIPART_CHUNKSIZE_MB=32, **config)
+    return app
+
+
+def test_s3_backend_is_shared_and_rebuilt_on_config_change():
+    storage.reset()
+    app = _app()
+    with app.app_context():
+        backend = storage.s3_backend()
+        assert storage.s3_backend() is backend
+        assert storage.presign_client() is backend.client
+        assert backend.transfer.multipart_chunksize == 32 * storage.MB
+        assert backend.transfer.max_concurrency == 4
+        assert backend.client.meta.config.max_pool_connections == 10
+        app.config['S3_PUBLIC_ENDPOINT'] = 'https://files.example.com'
+        rebuilt = storage.s3_backend()
+        assert rebuilt is not backend
+        assert rebuilt.presigner.meta.endpoint_url == 'https://files.example.com'
+    storage.reset()
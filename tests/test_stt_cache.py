@@ -0,0 +1,69 @@
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from app.extensions import db
+from app.models.stt_cache import SttCacheEntry
+from app.services import stt_cache
+
+SHA = 'a' * 64
+
+
+@pytest.fixture
+def app(db_app):
+    db_app.config.update(STT_CACHE_ENABLED=True, STT_CACHE_MAX_BYTES=0, DEEPGRAM_OPTIONS={'model': 'nova-2'})
+    return db_app
+
+
+def _raw(n, size=2000):
+    # random text barely compresses, so each payload is about ``size`` bytes
+    rnd = random.Random(n)
+    return {'n': n, 'text': ''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(size))}
+
+
+def test_key_covers_language_and_options(app):
+    stt_cache.put(SHA, 'ja', _raw(1))
+    assert stt_cache.get(SHA, 'ja') == _raw(1)
+    assert stt_cache.get(SHA, 'en') is None
+    assert stt_cache.get('b' * 64, 'ja') is None
+
+    app.config['DEEPGRAM_OPTIONS'] = {'model': 'nova-2', 'diarize': True}
+    assert stt_cache.cache_key(SHA, 'ja') != stt_cache.cache_key(SHA, 'ja', {'model': 'nova-2'})
+    assert stt_cache.get(SHA, 'ja') is None
+    # key order does not matter
+    app.config['DEEPGRAM_OPTIONS'] = {'model': 'nova-2'}
+    assert stt_cache.cache_key(SHA, 'ja') == stt_cache.cache_key(SHA, 'ja', {'model': 'nova-2'})
+    assert stt_cache.get(SHA, 'ja') == _raw(1)
+
+
+def test_eviction_keeps_total_within_budget_lru_first(app):
+    start = datetime(2026, 10, 1)
+    for n in range(4):
+        stt_cache.put(f'{n:064x}', 'ja', _raw(n))
+        SttCacheEntry.query.filter_by(audio_sha256=f'{n:064x}').update({'last_used_at': start + timedelta(minutes=n)})
+    db.session.commit()
+    sizes = {e.audio_sha256: e.size_bytes for e in SttCacheEntry.query}
+    assert len(sizes) == 4 and min(sizes.values()) > 1000
+
+    # a hit makes the oldest entry the most recent one
+    assert stt_cache.get(f'{0:064x}', 'ja') == _raw(0)
+    budget = sum(sizes.values())
+    app.config['STT_CACHE_MAX_BYTES'] = budget
+    stt_cache.put(f'{4:064x}', 'ja', _raw(4))
+
+    left = {e.audio_sha256: e.size_bytes for e in SttCacheEntry.query}
+    assert sum(left.values()) <= budget
+    assert f'{1:064x}' not in left
+    assert {f'{0:064x}', f'{4:064x}'} <= set(left)
+    assert stt_cache.stats()['size_bytes'] == sum(left.values())
+
+
+def test_payload_over_budget_is_not_stored(app):
+    app.config['STT_CACHE_MAX_BYTES'] = 100
+    assert stt_cache.put(SHA, 'ja', _raw(1)) is None
+    assert SttCacheEntry.query.count() == 0
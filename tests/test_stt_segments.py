@@ -0,0 +1,68 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+from app.services import stt_segments
+from app.services.stt_segments import plan_windows, stitch_segments
+
+
+def _raw(words, utterances):
+    return {
+        'results': {'channels': [{'alternatives': [{'transcript': ' '.join(w['word'] for w in words), 'words': words}]}]},
+        'utterances': utterances,
+    }
+
+
+def _w(word, start, speaker):
+    return {'word': word, 'punctuated_word': word, 'start': start, 'end': start + 0.4, 'speaker': speaker}
+
+
+def test_plan_windows_overlap_and_coverage():
+    windows = plan_windows(1000, 300, 10)
+    assert windows[0] == (0.0, 300)
+    assert windows[1][0] == 290
+    assert windows[-1][1] == 1000
+    for (s1, e1), (s2, e2) in zip(windows, windows[1:]):
+        assert e1 - s2 == 10
+
+
+def test_stitch_offsets_dedups_overlap_and_aligns_speakers():
+    # window A: 0-10s, window B: 8-18s (overlap 8-10, midpoint 9)
+    a_words = [_w('hello', 1.0, 0), _w('there', 8.2, 1), _w('friend', 9.5, 1)]
+    b_words = [_w('there', 0.2, 0), _w('friend', 1.5, 0), _w('bye', 5.0, 1)]
+    a = _raw(a_words, [
+        {'speaker': 0, 'start': 1.0, 'end': 1.4, 'transcript': 'hello'},
+        {'speaker': 1, 'start': 8.2, 'end': 9.9, 'transcript': 'there friend'},
+    ])
+    b = _raw(b_words, [
+        {'speaker': 0, 'start': 0.2, 'end': 1.9, 'transcript': 'there friend'},
+        {'speaker': 1, 'start': 5.0, 'end': 5.4, 'transcript': 'bye'},
+    ])
+    out = stitch_segments([(0.0, 10.0, a), (8.0, 18.0, b)])
+
+    words = out['results']['channels'][0]['alternatives'][0]['words']
+    assert [w['word'] for w in words] == ['hello', 'there', 'friend', 'bye']
+    assert words[-1]['start'] == 13.0
+    # B's speaker 0 spoke the overlap that A labelled 1, so B's labels are swapped
+    assert [w['speaker'] for w in words] == [0, 1, 1, 0]
+    assert [u['transcript'] for u in out['utterances']] == ['hello', 'there', 'friend', 'bye']
+    assert all(u['start'] <= u['end'] for u in out['utterances'])
+
+
+def test_short_recordings_are_not_downloaded(monkeypatch):
+    app = Flask(__name__)
+    monkeypatch.setattr(stt_segments.shutil, 'which', lambda name: '/usr/bin/' + name)
+    downloads, probes = [], []
+    monkeypatch.setattr(stt_segments, 'download_to_path', lambda url, path: downloads.append(url))
+    monkeypatch.setattr(stt_segments, 'probe_duration', lambda target: probes.append(target) or 120.0)
+    with app.app_context():
+        # known duration: nothing is probed or downloaded
+        assert stt_segments.transcribe_segmented('s3://b/rec.mp4', duration=300) is None
+        assert probes == []
+        # unknown duration: probed in place, still not downloaded
+        assert stt_segments.transcribe_segmented('file:///data/rec.mp4') is None
+        assert probes == ['/data/rec.mp4']
+    assert downloads == []
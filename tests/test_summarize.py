@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.services import llm_client, summarize
+
+
+def test_chunk_lines_respects_budget_and_keeps_order():
+    lines = [f'[{i}s][spk0] ' + 'あ' * 40 for i in range(50)]
+    chunks = summarize.chunk_lines(lines, max_tokens=100)
+    assert len(chunks) > 1
+    assert all(llm_client.estimate_tokens(c) <= 100 for c in chunks)
+    assert '\n'.join(chunks).split('\n') == lines
+
+
+def test_chunk_lines_caps_chunk_count():
+    lines = ['あ' * 100] * 100
+    assert len(summarize.chunk_lines(lines, max_tokens=60, max_chunks=10)) <= 10
+
+
+def test_condensed_transcript_maps_every_chunk(monkeypatch):
+    app = create_app()
+    app.config.update(OPENAI_API_KEY='k', SUMMARY_CHUNK_TOKENS=100, SUMMARY_MAX_CHUNKS=0)
+    seen = []
+
+    def fake_respond(input, model, **kw):
+        seen.append(model)
+        return {'output_text': f'notes{len(seen)}'}
+
+    monkeypatch.setattr(llm_client, 'respond', fake_respond)
+    utts = [{'start': i * 10, 'speaker': i % 2, 'text': 'い' * 80} for i in range(10)]
+    with app.app_context():
+        short = summarize.condensed_transcript([utts[0]])
+        out = summarize.condensed_transcript(utts)
+    assert short.startswith('[0s][spk0]')
+    assert seen and set(seen) == {summarize.MODEL_MAP['map']}
+    assert out.count('--- part') == len(seen)
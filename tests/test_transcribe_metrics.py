@@ -10,13 +10,15 @@ from app import create_app
 def test_transcribe_normalizes_metrics(monkeypatch, tmp_path):
     app = create_app()
     with app.app_context():
-        # monkeypatch download_bytes to return fake audio bytes
+        # monkeypatch open_stream to return a fake audio stream
+        import io
         from app.jobs.transcribe import _run_transcribe
+        from app.services.storage import StorageStream
 
-        def fake_download(url):
-            return b"RIFF....WAVE"  # dummy
+        def fake_open_stream(url):
+            return StorageStream(io.BytesIO(b"RIFF....WAVE"), length=12)  # dummy
 
-        monkeypatch.setattr('app.services.storage.download_bytes', lambda u: fake_download(u))
+        monkeypatch.setattr('app.jobs.transcribe.open_stream', fake_open_stream)
 
         # monkeypatch deepgram to return a structure with utterances
         def fake_deepgram(audio_bytes=None, language=None, filename=None):
@@ -42,3 +44,31 @@ def test_transcribe_normalizes_metrics(monkeypatch, tmp_path):
         # if speaking_metrics present it should be dict or parsed
         sm = tr.metrics.get('speakers') or tr.metrics.get('speaking_metrics')
         assert sm is not None
+
+
+def test_transcript_with_failed_segments_is_partial(db_app, monkeypatch, tmp_path):
+    from datetime import date
+    from app.extensions import db
+    from app.jobs import transcribe
+    from app.models import Candidate, Interview, Organization
+    from app.models.recording import Recording
+    from app.models.transcript import Transcript
+
+    audio = tmp_path / 'rec.wav'
+    audio.write_bytes(b'RIFF....WAVE')
+    org = Organization(name='acme')
+    db.session.add(org); db.session.flush()
+    cand = Candidate(org_id=org.id, name='山田', applied_at=date(2026, 10, 1))
+    db.session.add(cand); db.session.flush()
+    iv = Interview(org_id=org.id, candidate_id=cand.id)
+    db.session.add(iv); db.session.flush()
+    rec = Recording(org_id=org.id, interview_id=iv.id, storage_url=f'file://{audio}')
+    db.session.add(rec); db.session.commit()
+
+    words = [{'word': 'はい', 'start': 0.0, 'end': 0.4, 'speaker': 0}]
+    raw = {'metadata': {'segments': 3, 'segments_failed': 1, 'duration': 1800.0},
+           'results': {'channels': [{'alternatives': [{'transcript': 'はい', 'words': words}]}]}, 'utterances': []}
+    monkeypatch.setattr(transcribe, 'transcribe_segmented', lambda *a, **k: raw)
+    tr = db.session.get(Transcript, transcribe._run_transcribe(rec.id, 'ja'))
+    assert (tr.status, tr.error) == ('partial', '1/3 segments failed')
+    assert db.session.get(Recording, rec.id).duration_sec == 1800